@@ -0,0 +1,293 @@
+'''Compare inputs larger than memory by reading chunks and spilling intermediate results to disk.'''
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from entity_network import _prepare, _compare_records, _similarity, _disjoint_set, _exceptions, _parquet
+from entity_network.clean_text import comparison_rules
+
+
+def read_chunks(source, columns, chunk_size):
+    '''Chunks of a CSV file, Parquet file, or a list of DataFrames containing only columns.
+
+    Records in files are indexed by row number.
+    '''
+
+    if not isinstance(source, str):
+        for chunk in source:
+            missing = [col for col in columns if col not in chunk]
+            if len(missing)>0:
+                raise _exceptions.MissingColumn(f'Argument columns not in DataFrame: {missing}')
+            yield chunk[columns]
+        return
+
+    if os.path.splitext(source)[1].lower() in ['.parquet', '.pq']:
+        chunks = _parquet.read_batches(source, columns, chunk_size)
+    else:
+        # read as text to preserve values such as leading zeros
+        chunks = pd.read_csv(source, usecols=columns, chunksize=chunk_size, dtype=str)
+
+    start = 0
+    for chunk in chunks:
+        chunk.index = pd.RangeIndex(start, start+len(chunk))
+        start += len(chunk)
+        yield chunk
+
+
+def spill_file(directory, name, frame, number, extension):
+
+    return os.path.join(directory, f'{name}_{frame}_{number}{extension}')
+
+
+def read_index(directory, frame):
+    '''Original index of each chunk spilled while assigning nodes, in order of the chunks.'''
+
+    number = 0
+    while os.path.exists(spill_file(directory, 'index', frame, number, '.pkl')):
+        yield pd.read_pickle(spill_file(directory, 'index', frame, number, '.pkl'))
+        number += 1
+
+
+def prepare_chunks(source, frame, seed, columns, category, chunk_size, clean_options, directory):
+    '''Assign nodes, flatten, and clean each chunk, spilling the original index and cleaned values to disk.
+
+    Returns
+    -------
+    size (int): number of records
+    files (list): file of cleaned values for each chunk
+    hashed (list): hash of each cleaned value in each chunk
+    node (list): node of each cleaned value in each chunk
+    '''
+
+    text_cleaner = comparison_rules[category]['cleaner']
+
+    start = seed
+    files, hashed, node = [], [], []
+    for number, chunk in enumerate(read_chunks(source, _prepare.source_columns(columns), chunk_size)):
+
+        # assign nodes after nodes of previous chunks, replacing the original index spilled by a previous source
+        index_file = spill_file(directory, 'index', frame, number, '.pkl')
+        pd.Series(chunk.index, index=pd.RangeIndex(seed, seed+len(chunk), name='node'), name=f'{frame}_index').to_pickle(index_file)
+        chunk.index = pd.RangeIndex(seed, seed+len(chunk), name='node')
+        seed += len(chunk)
+
+        # create a single column then clean text
+        values, _ = _prepare.flatten({'df': chunk, 'df2': None}, columns, category)
+        values, _ = _prepare.clean(values, category, text_cleaner, **clean_options)
+        values = values['df'].dropna()
+
+        files.append(spill_file(directory, category, frame, number, '.pkl'))
+        values.to_pickle(files[-1])
+
+        # compact hash of values to exactly match across chunks
+        hashed.append(pd.util.hash_array(values.to_numpy(dtype=object)))
+        node.append(values.index.get_level_values('node').to_numpy(dtype='int64'))
+
+    # remove the original index of later chunks spilled by a previous source with more chunks
+    number = len(files)
+    while os.path.exists(spill_file(directory, 'index', frame, number, '.pkl')):
+        os.remove(spill_file(directory, 'index', frame, number, '.pkl'))
+        number += 1
+
+    return seed-start, files, hashed, node
+
+
+def _shared_rows(hashed):
+    '''Sorted positions of hashes that occur more than once.'''
+
+    _, inverse, count = np.unique(hashed, return_inverse=True, return_counts=True)
+
+    return np.flatnonzero(count[inverse.reshape(-1)]>1)
+
+
+def read_rows(files, size, rows):
+    '''Cleaned values at sorted positions of rows in spilled chunks, reading only chunks containing a row.
+
+    Parameters
+    ----------
+    files (list): file of cleaned values for each chunk
+    size (list): number of values in each chunk
+    rows (numpy.ndarray): sorted positions of values in the concatenation of every chunk
+
+    Returns
+    -------
+    values (numpy.ndarray): values in the order of rows
+    '''
+
+    values = np.empty(len(rows), dtype=object)
+    start = np.concatenate([[0], np.cumsum(size)])
+    for file, first, last in zip(files, start[:-1], start[1:]):
+        found = slice(np.searchsorted(rows, first), np.searchsorted(rows, last))
+        if found.start<found.stop:
+            values[found] = pd.read_pickle(file).to_numpy(dtype=object)[rows[found]-first]
+
+    return values
+
+
+def shared_values(hashed, files, size):
+    '''Sorted positions of hashes that occur more than once with their cleaned values, reading each chunk at most once.
+
+    Parameters
+    ----------
+    hashed (numpy.ndarray): hash of each value in the concatenation of every chunk
+    files (list): file of cleaned values for each chunk
+    size (list): number of values in each chunk
+
+    Returns
+    -------
+    shared (tuple): positions and values of hashes that occur more than once
+    '''
+
+    rows = _shared_rows(hashed)
+
+    return rows, read_rows(files, size, rows)
+
+
+def exact_edges(hashed, node, shared=None):
+    '''Edges from the first node of each value to other nodes with the same value.
+
+    Parameters
+    ----------
+    hashed (numpy.ndarray): hash of each value, or the value itself if shared is None
+    node (numpy.ndarray): node of each value
+    shared (tuple, default=None): positions and values from shared_values used to compare values with the same hash
+
+    Returns
+    -------
+    source, target (numpy.ndarray): first node and other nodes of each value
+    '''
+
+    if shared is not None:
+        # different values may have the same hash, so values sharing a hash are grouped by the actual value
+        rows, values = shared
+        hashed, node = pd.factorize(values)[0], node[rows]
+
+    order = np.argsort(hashed, kind='stable')
+    hashed, node = hashed[order], node[order]
+    first = np.concatenate([[True], hashed[1:]!=hashed[:-1]])
+    first_node = node[first][np.cumsum(first)-1]
+    keep = first_node!=node
+
+    return first_node[keep], node[keep]
+
+
+def first_value(hashed, shared=None):
+    '''True for the first occurrence of each value, since later duplicates are exact matches.
+
+    If shared positions and values are provided, the first occurrence of each actual value sharing a hash is kept. The
+    positions may include hashes that occur once.
+    '''
+
+    _, first = np.unique(hashed, return_index=True)
+    keep = np.zeros(len(hashed), dtype='bool')
+    keep[first] = True
+
+    if shared is not None:
+        rows, values = shared
+        _, first = np.unique(pd.factorize(values)[0], return_index=True)
+        keep[rows[first]] = True
+
+    return keep
+
+
+def vectorize_chunks(files, keep, vectorizer, fit, directory, category, frame):
+    '''Transform the first occurrence of values in each chunk to tfidf, spilling each chunk to disk.
+
+    Parameters
+    ----------
+    files (list): file of cleaned values for each chunk
+    keep (list): boolean array for each chunk that is True for values to transform
+    vectorizer (_hashing.hashing_tfidf): vectorizer fit in chunks
+    fit (bool): update the document frequency before transforming
+    '''
+
+    # estimate document frequency using every chunk before transforming
+    if fit:
+        for file, rows in zip(files, keep):
+            vectorizer.partial_fit(pd.read_pickle(file)[rows].array)
+
+    spilled = []
+    for number, (file, rows) in enumerate(zip(files, keep)):
+        values = pd.read_pickle(file)[rows]
+        tfidf_file = spill_file(directory, f'{category}_tfidf', frame, number, '.npz')
+        node_file = spill_file(directory, f'{category}_node', frame, number, '.npy')
+        sparse.save_npz(tfidf_file, _compare_records.compact_tfidf(vectorizer.transform(values.array)))
+        np.save(node_file, values.index.get_level_values('node').to_numpy(dtype='int64'))
+        spilled.append((tfidf_file, node_file))
+
+    return spilled
+
+
+def search_chunks(query, target, kneighbors, threshold, symmetric):
+    '''Similar nodes between spilled query and target chunks with a score meeting threshold.
+
+    Only one query chunk and one target chunk are loaded at a time. If symmetric, query and target are the same chunks
+    and each pair is kept once.
+    '''
+
+    source, destination, score = [np.array([], dtype='int64')], [np.array([], dtype='int64')], [np.array([], dtype='float32')]
+    for query_number, (query_file, query_node) in enumerate(query):
+
+        query_tfidf = sparse.load_npz(query_file)
+        query_node = np.load(query_node)
+
+        found = []
+        for target_number, (target_file, target_node) in enumerate(target):
+            # pairs in earlier chunks were already found if every pair meeting the threshold is searched
+            if symmetric and kneighbors is None and target_number<query_number:
+                continue
+            index = _similarity.brute_force_search().fit(sparse.load_npz(target_file))
+            if kneighbors is None:
+                rows, columns, scores = index.query_radius(query_tfidf, threshold, symmetric=symmetric and target_number==query_number)
+            else:
+                rows, columns, scores = index.query(query_tfidf, kneighbors)
+            found.append((rows, np.load(target_node)[columns], scores))
+
+        if len(found)==0:
+            continue
+        rows = np.concatenate([f[0] for f in found])
+        nodes = np.concatenate([f[1] for f in found])
+        scores = np.concatenate([f[2] for f in found]).astype('float32')
+
+        # keep the most similar kneighbors from every target chunk
+        if kneighbors is not None:
+            order = np.lexsort((-scores, rows))
+            rows, nodes, scores = rows[order], nodes[order], scores[order]
+            rank = np.arange(len(rows))-np.searchsorted(rows, rows)
+            keep = rank<kneighbors
+            rows, nodes, scores = rows[keep], nodes[keep], scores[keep]
+
+        # only edges meeting the threshold are kept in memory
+        keep = (scores>=threshold) & (query_node[rows]!=nodes)
+        source.append(query_node[rows][keep])
+        destination.append(nodes[keep])
+        score.append(scores[keep])
+
+    source, destination, score = np.concatenate(source), np.concatenate(destination), np.concatenate(score)
+
+    # keep each pair once since nodes were compared to themselves
+    if symmetric:
+        keep = _similarity.unique_pairs(source, destination)
+        source, destination, score = source[keep], destination[keep], score[keep]
+
+    return source, destination, score
+
+
+def component_id(source, target, seed=None):
+    '''Id of each node connected by an edge, only keeping components with a node of at least seed if provided.'''
+
+    components = _disjoint_set.disjoint_set(np.concatenate([source, target]))
+    components.union(source, target)
+    node = components.elements
+    labels = components.labels(node)
+
+    # components must link the first df to the second df
+    if seed is not None:
+        linked = np.unique(labels[node>=seed])
+        keep = np.isin(labels, linked)
+        node = node[keep]
+        _, labels = np.unique(labels[keep], return_inverse=True)
+
+    return node, labels.reshape(-1)
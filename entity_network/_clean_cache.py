@@ -0,0 +1,170 @@
+import sys
+import sqlite3
+import hashlib
+import inspect
+import json
+from functools import partial
+
+import pandas as pd
+
+class clean_cache():
+
+    def __init__(self, path, max_size=1000000):
+        '''SQLite key/value store of cleaned text persisted between runs.
+
+        Keys are a hash of the category, the source code of the cleaner and the package modules it uses, the cleaner
+        arguments, the category rules and the raw value. The least recently used values are evicted once more than
+        max_size values are stored.
+
+        Parameters
+        ----------
+        path (str): SQLite database file, created if it doesn't exist
+        max_size (int, default=1000000): maximum number of cleaned values stored
+        '''
+
+        self.max_size = max_size
+
+        # wait on other processes writing to the same file
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS cleaned (key BLOB PRIMARY KEY, value TEXT, used INTEGER)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS cleaned_used ON cleaned (used)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS counter (name TEXT PRIMARY KEY, value INTEGER)')
+        self.connection.executemany('INSERT OR IGNORE INTO counter VALUES (?, 0)', [('hit',), ('miss',), ('used',)])
+        self.connection.commit()
+
+
+    def close(self):
+
+        self.connection.close()
+
+
+    @staticmethod
+    def _sources(module):
+        '''Source of a module and the package modules it uses, with versions of other modules it imports.'''
+
+        package = module.__name__.split('.')[0]
+        sources, versions, pending = {}, {}, [module]
+        while len(pending)>0:
+            module = pending.pop()
+            if module.__name__ in sources:
+                continue
+            sources[module.__name__] = inspect.getsource(module)
+            for name, obj in vars(module).items():
+                used = obj if inspect.ismodule(obj) else inspect.getmodule(obj)
+                if used is None or name.startswith('__'):
+                    continue
+                if used.__name__.split('.')[0]==package:
+                    pending.append(used)
+                else:
+                    top = sys.modules.get(used.__name__.split('.')[0])
+                    versions[top.__name__] = getattr(top, '__version__', None)
+
+        return sources, versions
+
+
+    @staticmethod
+    def fingerprint(category, text_cleaner, rules):
+        '''Version of a cleaner that changes if the cleaning code, cleaner arguments, or category rules change.
+
+        Parameters
+        ----------
+        category (str): category name
+        text_cleaner (callable): cleaning function, possibly a functools.partial with arguments
+        rules (dict): comparison rules of the category such as stopwords
+
+        Returns
+        -------
+        fingerprint (str): hash of the cleaner version
+        '''
+
+        # arguments bound to the cleaner
+        arguments = []
+        while isinstance(text_cleaner, partial):
+            arguments.append([text_cleaner.args, text_cleaner.keywords])
+            text_cleaner = text_cleaner.func
+        arguments.append([text_cleaner.__defaults__, text_cleaner.__kwdefaults__])
+
+        # source of the cleaner and the package modules it depends on
+        module = inspect.getmodule(text_cleaner)
+        if module is not None:
+            sources, versions = clean_cache._sources(module)
+        else:
+            sources, versions = {None: inspect.getsource(text_cleaner)}, {}
+
+        rules = {name: rule for name, rule in (rules or {}).items() if not callable(rule)}
+        version = json.dumps([category, text_cleaner.__qualname__, arguments, rules, sources, versions], default=str, sort_keys=True)
+
+        return hashlib.sha256(version.encode()).hexdigest()
+
+
+    @staticmethod
+    def keys(fingerprint, values):
+        '''Hash of the fingerprint and each raw value.'''
+
+        return [hashlib.sha256(f'{fingerprint}\x1f{value}'.encode()).digest() for value in values]
+
+
+    def _select(self, keys, batch_size=500):
+
+        # query in batches under the SQLite variable limit
+        found = {}
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start+batch_size]
+            rows = self.connection.execute(
+                f'SELECT key, value FROM cleaned WHERE key IN ({",".join("?"*len(batch))})', batch
+            )
+            found.update(rows.fetchall())
+
+        return found
+
+
+    def get(self, keys):
+        '''Cleaned values for keys, with NA for keys that aren't stored.
+
+        Parameters
+        ----------
+        keys (list): keys from clean_cache.keys
+
+        Returns
+        -------
+        cleaned (pandas.Series): cleaned values in the order of keys
+        hit (pandas.Series): boolean True if the key was stored
+        '''
+
+        found = self._select(keys)
+        hit = pd.Series([key in found for key in keys], dtype='bool')
+        cleaned = pd.Series([found.get(key, pd.NA) for key in keys], dtype='string')
+
+        # mark values as recently used
+        used = self._counter('used')+1
+        self.connection.executemany('UPDATE cleaned SET used=? WHERE key=?', [(used, key) for key in found.keys()])
+        self.connection.execute("UPDATE counter SET value=value+? WHERE name='hit'", (int(hit.sum()),))
+        self.connection.execute("UPDATE counter SET value=value+? WHERE name='miss'", (int((~hit).sum()),))
+        self.connection.execute("UPDATE counter SET value=? WHERE name='used'", (used,))
+        self.connection.commit()
+
+        return cleaned, hit
+
+
+    def put(self, keys, cleaned):
+        '''Store cleaned values then evict the least recently used values over max_size.'''
+
+        used = self._counter('used')
+        cleaned = [None if pd.isna(value) else value for value in cleaned]
+        self.connection.executemany('INSERT OR REPLACE INTO cleaned VALUES (?, ?, ?)', [(key, value, used) for key, value in zip(keys, cleaned)])
+
+        excess = self.connection.execute('SELECT COUNT(*) FROM cleaned').fetchone()[0]-self.max_size
+        if excess>0:
+            self.connection.execute('DELETE FROM cleaned WHERE key IN (SELECT key FROM cleaned ORDER BY used LIMIT ?)', (excess,))
+        self.connection.commit()
+
+
+    def _counter(self, name):
+
+        return self.connection.execute('SELECT value FROM counter WHERE name=?', (name,)).fetchone()[0]
+
+
+    def counters(self):
+        '''Total hits and misses since the cache file was created.'''
+
+        return {'hit': self._counter('hit'), 'miss': self._counter('miss')}
@@ -1,182 +1,557 @@
+import os
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
-import nmslib
-from scipy.sparse import lil_matrix
-from scipy.sparse.csgraph import connected_components
 
-from entity_network import _index
+from entity_network import _index, _disjoint_set, _exceptions, _similarity, _hashing
+
+def _dense_rank(present):
+    '''Consecutive ids of present groups in the order of their codes, similar to ngroup of only present groups.'''
+
+    return np.cumsum(present)-1
+
+
+def _first_position(codes, n_groups):
+    '''Position of the first value in each group.'''
+
+    first = np.full(n_groups, -1, dtype='int64')
+    valid = codes>=0
+    group, position = np.unique(codes[valid], return_index=True)
+    first[group] = np.flatnonzero(valid)[position]
+
+    return first
+
 
 def exact_match(values):
+    '''Label values that exactly match another value using a single factorization of df and df2 values.
+
+    Parameters
+    ----------
+    values (dict): cleaned values of df and df2 indexed by node and column
+
+    Returns
+    -------
+    related_feature (pandas.DataFrame): node, column, and id_exact of values equal to another value, or between df and df2
+    df_exact (pandas.DataFrame|None): node, column, and id of duplicated values in df indexed by the first node with the value
+    '''
+
+    # group codes of equal values with sorted codes to number ids in the order of values, missing values are -1
+    n_df = len(values['df'])
+    compare = values['df'] if values['df2'] is None else pd.concat([values['df'], values['df2']])
+    codes, uniques = pd.factorize(compare.array, sort=True)
+    n_groups = len(uniques)
+
+    # number of values of each group in df
+    valid_df = codes[:n_df]>=0
+    count_df = np.bincount(codes[:n_df][valid_df], minlength=n_groups)
 
     if values['df2'] is None:
         # compare values in single dataframe if that is all that is given
-        compare = values['df']
+        matched = count_df>1
         df_exact = None
     else:
         # compare values in df and df2
-        compare = pd.concat([
-            values['df'][values['df'].isin(values['df2'])], 
-            values['df2'][values['df2'].isin(values['df'])]
-        ])
+        valid_df2 = codes[n_df:]>=0
+        matched = (count_df>0) & (np.bincount(codes[n_df:][valid_df2], minlength=n_groups)>0)
+
         # exact matches in the first df to later combine with matches with the second df
-        df_exact = values['df'][values['df'].duplicated(keep=False)]
-        df_exact = df_exact.groupby(df_exact).ngroup()
-        df_exact.name = 'id'
-        df_exact = df_exact.reset_index()
-        fill = df_exact.groupby('id').nth(0)[['node']]
-        fill = fill.rename(columns={'node': 'node_first'})
-        df_exact = df_exact.merge(fill, on='id')
-        df_exact = df_exact[df_exact['node']!=df_exact['node_first']]
+        duplicated = count_df>1
+        first = _first_position(codes[:n_df], n_groups)
+        node = values['df'].index.get_level_values('node').to_numpy()
+        keep = np.flatnonzero(valid_df)
+        keep = keep[duplicated[codes[keep]]]
+        # group duplicates in the order each value first appears
+        keep = keep[np.argsort(first[codes[keep]], kind='stable')]
+        node_first = node[first[codes[keep]]]
+        keep, node_first = keep[node[keep]!=node_first], node_first[node[keep]!=node_first]
         # set the index as the first node for a group of exact matches
-        df_exact = df_exact.set_index(keys='node_first')
+        df_exact = values['df'].index[keep].to_frame(index=False)
+        df_exact['id'] = _dense_rank(duplicated)[codes[keep]]
+        df_exact.index = pd.Index(node_first, name='node_first')
 
     # label exact matches with an id
-    related_feature = compare[compare.duplicated(keep=False) & compare.notna()]
-    related_feature = related_feature.groupby(related_feature)
-    related_feature = related_feature.ngroup()
-    related_feature = related_feature.reset_index()
-    related_feature.columns = ['node','column','id_exact']
+    keep = np.flatnonzero(codes>=0)
+    keep = keep[matched[codes[keep]]]
+    related_feature = compare.index[keep].to_frame(index=False)
+    related_feature['id_exact'] = _dense_rank(matched)[codes[keep]]
 
     return related_feature, df_exact
 
-def fill_exact(related_feature, similar_score, exact):
+def _first_rows(exact, feature):
+    '''Positions of exact duplicates and rows of feature for the first node of the duplicates.'''
+
+    # rows of feature sorted by node to find the rows of each first node
+    node = feature.index.to_numpy()
+    order = np.argsort(node, kind='stable')
+    first = exact.index.to_numpy()
+    start = np.searchsorted(node[order], first, side='left')
+    count = np.searchsorted(node[order], first, side='right')-start
+
+    # pair each duplicate with every row of its first node
+    duplicate = np.repeat(np.arange(len(exact)), count)
+    offset = np.arange(count.sum())-np.repeat(np.cumsum(count)-count, count)
+    row = order[np.repeat(start, count)+offset]
+
+    # order pairs by first node similar to joining on the index
+    paired = np.argsort(first[duplicate], kind='stable')
+
+    return duplicate[paired], row[paired]
+
+def _block_codes(block_key):
+    '''Integer code of the blocking key of df and df2 indexed by node, with -1 for a missing key.'''
+
+    key = pd.concat([key for key in block_key.values() if key is not None])
+    codes, _ = pd.factorize(key)
+
+    return pd.Series(codes, index=key.index)
+
+def _same_block(block_key, node, node_similar):
+    '''Whether each pair of nodes shares a blocking key, where a missing key is never shared.'''
+
+    codes = _block_codes(block_key)
+    node, node_similar = codes.reindex(node).to_numpy(), codes.reindex(node_similar).to_numpy()
+
+    return (node==node_similar) & (node>=0)
+
+def fill_exact(related_feature, similar_score, exact, block_key=None):
+    '''Include values duplicated in the first df using the exact and similar matches of the first node with the value.
+
+    Parameters
+    ----------
+    related_feature (pandas.DataFrame): exact and similar ids of values
+    similar_score (pandas.DataFrame): similarity score of values indexed by node_similar
+    exact (pandas.DataFrame|None): node, column, and id of duplicated values in df indexed by the first node with the value
+    block_key (dict, default=None): blocking key for df and df2 indexed by node, similar scores are only filled within the same key
+
+    Returns
+    -------
+    related_feature (pandas.DataFrame): exact and similar ids including duplicated values
+    similar_score (pandas.DataFrame): similarity score including duplicated values
+    '''
 
     if exact is not None:
         fill = related_feature.set_index('node').drop(columns='column')
-        fill = exact.merge(fill, left_index=True, right_index=True)
-        fill = fill.drop(columns='id')
+        duplicate, row = _first_rows(exact, fill)
+        fill = fill.iloc[row].reset_index(drop=True)
+        fill.insert(0, 'node', exact['node'].to_numpy()[duplicate])
+        fill.insert(1, 'column', exact['column'].to_numpy()[duplicate])
         related_feature = pd.concat([related_feature, fill], ignore_index=True)
 
         fill = similar_score.reset_index().set_index('node').drop(columns='column')
-        fill = exact.merge(fill, left_index=True, right_index=True)
-        fill = fill.set_index('node_similar')
-        fill = fill.drop(columns='id')
+        duplicate, row = _first_rows(exact, fill)
+        fill = fill.iloc[row]
+        fill.index = pd.Index(fill['node_similar'].to_numpy(), name='node_similar')
+        fill = fill.drop(columns='node_similar')
+        fill.insert(0, 'node', exact['node'].to_numpy()[duplicate])
+        fill.insert(1, 'column', exact['column'].to_numpy()[duplicate])
+        if block_key is not None:
+            # a duplicate in another block was not compared to values similar to the first node
+            fill = fill[_same_block(block_key, fill['node'].to_numpy(), fill.index.to_numpy())]
         similar_score = pd.concat([similar_score, fill], ignore_index=False)
 
     return related_feature, similar_score
 
+def node_dtype(nodes):
+    '''Smallest integer dtype of int32 or int64 that holds node values.'''
 
-def create_tfidf(values, text_comparer):
+    if len(nodes)>0 and nodes.max()>=np.iinfo('int32').max:
+        return 'int64'
+
+    return 'int32'
+
+def compact_tfidf(tfidf):
+    '''CSR matrix with float32 data and int32 indices if the number of stored values fits.'''
+
+    tfidf = tfidf.tocsr().astype('float32', copy=False)
+    if tfidf.nnz<np.iinfo('int32').max and max(tfidf.shape)<np.iinfo('int32').max:
+        tfidf.indices = tfidf.indices.astype('int32', copy=False)
+        tfidf.indptr = tfidf.indptr.astype('int32', copy=False)
+
+    return tfidf
+
+# relative cost of querying a value compared to indexing a value
+_QUERY_COST = 4
+
+def index_frame(values):
+    '''Frame to index when comparing two dataframes, querying with the frame that has fewer unique values.
+
+    Each query has overhead for finding and sorting neighbors that is larger than adding a value to the index, so the
+    estimated cost of indexing one frame and querying the other is lower when the larger frame is indexed.
+    '''
+
+    # estimate cost from values remaining after duplicates and nulls are removed
+    size = {frame: values[frame].nunique() for frame in ['df','df2']}
+    cost = {
+        'df': size['df']+_QUERY_COST*size['df2'],
+        'df2': size['df2']+_QUERY_COST*size['df']
+    }
+
+    # keep indexing the first df unless indexing the second is cheaper
+    return 'df2' if cost['df2']<cost['df'] else 'df'
+
+def unique_values(values, block_key=None):
+    '''Remove duplicated and missing values of each frame in place, keeping a duplicate in each block it appears in.'''
 
-    # remove duplicates and nulls to lower kneighbors parameter needed
     for frame in values.keys():
         if values[frame] is not None:
             # remove duplicates in the same dataframe or other frame identified in previous step
             # values[frame] = values[frame][~values[frame].index.get_level_values('node').isin(related_feature['node'])]
-            values[frame] = values[frame].drop_duplicates()
+            if block_key is None:
+                values[frame] = values[frame].drop_duplicates()
+            else:
+                # keep a duplicated value in each block it appears in
+                key = block_key[frame].reindex(values[frame].index.get_level_values('node')).to_numpy()
+                duplicated = pd.DataFrame({'value': values[frame].to_numpy(), 'block': key}).duplicated().to_numpy()
+                values[frame] = values[frame][~duplicated]
             # remove missing values that were completely removed during preprocessing
             values[frame] = values[frame].dropna()
 
-    # define vectorizer to transform text to numbers
-    vectorizer = TfidfVectorizer(
-        # create features using words or characters
-        analyzer=text_comparer,
-        # require 1 alphanumeric character instead of 2 to identify a word 
-        token_pattern=r'(?u)\b\w+\b',
-        # performed during preprocessing
-        lowercase=False, 
-        # removed during preprocessing
-        stop_words=None
-    )
+    return values
+
+def create_tfidf(values, text_comparer, vectorizer=None, block_key=None, fit_frame='df', hash_features=None):
+
+    # remove duplicates and nulls to lower kneighbors parameter needed
+    values = unique_values(values, block_key)
+
+    # define vectorizer to transform text to numbers unless previously fit
+    fit = vectorizer is None
+    if fit:
+        vectorizer = _vectorizer(text_comparer, hash_features)
 
     # create tfidf and a map between tfidf_index and nodes
     tfidf = {'df': None, 'df2': None}
     tfidf_index = {'df': None, 'df2': None}
-    for frame, data in values.items():
+    for frame, data in sorted(values.items(), key=lambda item: item[0]!=fit_frame):
         # skip df2 if not provided
         if data is None:
             continue
-        # transform text to tfidf
-        if frame=='df':
-            tfidf[frame] = vectorizer.fit_transform(data.to_list())
+        # transform text to tfidf using the vocabulary of the indexed frame since other terms can't match
+        if frame==fit_frame and fit:
+            tfidf[frame] = vectorizer.fit_transform(data.array)
         else:
-            tfidf[frame] = vectorizer.transform(data.to_list())
+            tfidf[frame] = vectorizer.transform(data.array)
+        # half the memory for searching with enough precision for similarity scores
+        tfidf[frame] = compact_tfidf(tfidf[frame])
         # create TF-IDF index relation to original data index
         tfidf_index[frame] = data.index.to_frame(index=False, name=['node','column'])
         tfidf_index[frame].index.name = 'tfidf_index'
 
-    return tfidf, tfidf_index
+    return tfidf, tfidf_index, vectorizer
+
+def saved_tfidf(state, values):
+    '''TF-IDF of the first df from a saved index, transforming only values of the second df.
+
+    Parameters
+    ----------
+    state (dict): saved index from load_index
+    values (dict): cleaned values of df and df2
+
+    Returns
+    -------
+    tfidf (dict): tfidf of df and df2
+    tfidf_index (dict): node and column of each tfidf row for df and df2
+    vectorizer: fitted vectorizer of the saved index
+    '''
+
+    # use the saved index if created from the same values
+    values = unique_values(values)
+    check_index(state, values['df'])
+
+    # rows of the saved tfidf are in the order of the saved nodes
+    tfidf = {'df': state['tfidf'], 'df2': None}
+    tfidf_index = {'df': pd.DataFrame({'node': state['node'], 'column': state['column']}), 'df2': None}
+    tfidf_index['df'].index.name = 'tfidf_index'
+
+    if values['df2'] is not None:
+        tfidf['df2'] = compact_tfidf(state['vectorizer'].transform(values['df2'].array))
+        tfidf_index['df2'] = values['df2'].index.to_frame(index=False, name=['node','column'])
+        tfidf_index['df2'].index.name = 'tfidf_index'
+
+    return tfidf, tfidf_index, state['vectorizer']
+
+def _vectorizer(text_comparer, hash_features=None):
+
+    # hash features to bound memory instead of storing a vocabulary
+    if hash_features is not None:
+        return _hashing.hashing_tfidf(text_comparer, hash_features)
+
+    vectorizer = TfidfVectorizer(
+        # create features using words or characters
+        analyzer=text_comparer,
+        # require 1 alphanumeric character instead of 2 to identify a word 
+        token_pattern=r'(?u)\b\w+\b',
+        # performed during preprocessing
+        lowercase=False, 
+        # removed during preprocessing
+        stop_words=None
+    )
+
+    return vectorizer
+
+def create_index(tfidf, backend=None, indexed='df'):
+
+    index = _similarity.init_index(backend)
+    index.fit(tfidf[indexed])
+
+    return index
+
+def _index_files(directory, category):
+
+    state_file = os.path.join(directory, f'{category}_state.npz')
+    # file extension added by the backend
+    index_file = os.path.join(directory, f'{category}_index')
+
+    return state_file, index_file
+
+def _values_hash(values):
+
+    hashed = pd.util.hash_pandas_object(values, index=True).to_numpy()
+
+    return hashlib.sha256(hashed.tobytes()).hexdigest()
+
+def save_index(directory, category, vectorizer, index, tfidf_index, values, tfidf=None):
+
+    os.makedirs(directory, exist_ok=True)
+    state_file, index_file = _index_files(directory, category)
+
+    # vectorizer vocabulary/idf and the indexed values used to detect a stale index
+    if isinstance(vectorizer, _hashing.hashing_tfidf):
+        terms = np.array([], dtype=str)
+        hash_features, n_documents = vectorizer.n_features, vectorizer.n_documents
+    else:
+        vocabulary = vectorizer.vocabulary_
+        terms = np.array(sorted(vocabulary, key=vocabulary.get), dtype=str)
+        hash_features, n_documents = 0, 0
+    # indexed tfidf so a loaded index is queried without transforming the indexed values
+    if tfidf is None:
+        tfidf = sparse.csr_matrix((0, 0), dtype='float32')
+    np.savez(
+        state_file,
+        tfidf_data=tfidf.data,
+        tfidf_indices=tfidf.indices,
+        tfidf_indptr=tfidf.indptr,
+        tfidf_shape=np.array(tfidf.shape),
+        analyzer=np.array(vectorizer.analyzer),
+        terms=terms,
+        idf=vectorizer.idf_,
+        hash_features=np.array(hash_features),
+        n_documents=np.array(n_documents),
+        node=tfidf_index['node'].to_numpy(dtype='int64'),
+        column=tfidf_index['column'].to_numpy(dtype=str),
+        values_hash=np.array(_values_hash(values)),
+        backend=np.array(index.name)
+    )
 
-def similar_match(tfidf, tfidf_index, kneighbors):
+    index.save(index_file)
+
+def load_index(directory, category, backend=None, hash_features=None):
+
+    state_file, index_file = _index_files(directory, category)
+    if not os.path.exists(state_file):
+        return None
+    with np.load(state_file, allow_pickle=False) as saved:
+        state = {key: saved[key] for key in saved.files}
+
+    # the saved backend is used unless a specific backend is requested
+    saved_backend = str(state['backend'])
+    if backend is not None and _similarity.backend_name(backend)!=saved_backend:
+        raise _exceptions.StaleIndex(f'Saved index was created using backend {saved_backend}. Remove the saved files to recreate the index.')
+    # features are hashed if saved with a number of hashed features
+    saved_features = int(state['hash_features']) if 'hash_features' in state else 0
+    if hash_features is not None and hash_features!=saved_features:
+        raise _exceptions.StaleIndex(f'Saved index was created using hash_features={saved_features or None}. Remove the saved files to recreate the index.')
+    index = _similarity.init_index(saved_backend)
+    if not os.path.exists(index_file+index.extension):
+        return None
+
+    # reconstruct the fitted vectorizer
+    if saved_features>0:
+        vectorizer = _vectorizer(str(state['analyzer']), saved_features)
+        vectorizer.n_documents = int(state['n_documents'])
+        # recover document frequency from the smoothed idf to continue fitting
+        vectorizer.document_frequency = np.rint((1+vectorizer.n_documents)/np.exp(state['idf']-1)-1).astype('int64')
+    else:
+        vectorizer = _vectorizer(str(state['analyzer']))
+        vectorizer.vocabulary_ = {term: idx for idx, term in enumerate(state['terms'].tolist())}
+    vectorizer.idf_ = state['idf']
+    state['vectorizer'] = vectorizer
+    state['tfidf'] = sparse.csr_matrix((state['tfidf_data'], state['tfidf_indices'], state['tfidf_indptr']), shape=tuple(state['tfidf_shape']))
+
+    # load the index and data without recreating
+    state['index'] = index.load(index_file)
+
+    return state
 
-    # initialize non-metric space libary for sparse matrix searching
-    index = nmslib.init(method='simple_invindx', space='negdotprod_sparse_fast', data_type=nmslib.DataType.SPARSE_VECTOR) 
-    index.addDataPointBatch(tfidf['df'])
-    index.createIndex()
+def check_index(state, values):
+
+    # node and column are part of the hashed index of values
+    stale = len(state['node'])!=len(values) or str(state['values_hash'])!=_values_hash(values)
+    if stale:
+        raise _exceptions.StaleIndex('Saved index was created using different values. Remove the saved files to recreate the index.')
+
+def _query_frame(tfidf, indexed='df'):
 
     # find similar features matching above
-    # TODO: ignore first half since it will be repeated information?
     if tfidf['df2'] is None:
         # find similar values for the first df in the first df
-        neighbors = index.knnQueryBatch(tfidf['df'], k=kneighbors, num_threads=4)
-    else:
+        return 'df'
+    elif indexed=='df':
         # find similar vlaues for the first df in the second df
-        neighbors = index.knnQueryBatch(tfidf['df2'], k=kneighbors, num_threads=4)
+        return 'df2'
+    else:
+        # find similar values for the second df in the first df
+        return 'df'
+
+def _node_score(tfidf_index, frame, source, target, score, indexed='df'):
+
+    # keep each pair once since the first df is compared to itself
+    if tfidf_index['df2'] is None:
+        keep = _similarity.unique_pairs(source, target)
+        source, target, score = source[keep], target[keep], score[keep]
+
+    # orient scores from the second df to the first df if the second df was indexed
+    if indexed=='df2':
+        source, target, frame = target, source, 'df2'
 
     # replace tfidf_index with node index
-    similar_score = {}
-    for idx, comparison in enumerate(neighbors):
-        if tfidf['df2'] is None:
-            # lookup index in the single dataframe
-            node_source = tfidf_index['df'].at[idx, 'node']
-        else:
-            # lookup node index in the second (smaller) dataframe
-            node_source = tfidf_index['df2'].at[idx, 'node']
-        # lookup node index in the first (larger) or single dataframe
-        node_target = tfidf_index['df'].loc[comparison[0], 'node'].values
-        # adjust score for negative dot product
-        score = comparison[1]*-1
-        # assign values using the first dataframe as the main dataframe
-        similar_score[node_source] =  [node_target, score]
+    dtype = node_dtype(np.concatenate([tfidf_index[frame]['node'].to_numpy(), tfidf_index['df']['node'].to_numpy()]))
+    similar_score = {
+        # node index in the second (smaller) dataframe or the single dataframe
+        'node_source': tfidf_index[frame]['node'].to_numpy(dtype=dtype)[source],
+        # node index in the first (larger) or single dataframe
+        'node_target': tfidf_index['df']['node'].to_numpy(dtype=dtype)[target],
+        # source column of the node in the first or single dataframe
+        'column': tfidf_index['df']['column'].to_numpy()[target],
+        'score': score.astype('float32', copy=False)
+    }
 
     return similar_score
 
+def similar_match(index, tfidf, tfidf_index, kneighbors, threshold=None, indexed='df'):
+
+    frame = _query_frame(tfidf, indexed)
+    if kneighbors is None:
+        # find every value meeting the threshold
+        source, target, score = index.query_radius(tfidf[frame], threshold, symmetric=tfidf['df2'] is None)
+    else:
+        source, target, score = index.query(tfidf[frame], kneighbors)
+
+    return _node_score(tfidf_index, frame, source, target, score, indexed)
+
+def adaptive_match(index, tfidf, tfidf_index, kneighbors, kneighbors_max, threshold, indexed='df'):
+
+    # requery values with kneighbors all meeting the threshold using more kneighbors
+    frame = _query_frame(tfidf, indexed)
+    source, target, score, saturated = _similarity.adaptive_query(index, tfidf[frame], kneighbors, kneighbors_max, threshold)
+
+    return _node_score(tfidf_index, frame, source, target, score, indexed), saturated
+
+def _block_positions(tfidf_index, block_key):
+
+    # integer code of the blocking key for each tfidf row, with -1 for a missing key
+    frames = [frame for frame in ['df','df2'] if tfidf_index[frame] is not None]
+    key = [block_key[frame].reindex(tfidf_index[frame]['node']).to_numpy() for frame in frames]
+    codes, _ = pd.factorize(pd.Series(np.concatenate(key), dtype='object'))
+    codes = np.split(codes, np.cumsum([len(k) for k in key])[:-1])
+
+    # tfidf rows of each frame grouped by block
+    positions = {}
+    for frame, code in zip(frames, codes):
+        order = np.argsort(code, kind='stable')
+        blocks, start = np.unique(code[order], return_index=True)
+        positions[frame] = dict(zip(blocks, np.split(order, start[1:])))
+        positions[frame].pop(-1, None)
+
+    return positions
+
+
+def _match_block(tfidf, tfidf_index, kneighbors, backend, threshold):
+
+    index = create_index(tfidf, backend)
+
+    return similar_match(index, tfidf, tfidf_index, kneighbors, threshold)
+
+
+def block_match(tfidf, tfidf_index, block_key, kneighbors, workers=None, backend=None, threshold=None):
+    '''Find similar values only within values that share the same blocking key.
+
+    Parameters
+    ----------
+    tfidf (dict): tfidf matrix for df and df2 from create_tfidf
+    tfidf_index (dict): node and column of each tfidf row for df and df2
+    block_key (dict): blocking key for df and df2 indexed by node, values with a missing key are not compared
+    kneighbors (int|None): number of neighbors to find in each block, or every neighbor meeting threshold if None
+    workers (int, default=None): number of processes used to compare blocks, compares in the current process if None
+    backend (str, default=None): similarity search backend used for each block
+    threshold (float, default=None): minimum similarity score if kneighbors is None
+
+    Returns
+    -------
+    similar_score (dict): node_source, node_target, column and score arrays from all blocks
+    block_size (numpy.ndarray): number of values in each block
+    '''
+
+    positions = _block_positions(tfidf_index, block_key)
+    frame = 'df' if tfidf['df2'] is None else 'df2'
+
+    # index and query each block that has values to search and compare
+    blocks = []
+    for block, target in positions['df'].items():
+        source = positions[frame].get(block)
+        if source is None:
+            continue
+        blocks.append((
+            {'df': tfidf['df'][target], 'df2': None if tfidf['df2'] is None else tfidf['df2'][source]},
+            {'df': tfidf_index['df'].iloc[target], 'df2': None if tfidf_index['df2'] is None else tfidf_index['df2'].iloc[source]}
+        ))
+    block_size = np.array([sum(len(i) for i in index.values() if i is not None) for _, index in blocks], dtype='int64')
+
+    if workers is None:
+        scores = [_match_block(block_tfidf, block_index, kneighbors, backend, threshold) for block_tfidf, block_index in blocks]
+    else:
+        # many small blocks are compared in seperate processes
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            scores = list(executor.map(
+                _match_block, [b[0] for b in blocks], [b[1] for b in blocks], [kneighbors]*len(blocks), [backend]*len(blocks), [threshold]*len(blocks),
+                chunksize=max(1, len(blocks)//(workers*4))
+            ))
+
+    # combine matches from every block before assigning an id
+    similar_score = {
+        name: np.concatenate([score[name] for score in scores]) if len(scores)>0 else np.array([], dtype=dtype)
+        for name, dtype in [('node_source','int64'), ('node_target','int64'), ('column','object'), ('score','float32')]
+    }
+
+    return similar_score, block_size
+
 def similar_id(similar_score, tfidf_index, threshold):
 
     # TODO: allow a single component difference, such as OccupancyIdentifier for address
 
-    # determine node size needed
-    if tfidf_index['df2'] is None:
-        n = tfidf_index['df']['node'].max()+1
-    else:
-        n = tfidf_index['df2']['node'].max()+1
-    
-    # form list of lists sparse matrix incrementally
-    graph = lil_matrix((n, n), dtype=int)
-    for node_source, comparison in similar_score.items():
-        # assign matrix values that meet threshold
-        node_target = comparison[0][comparison[1]>=threshold]
-        graph[node_source, node_target] = 1
-    # convert to compressed sparse row matrix for better computation
-    graph = graph.tocsr()
-
-    # find connected components to assign an id
-    _, labels = connected_components(graph, directed=False, return_labels=True)
-    similar_feature = pd.DataFrame({
-        'node': range(0, n),
-        'id_similar': labels
-    })
-
-    # include source column info
-    similar_feature = similar_feature.merge(tfidf_index['df'], on='node', how='left')
-    if tfidf_index['df2'] is not None:
-        similar_feature = similar_feature.merge(tfidf_index['df2'], on='node', how='left', suffixes=('','_df2'))
-        similar_feature['column'] =  similar_feature['column'].fillna(similar_feature['column_df2'])
-        similar_feature = similar_feature.drop(columns='column_df2')
-
-    # return ids for the main dataframe only
-    # similar_feature = similar_feature[similar_feature['node'].isin(tfidf_index['df']['node'])]
+    # include source column info for nodes that were compared
+    similar_feature = pd.concat([tfidf_index[frame] for frame in ['df','df2'] if tfidf_index[frame] is not None], ignore_index=True)
+
+    # find connected components of values that meet threshold to assign an id
+    keep = similar_score['score']>=threshold
+    components = _disjoint_set.disjoint_set(similar_feature['node'].to_numpy())
+    components.union(similar_score['node_source'][keep], similar_score['node_target'][keep])
+    similar_feature['id_similar'] = components.labels(similar_feature['node'].to_numpy())
+    similar_feature = similar_feature[['node','id_similar','column']]
 
     return similar_feature
 
 def expand_score(similar_score, similar_feature, threshold):
 
-    # convert from dictionary to dataframe
-    similar_score = pd.DataFrame.from_dict(similar_score, orient='index', columns=['node', 'score'])
-    similar_score.index.name = 'node_similar'
-    similar_score = similar_score.apply(pd.Series.explode)
-    similar_score['node'] = similar_score['node'].astype('Int64')
-    similar_score['score'] = similar_score['score'].astype('Float64')
+    # convert from arrays to dataframe using numpy dtypes since every pair has a node and score
+    similar_score = pd.DataFrame({
+        'node': similar_score['node_target'],
+        'score': similar_score['score'].astype('float32', copy=False),
+        'column': similar_score['column']
+    }, index=pd.Index(similar_score['node_source'], name='node_similar'))
 
     # ignore self matchings records
     similar_score = similar_score[similar_score.index!=similar_score['node']]
@@ -184,14 +559,18 @@ def expand_score(similar_score, similar_feature, threshold):
     # mark scores above threshold
     similar_score['threshold'] = similar_score['score']>=threshold
 
-    # add column source and similar_id to score
-    similar_score = similar_score.merge(similar_feature[['column','id_similar']], left_on='node', right_index=True)
-    similar_score.index.name = 'node_similar'
+    # add similar_id to score, every scored value has an id
+    similar_id = similar_feature.drop_duplicates(subset='node').set_index('node')['id_similar']
+    position = similar_id.index.get_indexer(similar_score['node'])
+    if (position<0).any():
+        raise RuntimeError('Every scored value must have a similar id.')
+    similar_score['id_similar'] = similar_id.to_numpy(dtype='int64')[position]
+    similar_score = similar_score[['node','score','threshold','column','id_similar']]
     similar_score = similar_score.sort_values(by=['id_similar', 'score'], ascending=[True,False])
 
     return similar_score
 
-def combined_id(related_feature, similar_feature, id_category):
+def combined_id(related_feature, similar_feature, id_category, transitive=False):
 
     # only retain values similar to another
     multiple = similar_feature.groupby('id_similar').size()
@@ -202,26 +581,37 @@ def combined_id(related_feature, similar_feature, id_category):
     related_feature = related_feature.merge(similar_feature, on=['node','column'], how='outer', suffixes=('','_similar'))
     related_feature[['id_exact','id_similar']] = related_feature[['id_exact','id_similar']].astype('Int64')
 
+    if transitive:
+        # develop an overall id using connected components of exact ids and similar ids of the same value
+        has_exact = related_feature['id_exact'].notna().to_numpy()
+        has_similar = related_feature['id_similar'].notna().to_numpy()
+        # negative elements for exact ids so the ids of exact matches are labeled first
+        exact = -1-related_feature['id_exact'].fillna(0).to_numpy(dtype='int64')
+        similar = related_feature['id_similar'].fillna(0).to_numpy(dtype='int64')
+        element = np.where(has_exact, exact, similar)
+        both = has_exact & has_similar
+        components = _disjoint_set.disjoint_set(np.concatenate([element, similar[both]]))
+        components.union(exact[both], similar[both])
+        related_feature[id_category] = pd.array(components.labels(element), dtype='Int64')
+        return related_feature, similar_feature
+
     # develop an overall using both similar and exact ids
-    # 1. assume the same exact id for the same similar id
-    connected = related_feature[['id_similar','id_exact']].dropna()
-    connected = connected.groupby('id_similar')
-    connected = connected.agg({'id_exact': 'first'})
-    connected = connected.rename(columns={'id_exact': id_category})
-    related_feature = related_feature.merge(connected, left_on='id_similar', right_index=True, how='left')
+    exact = related_feature['id_exact'].to_numpy(dtype='int64', na_value=-1)
+    similar, _ = pd.factorize(related_feature['id_similar'])
+    # 1. assume the first exact id for the same similar id
+    both = np.flatnonzero((exact>=0) & (similar>=0))
+    group, first = np.unique(similar[both], return_index=True)
+    # the last element is missing for values without a similar id
+    first_exact = np.full(similar.max(initial=-1)+2, -1, dtype='int64')
+    first_exact[group] = exact[both[first]]
+    overall = first_exact[similar]
     # 2. use exact id if not similar
-    related_feature[id_category] = related_feature[id_category].fillna(related_feature['id_exact'])
-    # 3. derive an id if only similar
-    derive = related_feature.loc[related_feature[id_category].isna(),['id_similar']]
-    derive = derive.drop_duplicates()
-    seed = related_feature[id_category].max()+1
-    if pd.isna(seed):
-        seed = 0
-    derive['temp_id'] = range(seed, len(derive)+seed)
-    related_feature = related_feature.merge(derive, on='id_similar', how='left')
-    related_feature['temp_id'] = related_feature['temp_id'].astype('Int64')
-    related_feature[id_category] = related_feature[id_category].fillna(related_feature['temp_id'])
-    related_feature = related_feature.drop(columns='temp_id')
+    overall = np.where(overall<0, exact, overall)
+    # 3. derive an id if only similar, in order of first appearance
+    derive = overall<0
+    seed = overall.max(initial=-1)+1
+    overall[derive] = seed+pd.factorize(similar[derive])[0]
+    related_feature[id_category] = pd.array(overall, dtype='Int64')
 
     return related_feature, similar_feature
 
@@ -236,14 +626,360 @@ def remove_self(related_feature, similar_score, id_category):
 
     return related_feature, similar_score
 
+def append_exact(values, compared, exact, related_feature):
+
+    # appended values and existing values equal to an appended value
+    frame = 'df' if values['df'] is not None else 'df2'
+    appended = values[frame].dropna()
+    existing = {name: data[data.isin(appended)] for name, data in compared.items() if data is not None}
+
+    if compared['df2'] is None:
+        # compare values in single dataframe
+        pool = pd.concat([existing['df'], appended])
+        pool = pool[pool.duplicated(keep=False)]
+    elif frame=='df':
+        # compare values in df, including every appended duplicate, to values in df2
+        first = pd.concat([existing['df'], appended])
+        pool = pd.concat([first[first.isin(existing['df2'])], existing['df2'][existing['df2'].isin(first)]])
+    else:
+        # compare values in df and df2
+        other = pd.concat([existing['df2'], appended])
+        pool = pd.concat([existing['df'][existing['df'].isin(other)], other[other.isin(existing['df'])]])
+        # include duplicated values in the first df removed before finding similar matches
+        if exact is not None:
+            first = pool.reset_index().drop_duplicates(subset='node').set_index('node')[pool.name]
+            fill = exact.merge(first, left_index=True, right_index=True)
+            fill = fill.set_index(['node','column'])[pool.name]
+            pool = pd.concat([pool, fill])
+            pool = pool[~pool.index.duplicated()]
+    pool.name = 'value'
+    pool = pool.reset_index()
+
+    # preserve ids of values that already exactly match
+    ids = related_feature[['node','column','id_exact']].dropna().merge(pool, on=['node','column'])
+    ids = ids[['value','id_exact']].drop_duplicates(subset='value')
+
+    # derive an id for values that now exactly match
+    derive = pool.loc[~pool['value'].isin(ids['value']), ['value']].drop_duplicates()
+    seed = related_feature['id_exact'].max()+1
+    if pd.isna(seed):
+        seed = 0
+    derive['id_exact'] = range(seed, seed+len(derive))
+    ids = pd.concat([ids, derive], ignore_index=True)
+    pool = pool.merge(ids, on='value')
+
+    # add exact matches into existing features
+    related_feature = related_feature.merge(pool[['node','column','id_exact']], on=['node','column'], how='outer', suffixes=('','_appended'))
+    related_feature['id_exact'] = related_feature['id_exact'].fillna(related_feature['id_exact_appended']).astype('Int64')
+    related_feature = related_feature.drop(columns='id_exact_appended')
+
+    return related_feature
+
+def append_tfidf(values, vectorizer, block_key=None):
+
+    # remove duplicates and nulls
+    frame = 'df' if values['df'] is not None else 'df2'
+    if block_key is None:
+        data = values[frame].drop_duplicates().dropna()
+    else:
+        # keep a duplicated value in each block it appears in
+        key = block_key[frame].reindex(values[frame].index.get_level_values('node')).to_numpy()
+        duplicated = pd.DataFrame({'value': values[frame].to_numpy(), 'block': key}).duplicated().to_numpy()
+        data = values[frame][~duplicated].dropna()
+
+    # transform text to tfidf using the existing vocabulary
+    tfidf = compact_tfidf(vectorizer.transform(data.array))
+    tfidf_index = data.index.to_frame(index=False, name=['node','column'])
+    tfidf_index.index.name = 'tfidf_index'
+
+    return tfidf, tfidf_index
+
+def append_match(index, index_nodes, appended, tfidf, tfidf_index, kneighbors, threshold=None, kneighbors_max=None):
+
+    # find similar values in the existing index
+    if kneighbors is None:
+        source, target, score = index.query_radius(tfidf, threshold)
+    elif kneighbors_max is not None:
+        source, target, score, _ = _similarity.adaptive_query(index, tfidf, kneighbors, kneighbors_max, threshold)
+    else:
+        source, target, score = index.query(tfidf, kneighbors)
+    similar_score = {
+        'node_source': [tfidf_index['node'].to_numpy()[source]],
+        'node_target': [index_nodes['node'].to_numpy()[target]],
+        'column': [index_nodes['column'].to_numpy()[target]],
+        'score': [score]
+    }
+
+    # find similar values in appended values not included in the existing index, only maintained for a single df
+    if appended is not None:
+        if kneighbors is None:
+            source, target, score = _similarity.threshold_product(tfidf, appended['tfidf'], threshold)
+        else:
+            source, target, score = _similarity.top_product(tfidf, appended['tfidf'], kneighbors)
+        similar_score['node_source'] += [tfidf_index['node'].to_numpy()[source]]
+        similar_score['node_target'] += [appended['tfidf_index']['node'].to_numpy()[target]]
+        similar_score['column'] += [appended['tfidf_index']['column'].to_numpy()[target]]
+        similar_score['score'] += [score]
+
+    similar_score = {key: np.concatenate(arrays) for key, arrays in similar_score.items()}
+    dtype = node_dtype(np.concatenate([similar_score['node_source'], similar_score['node_target']]))
+    similar_score['node_source'] = similar_score['node_source'].astype(dtype)
+    similar_score['node_target'] = similar_score['node_target'].astype(dtype)
+    similar_score['score'] = similar_score['score'].astype('float32')
+
+    # keep each pair of appended values once
+    if appended is not None:
+        keep = _similarity.unique_pairs(similar_score['node_source'], similar_score['node_target'])
+        similar_score = {key: array[keep] for key, array in similar_score.items()}
+
+    return similar_score
+
+def append_query(query, tfidf, tfidf_index, kneighbors, threshold=None):
+    '''Find similar values in values appended to the indexed first df for each value of the second df.
+
+    The second df queries the first df when comparing two dataframes, so its values are compared again to the appended
+    values instead of querying the appended values against the existing index.
+
+    Parameters
+    ----------
+    query (dict): tfidf and tfidf_index of the second df
+    tfidf (scipy.sparse.csr_matrix): tfidf of values appended to the first df
+    tfidf_index (pandas.DataFrame): node and column of appended values
+    kneighbors (int|None): number of most similar appended values for each value of the second df, or every value meeting threshold if None
+    threshold (float, default=None): minimum score if kneighbors is None
+
+    Returns
+    -------
+    similar_score (dict): node_source of the second df, node_target and column of appended values, and score
+    '''
+
+    if kneighbors is None:
+        source, target, score = _similarity.threshold_product(query['tfidf'], tfidf, threshold)
+    else:
+        source, target, score = _similarity.top_product(query['tfidf'], tfidf, kneighbors)
+    similar_score = {
+        'node_source': query['tfidf_index']['node'].to_numpy()[source],
+        'node_target': tfidf_index['node'].to_numpy()[target],
+        'column': tfidf_index['column'].to_numpy()[target],
+        'score': score.astype('float32')
+    }
+    dtype = node_dtype(np.concatenate([similar_score['node_source'], similar_score['node_target']]))
+    similar_score['node_source'] = similar_score['node_source'].astype(dtype)
+    similar_score['node_target'] = similar_score['node_target'].astype(dtype)
+
+    return similar_score
+
+def append_block(query, target, block_key, kneighbors, threshold=None):
+    '''Find similar values in target for each query value only within values that share the same blocking key.
+
+    Parameters
+    ----------
+    query (dict): tfidf and tfidf_index of values to find similar values for
+    target (dict): tfidf and tfidf_index of values to search, possibly including query values
+    block_key (dict): blocking key for df and df2 indexed by node, values with a missing key are not compared
+    kneighbors (int|None): number of most similar values in the same block, or every value meeting threshold if None
+    threshold (float, default=None): minimum score if kneighbors is None
+
+    Returns
+    -------
+    similar_score (dict): node_source of query values, node_target and column of target values, and score
+    '''
+
+    # integer code of the blocking key for query and target rows, with -1 for a missing key
+    codes = _block_codes(block_key)
+    query_code = codes.reindex(query['tfidf_index']['node']).fillna(-1).to_numpy(dtype='int64')
+    target_code = codes.reindex(target['tfidf_index']['node']).fillna(-1).to_numpy(dtype='int64')
+
+    # compare query rows to target rows of each block
+    found = {'node_source': [], 'node_target': [], 'column': [], 'score': []}
+    for block in np.unique(query_code[query_code>=0]):
+        rows, candidates = np.flatnonzero(query_code==block), np.flatnonzero(target_code==block)
+        if len(candidates)==0:
+            continue
+        if kneighbors is None:
+            source, position, score = _similarity.threshold_product(query['tfidf'][rows], target['tfidf'][candidates], threshold)
+        else:
+            source, position, score = _similarity.top_product(query['tfidf'][rows], target['tfidf'][candidates], kneighbors)
+        found['node_source'] += [query['tfidf_index']['node'].to_numpy()[rows[source]]]
+        found['node_target'] += [target['tfidf_index']['node'].to_numpy()[candidates[position]]]
+        found['column'] += [target['tfidf_index']['column'].to_numpy()[candidates[position]]]
+        found['score'] += [score]
+
+    similar_score = {
+        name: np.concatenate(found[name]) if len(found[name])>0 else np.array([], dtype=dtype)
+        for name, dtype in [('node_source','int64'), ('node_target','int64'), ('column','object'), ('score','float32')]
+    }
+    dtype = node_dtype(np.concatenate([similar_score['node_source'], similar_score['node_target']]))
+    similar_score['node_source'] = similar_score['node_source'].astype(dtype)
+    similar_score['node_target'] = similar_score['node_target'].astype(dtype)
+    similar_score['score'] = similar_score['score'].astype('float32')
+
+    # keep each pair of values once when query values are also searched
+    keep = _similarity.unique_pairs(similar_score['node_source'], similar_score['node_target'])
+
+    return {name: array[keep] for name, array in similar_score.items()}
+
+def append_similar_id(related_feature, similar_score, tfidf_index, threshold, scored=None):
+
+    # offset existing ids so they are the smallest element of a component
+    offset = -2**62
+    existing = related_feature[['node','id_similar']].dropna().drop_duplicates(subset='node')
+    existing_node = existing['node'].to_numpy(dtype='int64')
+    existing_id = offset+existing['id_similar'].to_numpy(dtype='int64')
+
+    # find connected components of existing ids and values that meet threshold
+    keep = (similar_score['score']>=threshold) & (similar_score['node_source']!=similar_score['node_target'])
+    source, target = similar_score['node_source'][keep], similar_score['node_target'][keep]
+    components = _disjoint_set.disjoint_set(np.concatenate([existing_id, existing_node, source, target]))
+    components.union(existing_node, existing_id)
+    components.union(source, target)
+
+    # preserve the smallest existing id of a component and derive new ids after existing ids
+    nodes = np.unique(np.concatenate([existing_node, source, target]))
+    roots = components.elements[components.find(components.position(nodes))]
+    preserve = roots<0
+    ids = roots-offset
+    # ids derived after ids of existing similarity scores to avoid reusing an id of values not similar to another
+    if scored is None:
+        scored = pd.Series([], dtype='int64')
+    seed = max([int(last)+1 for last in [existing['id_similar'].max(), scored.max()] if pd.notna(last)], default=0)
+    _, derive = np.unique(roots[~preserve], return_inverse=True)
+    ids[~preserve] = seed+derive.reshape(-1)
+    similar_id = pd.Series(ids, index=pd.Index(nodes, name='node'), name='id_similar')
+
+    # update ids of existing similar values and add newly similar values
+    similar_feature = pd.concat([
+        related_feature.loc[related_feature['id_similar'].notna(), ['node','column']],
+        tfidf_index[['node','column']],
+        pd.DataFrame({'node': target, 'column': similar_score['column'][keep]})
+    ], ignore_index=True).drop_duplicates()
+    similar_feature = similar_feature[similar_feature['node'].isin(similar_id.index)]
+    similar_feature['id_similar'] = similar_feature['node'].map(similar_id)
+    related_feature = related_feature.merge(similar_feature, on=['node','column'], how='outer', suffixes=('_existing',''))
+    related_feature['id_similar'] = related_feature['id_similar'].astype('Int64')
+    related_feature = related_feature.drop(columns='id_similar_existing')
+
+    # values scored below threshold keep the id of their existing similarity scores or are given their own id
+    below = pd.DataFrame({'node': similar_score['node_target'], 'column': similar_score['column']}).drop_duplicates(subset='node')
+    below = below[~below['node'].isin(similar_id.index)]
+    position = scored.index.get_indexer(below['node'])
+    found = position>=0
+    below_id = ids.max(initial=seed-1)+np.cumsum(~found)
+    below_id[found] = scored.to_numpy(dtype='int64')[position[found]]
+    below['id_similar'] = below_id
+    similar_feature = pd.concat([similar_feature, below], ignore_index=True)
+
+    return related_feature, similar_feature, similar_id
+
+def append_id(related_feature, id_category):
+
+    # offset ids so existing category ids are the smallest element of a component, then exact ids
+    offset_category, offset_exact = -2**62, -2**61
+    has_id = related_feature[id_category].notna().to_numpy()
+    has_exact = related_feature['id_exact'].notna().to_numpy()
+    has_similar = related_feature['id_similar'].notna().to_numpy()
+    category = offset_category+related_feature[id_category].fillna(0).to_numpy(dtype='int64')
+    exact = offset_exact+related_feature['id_exact'].fillna(0).to_numpy(dtype='int64')
+    similar = related_feature['id_similar'].fillna(0).to_numpy(dtype='int64')
+
+    # connect category ids, exact ids, and similar ids of the same value
+    element = np.where(has_id, category, np.where(has_exact, exact, similar))
+    components = _disjoint_set.disjoint_set(np.concatenate([element, exact[has_exact], similar[has_similar]]))
+    components.union(element[has_exact], exact[has_exact])
+    components.union(element[has_similar], similar[has_similar])
+
+    # preserve the smallest existing id of a component and derive new ids after existing ids
+    roots = components.elements[components.find(components.position(element))]
+    preserve = roots<offset_exact
+    ids = roots-offset_category
+    seed = related_feature[id_category].max()+1
+    if pd.isna(seed):
+        seed = 0
+    _, derive = np.unique(roots[~preserve], return_inverse=True)
+    ids[~preserve] = seed+derive.reshape(-1)
+    related_feature[id_category] = pd.array(ids, dtype='Int64')
+
+    # remove ids that do not match another index
+    remaining = related_feature.groupby(id_category).agg({'node': 'nunique'})
+    remaining = remaining[remaining['node']>1].index
+    related_feature = related_feature[related_feature[id_category].isin(remaining)]
+
+    return related_feature
+
+def split_id(related_feature, similar_score, touched, id_category):
+    '''Split ids into connected components of the remaining exact matches and similar matches meeting the threshold.
+
+    The component with the first record of an id keeps the id, other components are assigned ids after existing ids.
+    '''
+
+    affected = related_feature[id_category].isin(touched).to_numpy()
+    if not affected.any():
+        return related_feature
+    rows = related_feature[affected]
+    node = rows.index.to_numpy(dtype='int64')
+    group = rows[id_category].to_numpy(dtype='int64')
+
+    # an element for each node of an id since a node may have values in seperate ids
+    element = np.unique(np.stack([group, node], axis=1), axis=0, return_inverse=True)[1].reshape(-1)
+    components = _disjoint_set.disjoint_set(element)
+
+    # connect values with the same exact id
+    exact = rows['id_exact'].to_numpy(dtype='int64', na_value=-1)
+    has_exact = np.flatnonzero(exact>=0)
+    key = np.unique(np.stack([group[has_exact], exact[has_exact]], axis=1), axis=0, return_inverse=True)[1].reshape(-1)
+    _, first = np.unique(key, return_index=True)
+    components.union(element[has_exact], element[has_exact[first]][key])
+
+    # connect similar values meeting the threshold of the same id
+    if similar_score is not None and 'threshold' in similar_score:
+        edges = similar_score.index[similar_score['threshold'].to_numpy(dtype=bool)].to_frame(index=False)
+        elements = pd.DataFrame({'group': group, 'node': node, 'element': element}).drop_duplicates()
+        edges = edges.merge(elements, on='node').merge(elements, left_on=['group','node_similar'], right_on=['group','node'], suffixes=('','_similar'))
+        components.union(edges['element'].to_numpy(), edges['element_similar'].to_numpy())
+
+    # keep the id for the component of the first record of each id
+    labels = components.labels(element)
+    _, first = np.unique(group, return_index=True)
+    keep = np.isin(labels, labels[first])
+    seed = related_feature[id_category].max()+1
+    group[~keep] = seed+pd.factorize(labels[~keep])[0]
+    related_feature = related_feature.copy()
+    related_feature.loc[affected, id_category] = group
+
+    return related_feature
+
+def remove_node(related_feature, similar_score, nodes, id_category):
+
+    # ids of removed records since a removed record may have been the only connection between other records
+    touched = related_feature.loc[related_feature.index.isin(nodes), id_category].unique()
+
+    # remove records
+    related_feature = related_feature[~related_feature.index.isin(nodes)]
+    if similar_score is not None:
+        similar_score = similar_score[
+            ~similar_score.index.get_level_values('node').isin(nodes) & ~similar_score.index.get_level_values('node_similar').isin(nodes)
+        ]
+
+    # split ids that are no longer connected
+    related_feature = split_id(related_feature, similar_score, touched, id_category)
+
+    # remove ids that no longer match another index
+    remaining = related_feature.reset_index().groupby(id_category).agg({'node': 'nunique'})
+    remaining = remaining[remaining['node']>1].index
+    related_feature = related_feature[related_feature[id_category].isin(remaining)]
+
+    return related_feature, similar_score
+
 def translate_index(related_feature, similar_score, index_mask, id_category):
 
-    related_feature = _index.assign_index(related_feature, index_mask)
+    # build nullable index arrays at most once for both frames
+    nullable = {}
+    related_feature = _index.assign_index(related_feature, index_mask, nullable)
     related_feature = related_feature.astype({'node': 'int64', 'column': 'string', 'id_exact': 'Int64', 'id_similar': 'Int64', id_category: 'int64'})
     related_feature = related_feature.set_index('node')
     if similar_score is not None:
         similar_score = similar_score.reset_index()
-        similar_score = _index.assign_index(similar_score, index_mask)
+        similar_score = _index.assign_index(similar_score, index_mask, nullable)
         similar_score = similar_score.set_index(['node','node_similar'])
 
 
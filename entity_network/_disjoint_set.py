@@ -0,0 +1,95 @@
+import numpy as np
+
+class disjoint_set():
+
+    def __init__(self, elements):
+        '''Array-backed union-find of distinct elements for finding connected components from edge arrays.
+
+        Memory scales with the number of distinct elements instead of the largest element value.
+
+        Parameters
+        ----------
+        elements (numpy.ndarray): integer elements, possibly duplicated
+        '''
+
+        # sorted distinct elements with a parent position for each
+        self.elements = np.unique(np.asarray(elements, dtype='int64'))
+        self.parent = np.arange(len(self.elements), dtype='int64')
+
+
+    def position(self, elements):
+        '''Position of each element in the parent array.'''
+
+        return np.searchsorted(self.elements, np.asarray(elements, dtype='int64'))
+
+
+    def find(self, position):
+        '''Root position for each position, compressing the paths searched.'''
+
+        root = self.parent[position]
+        while True:
+            grand = self.parent[root]
+            if (grand==root).all():
+                break
+            root = grand
+        self.parent[position] = root
+
+        return root
+
+
+    def union(self, source, target):
+        '''Connect elements using arrays of edges between source and target elements.'''
+
+        source = self.position(source)
+        target = self.position(target)
+
+        # hook the larger root onto the smaller root until every edge shares a root
+        while len(source)>0:
+            root_source = self.find(source)
+            root_target = self.find(target)
+            differ = root_source!=root_target
+            source, target = source[differ], target[differ]
+            root_source, root_target = root_source[differ], root_target[differ]
+            np.minimum.at(self.parent, np.maximum(root_source, root_target), np.minimum(root_source, root_target))
+
+
+    def labels(self, elements):
+        '''Compact component label for each element ordered by the smallest element in each component.'''
+
+        roots = self.find(self.position(elements))
+        _, labels = np.unique(roots, return_inverse=True)
+
+        return labels.reshape(-1)
+
+
+    def add(self, elements):
+        '''Include new elements as their own component.'''
+
+        elements = np.setdiff1d(np.asarray(elements, dtype='int64'), self.elements)
+        if len(elements)==0:
+            return
+
+        # merge new elements into the sorted elements and move parents to their new position
+        combined = np.concatenate([self.elements, elements])
+        parent = np.concatenate([self.parent, np.arange(len(self.elements), len(combined), dtype='int64')])
+        order = np.argsort(combined, kind='stable')
+        moved = np.empty(len(combined), dtype='int64')
+        moved[order] = np.arange(len(combined), dtype='int64')
+        self.elements = combined[order]
+        self.parent = moved[parent][order]
+
+
+    def members(self, elements):
+        '''Elements in the same component as any of the given elements.'''
+
+        roots = np.unique(self.find(self.position(elements)))
+        everything = self.find(np.arange(len(self.parent), dtype='int64'))
+
+        return self.elements[np.isin(everything, roots)]
+
+
+    def reset(self, elements):
+        '''Split elements into their own component. Elements in a component must be reset together.'''
+
+        position = self.position(elements)
+        self.parent[position] = position
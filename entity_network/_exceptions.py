@@ -20,4 +20,20 @@ class KneighborsRange(Exception):
 
 class KneighborsThreshold(Exception):
     '''Exception for combination of kneighbors and threshold excluding similar matches.'''
+    pass
+
+class StaleIndex(Exception):
+    '''Exception for a saved index created using different values.'''
+    pass
+
+class InvalidBackend(Exception):
+    '''Exception for invalid similarity search backend supplied.'''
+    pass
+
+class HashFeaturesRange(Exception):
+    '''Exception for hash_features out of allowed range.'''
+    pass
+
+class UnsupportedCombination(Exception):
+    '''Exception for a combination of arguments that cannot be used together.'''
     pass
\ No newline at end of file
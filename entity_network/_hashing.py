@@ -0,0 +1,98 @@
+'''TF-IDF using feature hashing instead of a vocabulary to bound memory and fit in chunks.'''
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+class hashing_tfidf():
+
+    def __init__(self, analyzer, n_features=2**20, chunk_size=100000):
+        '''TF-IDF with a fixed number of hashed features and inverse document frequency estimated over chunks.
+
+        Parameters
+        ----------
+        analyzer (str): create features using words or characters
+        n_features (int, default=2**20): number of hashed features, more features have fewer collisions
+        chunk_size (int, default=100000): number of values hashed at once
+        '''
+
+        self.analyzer = analyzer
+        self.n_features = n_features
+        self.chunk_size = chunk_size
+
+        # document frequency of each hashed feature
+        self.n_documents = 0
+        self.document_frequency = np.zeros(n_features, dtype='int64')
+        self.idf_ = None
+
+        self.hasher = HashingVectorizer(
+            analyzer=analyzer,
+            # require 1 alphanumeric character instead of 2 to identify a word
+            token_pattern=r'(?u)\b\w+\b',
+            # performed during preprocessing
+            lowercase=False,
+            n_features=n_features,
+            # count features, normalized after weighting by idf
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32
+        )
+
+
+    def _chunks(self, values):
+
+        # hash chunks of values to limit memory of intermediate tokens
+        for start in range(0, len(values), self.chunk_size):
+            yield self.hasher.transform(values[start:start+self.chunk_size])
+
+
+    def _idf(self):
+
+        # smoothed the same as TfidfVectorizer
+        self.idf_ = np.log((1+self.n_documents)/(1+self.document_frequency))+1
+
+
+    def _weight(self, counts):
+
+        # scale counts by idf then normalize each value
+        counts = counts @ sparse.diags(self.idf_.astype('float32'))
+
+        return normalize(counts, norm='l2', copy=False)
+
+
+    def partial_fit(self, values):
+        '''Update the document frequency using more values.'''
+
+        for counts in self._chunks(values):
+            self.n_documents += counts.shape[0]
+            self.document_frequency += np.bincount(counts.indices, minlength=self.n_features)
+        self._idf()
+
+        return self
+
+
+    def fit_transform(self, values):
+        '''Update the document frequency and transform values using a single pass over chunks.'''
+
+        # keep counts of each chunk until the final idf is known
+        counts = []
+        for chunk in self._chunks(values):
+            self.n_documents += chunk.shape[0]
+            self.document_frequency += np.bincount(chunk.indices, minlength=self.n_features)
+            counts.append(chunk)
+        self._idf()
+
+        if len(counts)==0:
+            return sparse.csr_matrix((0, self.n_features), dtype='float32')
+
+        return self._weight(sparse.vstack(counts, format='csr'))
+
+
+    def transform(self, values):
+        '''Transform values using the current inverse document frequency without refitting.'''
+
+        counts = list(self._chunks(values))
+        if len(counts)==0:
+            return sparse.csr_matrix((0, self.n_features), dtype='float32')
+
+        return self._weight(sparse.vstack(counts, format='csr'))
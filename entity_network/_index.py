@@ -1,4 +1,5 @@
 import re
+import numpy as np
 import pandas as pd
 from pandas.api.types import is_numeric_dtype
 
@@ -6,12 +7,11 @@ from entity_network import _exceptions
 
 
 def assign_node(df, df2):
-    '''Assign each record a unique node value. This allows for comparison using any input index data type.'''
+    '''Assign each record a unique node value. This allows for comparison using any input index data type.
 
-    # make soft copy to preserve originals
-    df = df.copy()
-    if df2 is not None:
-        df2 = df2.copy()
+    Records are referenced without copying. Each frame is a list of (first node, dataframe) segments so that only
+    the columns needed are selected by node.
+    '''
 
     # enforce unique values for tracking values
     if df.index.has_duplicates:
@@ -19,8 +19,8 @@ def assign_node(df, df2):
     if df2 is not None and df2.index.has_duplicates:
         raise _exceptions.DuplicatedIndex('Argument df2 index must be unique.')
 
-    # form a single dataframe container
-    dfs = {'df': df, 'df2': df2}
+    # reference records starting at the first node
+    records = {'df': [(0, df)], 'df2': None}
 
     # develop unique integer based index
     index_mask = {
@@ -28,49 +28,156 @@ def assign_node(df, df2):
         'df2': None
     }
     index_mask['df'].name = 'df_index'
-    dfs['df'].index = index_mask['df'].index
-    dfs['df'].index.name = 'node'
-    
-    # set index of df2 starting at end of df 
+    index_mask['df'].index.name = 'node'
+
+    # set index of df2 starting at end of df
     if df2 is not None:
         seed = len(index_mask['df'])
+        records['df2'] = [(seed, df2)]
         index_mask['df2'] = pd.Series(df2.index, index=range(seed, seed+len(df2)))
         index_mask['df2'].name = 'df2_index'
-        dfs['df2'].index = index_mask['df2'].index
-        dfs['df2'].index.name = 'node'
+        index_mask['df2'].index.name = 'node'
+
+    return records, index_mask
+
+
+def append_node(df, frame, index_mask):
+    '''Assign appended records node values after all existing nodes, returning a (first node, dataframe) segment.'''
+
+    # enforce unique values for tracking values
+    if df.index.has_duplicates or df.index.isin(index_mask[frame]).any():
+        raise _exceptions.DuplicatedIndex(f'Argument df index must be unique including existing {frame} index.')
+
+    # set index starting at end of all existing nodes
+    seed = max([mask.index.max()+1 for mask in index_mask.values() if mask is not None and len(mask)>0], default=0)
+    appended = pd.Series(df.index, index=range(seed, seed+len(df)), name=f'{frame}_index')
+    index_mask[frame] = pd.concat([index_mask[frame], appended])
+    index_mask[frame].index.name = 'node'
+
+    return (seed, df), index_mask
+
+
+def select_columns(records, columns, removed=None):
+    '''Columns of records indexed by node, copying only the selected columns.
+
+    Parameters
+    ----------
+    records (dict): list of (first node, dataframe) segments for df and df2
+    columns (dict): names of columns to select from df and df2, ignoring columns that are not present
+    removed (pandas.Index, default=None): nodes of retracted records to exclude
+
+    Returns
+    -------
+    dfs (dict): selected columns of df and df2 indexed by node
+    '''
+
+    dfs = {'df': None, 'df2': None}
+    for frame, segments in records.items():
+
+        # skip processing df2 if not provided
+        if segments is None:
+            continue
+
+        selected = []
+        for seed, df in segments:
+            names = [col for col in columns.get(frame, []) if col in df.columns]
+            df = df[names]
+            df.index = pd.RangeIndex(seed, seed+len(df), name='node')
+            selected.append(df)
+        selected = pd.concat(selected) if len(selected)>1 else selected[0]
+
+        if removed is not None and len(removed)>0:
+            selected = selected[~selected.index.isin(removed)]
+
+        dfs[frame] = selected
 
-    return dfs, index_mask
+    return dfs
 
 
-def _preserve_type(reindexed, mask):
-    '''Translate index back into the original data type and allow for nullable numeric types.'''
+def select_records(records, frame, nodes):
+    '''Every original column of records for nodes of a frame, indexed by node.'''
+
+    nodes = np.unique(np.asarray(nodes, dtype='int64'))
+
+    selected = []
+    for seed, df in records[frame]:
+        position = nodes[(nodes>=seed) & (nodes<seed+len(df))]-seed
+        df = df.iloc[position]
+        df.index = pd.Index(position+seed, name='node')
+        selected.append(df)
+
+    return pd.concat(selected)
+
+
+def nullable_index(mask):
+    '''Original index values as an array allowing missing values, using nullable types for numeric index values.'''
 
     if is_numeric_dtype(mask):
-        dtype = str(mask.dtype).capitalize()
-    else:
-        dtype = str(mask.dtype)
-    reindexed[mask.name] = reindexed[mask.name].astype(dtype)
+        mask = mask.astype(str(mask.dtype).capitalize())
 
-    return reindexed
+    return mask.array
+
+
+def take_index(mask, nodes, nullable=None):
+    '''Original index values of nodes by position in the mask, missing for nodes not in the mask.
+
+    Parameters
+    ----------
+    mask (pandas.Series): original index values indexed by node
+    nodes (pandas.Series|numpy.ndarray): node values to translate
+    nullable (dict, default=None): nullable arrays by mask name, added when first needed so they are built once across calls
+
+    Returns
+    -------
+    values (pandas.api.extensions.ExtensionArray): original index values in the order of nodes, nullable only if a node is missing
+    '''
+
+    # node values are a range for in memory comparisons so positions are found without hashing
+    position = mask.index.get_indexer(nodes)
+
+    # keep the original dtype unless a missing value is needed
+    if (position>=0).all():
+        return mask.array.take(position)
+
+    if nullable is None:
+        nullable = {}
+    if mask.name not in nullable:
+        nullable[mask.name] = nullable_index(mask)
+
+    return nullable[mask.name].take(position, allow_fill=True)
+
+
+def assign_index(reindexed, index_mask, nullable=None):
+    '''Add the original index of the node and node_similar columns by position, adding columns in place.
+
+    Parameters
+    ----------
+    reindexed (pandas.DataFrame): node and optional node_similar columns
+    index_mask (dict): original index values indexed by node for df and df2
+    nullable (dict, default=None): nullable arrays by mask name shared between calls translating the same index_mask
+
+    Returns
+    -------
+    reindexed (pandas.DataFrame): input with the original index columns added
+    '''
 
-def assign_index(reindexed, index_mask):
+    if nullable is None:
+        nullable = {}
 
     # include the node index from the first df
-    mask = index_mask['df'].copy()
-    reindexed = reindexed.merge(mask, left_on='node', right_index=True, how='left')
-    reindexed = _preserve_type(reindexed, mask)
-    if 'node_similar' in reindexed and reindexed['node_similar'].isin(mask.index).any():
-        reindexed = reindexed.merge(mask, left_on='node_similar', right_index=True, how='left', suffixes=('','_similar'))
-        reindexed = _preserve_type(reindexed, mask)
+    mask = index_mask['df']
+    reindexed[mask.name] = take_index(mask, reindexed['node'], nullable)
+    if 'node_similar' in reindexed:
+        position = mask.index.get_indexer(reindexed['node_similar'])
+        if (position>=0).any():
+            reindexed[f'{mask.name}_similar'] = take_index(mask, reindexed['node_similar'], nullable)
 
     # add index from the second dataframe
     if index_mask['df2'] is not None:
-        mask = index_mask['df2'].copy()
+        mask = index_mask['df2']
         if 'node_similar' in reindexed:
-            reindexed = reindexed.merge(mask, left_on='node_similar', right_index=True, how='left')
-            reindexed = _preserve_type(reindexed, mask)
+            reindexed[mask.name] = take_index(mask, reindexed['node_similar'], nullable)
         else:
-            reindexed = reindexed.merge(mask, left_on='node', right_index=True, how='left')
-            reindexed = _preserve_type(reindexed, mask)
+            reindexed[mask.name] = take_index(mask, reindexed['node'], nullable)
 
     return reindexed
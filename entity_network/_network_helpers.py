@@ -1,11 +1,13 @@
 from unicodedata import category
+import numpy as np
 import pandas as pd
 
-from scipy.sparse import lil_matrix
+from scipy.sparse import csr_matrix, hstack, bmat
 from scipy.sparse.csgraph import connected_components
 
 from entity_network import _index
 from entity_network import _find_difference
+from entity_network import _disjoint_set
 
 def combine_features(relationships):
     '''Combine records with matching feature ids.'''
@@ -25,30 +27,103 @@ def combine_features(relationships):
 
     return network_map
 
-def assign_id(network_map):
-    
-    # assume an initial temp id to find connected components of
-    id_cols = network_map.columns[network_map.columns.str.endswith('_id')]
-    network_map['temp_id'] = range(0, len(network_map))
-
-    # form list of lists sparse matrix incrementally of connected nodes
-    # TODO: form this sparse matrix during initial comparison to increase performance
-    n = len(network_map)
-    graph = lil_matrix((n, n), dtype=int)
-    for col in id_cols:
-        indices = network_map.groupby(col)
-        indices = indices.agg({'temp_id': list})
-        indices = indices['temp_id']
-        for idx in indices:
-            graph[idx[0], idx] = 1
-    
-    # convert to compressed sparse row matrix for better computation
-    graph = graph.tocsr()
+def _resized(block, shape):
+    '''Copy of a sparse block with rows and columns added or removed to match shape.'''
+
+    block = block.copy()
+    block.resize(shape)
+
+    return block
+
+
+def _block_edges(block, nodes=None):
+    '''Node and feature id of each edge in a sparse block, only for rows of nodes if provided.'''
+
+    if nodes is None:
+        nodes = np.arange(block.shape[0])
+    else:
+        nodes = nodes[(nodes>=0) & (nodes<block.shape[0])]
+    edges = block[nodes].tocoo()
+
+    return nodes[edges.row], edges.col.astype('int64')
+
+
+class feature_incidence():
+
+    def __init__(self):
+        '''Sparse incidence of nodes to the feature ids of each compared category, with one block of columns per category.
+
+        Rows are node values and columns are feature id values, so edges of a category are read directly from its block
+        when networks are updated.
+        '''
+
+        self.blocks = {}
+
+
+    def replace(self, category, related):
+        '''Replace the block of a category using related records.
 
-    # determine connected temp_ids to assign an overall network_id
-    _, labels = connected_components(graph, directed=False, return_labels=True)
-    network_map['network_id'] = labels
-    network_map = network_map.drop(columns='temp_id')
+        Parameters
+        ----------
+        category (str): compared category
+        related (pandas.DataFrame): {category}_id indexed by node
+        '''
+
+        ids = related[f'{category}_id']
+        ids = ids[ids.notna()]
+
+        # columns for each id value and rows for each node value
+        node = ids.index.get_level_values('node').to_numpy(dtype='int64')
+        ids = ids.to_numpy(dtype='int64')
+        block = csr_matrix(
+            (np.ones(len(node), dtype='int8'), (node, ids)), shape=(node.max(initial=-1)+1, ids.max(initial=-1)+1)
+        )
+        # a node may have the same id in several columns
+        block.sum_duplicates()
+        block.data[:] = 1
+        self.blocks[category] = block
+
+
+    def labels(self):
+        '''Connected component of each node value, or -1 for nodes without a feature id.'''
+
+        # stack blocks of every category using the same rows
+        n_nodes = max([block.shape[0] for block in self.blocks.values()], default=0)
+        blocks = [_resized(block, (n_nodes, block.shape[1])) for block in self.blocks.values()]
+        incidence = hstack(blocks, format='csr') if len(blocks)>0 else csr_matrix((n_nodes, 0), dtype='int8')
+
+        # connect nodes through shared feature ids
+        graph = bmat([[None, incidence], [incidence.T, None]], format='csr')
+        _, labels = connected_components(graph, directed=False, return_labels=True)
+        labels = labels[:n_nodes]
+        labels[np.diff(incidence.indptr)==0] = -1
+
+        return labels
+
+
+def assign_id(network_map, incidence=None):
+    '''Assign a network_id to nodes connected through any feature id, numbered in order of the network_map.
+
+    Parameters
+    ----------
+    network_map (pandas.DataFrame): node and {category}_id columns
+    incidence (feature_incidence, default=None): incidence formed while comparing, formed from network_map if None
+
+    Returns
+    -------
+    network_id (pandas.DataFrame): node and network_id
+    network_map (pandas.DataFrame): network_map including network_id
+    '''
+
+    if incidence is None:
+        incidence = feature_incidence()
+        for col in network_map.columns[network_map.columns.str.endswith('_id')]:
+            incidence.replace(col[:-3], network_map.set_index('node')[[col]])
+
+    # connected components of nodes renumbered by first occurrence
+    labels = incidence.labels()
+    labels = labels[network_map['node'].to_numpy(dtype='int64')]
+    network_map['network_id'] = pd.factorize(labels)[0].astype('int32')
 
     # determine overall network id
     # TODO: remove network_id and keep network_map only?
@@ -57,10 +132,128 @@ def assign_id(network_map):
 
     return network_id, network_map
 
+class network_components():
+
+    def __init__(self, incidence):
+        '''Connected components of nodes sharing a feature id that are maintained between network updates.
+
+        Parameters
+        ----------
+        incidence (feature_incidence): node to feature id incidence formed while comparing
+        '''
+
+        # block of each category when last upserted, the same matrix as the incidence unless the category was compared again
+        self.incidence = incidence
+        self.upserted = {}
+        self.categories = []
+
+        # components of node elements and feature elements
+        self.components = _disjoint_set.disjoint_set([])
+
+        # overall network id for each node
+        self.network_id = pd.Series([], dtype='int64', index=pd.Index([], name='node', dtype='int64'), name='network_id')
+
+
+    def _element(self, category, ids):
+        '''Negative elements for feature ids so they are distinct from node elements.'''
+
+        code = self.categories.index(category)
+
+        return -1-(code*2**40+np.asarray(ids, dtype='int64'))
+
+
+    def upsert(self, category):
+        '''Update the node to feature id edges of a category from the incidence, recomputing only the components that changed.
+
+        Parameters
+        ----------
+        category (str): compared category
+
+        Returns
+        -------
+        touched (numpy.ndarray): nodes in components that changed
+        '''
+
+        block = self.incidence.blocks[category]
+        if category not in self.upserted:
+            self.categories.append(category)
+            self.upserted[category] = csr_matrix((0, 0), dtype='int8')
+
+        # find added and removed edges
+        previous = self.upserted[category]
+        shape = (max(block.shape[0], previous.shape[0]), max(block.shape[1], previous.shape[1]))
+        difference = (_resized(block, shape).astype('int8')-_resized(previous, shape).astype('int8')).tocoo()
+        added = {'node': difference.row[difference.data>0].astype('int64'), 'id': difference.col[difference.data>0].astype('int64')}
+        removed = difference.row[difference.data<0].astype('int64')
+        self.upserted[category] = block
+
+        # include elements of added edges
+        if len(added['node'])>0:
+            self.components.add(np.concatenate([added['node'], self._element(category, added['id'])]))
+
+        # split components with removed edges and reconnect their remaining edges
+        touched = np.array([], dtype='int64')
+        if len(removed)>0:
+            touched = self.components.members(removed)
+            self.components.reset(touched)
+            for name, remaining in self.upserted.items():
+                node, ids = _block_edges(remaining, touched[touched>=0])
+                self.components.union(node, self._element(name, ids))
+
+        # connect added edges
+        if len(added['node'])>0:
+            self.components.union(added['node'], self._element(category, added['id']))
+            touched = np.concatenate([touched, added['node']])
+
+        touched = self.components.members(touched)
+        touched = touched[touched>=0]
+        self._relabel(touched)
+
+        return touched
+
+
+    def _relabel(self, touched):
+        '''Assign a new network id to nodes in changed components while preserving all other network ids.'''
+
+        # ignore nodes without any edge
+        connected = np.unique(np.concatenate([np.flatnonzero(np.diff(block.indptr)) for block in self.upserted.values()]))
+        connected = touched[np.isin(touched, connected)]
+
+        # derive new ids after the existing ids
+        seed = self.network_id.max()+1
+        if pd.isna(seed):
+            seed = 0
+        labels = self.components.labels(connected)+seed
+        self.network_id = pd.concat([
+            self.network_id[~self.network_id.index.isin(touched)],
+            pd.Series(labels, index=pd.Index(connected, name='node'), name='network_id')
+        ])
+
+
+def update_id(network_id, network_map, network_feature, components, touched, index_mask):
+    '''Replace the network_id and network_map of nodes in components that changed.'''
+
+    # combine features for changed nodes only
+    changed = {category: related[related.index.isin(touched)] for category, related in network_feature.items() if category in components.upserted}
+    changed_map = combine_features(changed)
+    changed_map['network_id'] = changed_map['node'].map(components.network_id)
+    changed_id = changed_map[['node','network_id']].drop_duplicates(subset='node')
+    changed_id, changed_map = translate_index(changed_id, changed_map, index_mask)
+
+    # keep networks that did not change
+    if network_id is not None:
+        changed_id = pd.concat([network_id[~network_id.index.isin(touched)], changed_id])
+        changed_map = pd.concat([network_map[~network_map.index.isin(touched)], changed_map])
+
+    return changed_id, changed_map
+
+
 def translate_index(network_id, network_map, index_mask):
 
-    network_id = _index.assign_index(network_id, index_mask)
-    network_map = network_map.merge(network_id.drop(columns=['network_id']), on='node')
+    # build nullable index arrays at most once for both frames
+    nullable = {}
+    network_id = _index.assign_index(network_id, index_mask, nullable)
+    network_map = _index.assign_index(network_map, index_mask, nullable)
     network_id = network_id.set_index('node')
     network_map = network_map.set_index('node')
 
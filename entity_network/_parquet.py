@@ -0,0 +1,64 @@
+'''Read and write Parquet files keeping strings in Arrow memory.'''
+import pandas as pd
+
+# optional dependency only needed for Parquet files
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def _require():
+
+    if pq is None:
+        raise ImportError('Reading and writing Parquet files requires pyarrow. Install it using: pip install entity-network[parquet]')
+
+
+def _types_mapper(data_type):
+
+    # Arrow-backed strings instead of converting each value to a python object
+    if pa.types.is_string(data_type) or pa.types.is_large_string(data_type):
+        return pd.StringDtype('pyarrow')
+
+    return None
+
+
+def read(path, columns=None):
+    '''Read columns of a Parquet file or dataset using Arrow-backed string columns.
+
+    Parameters
+    ----------
+    path (str): Parquet file or directory of a partitioned dataset
+    columns (list, default=None): columns to read, reading every column if None
+
+    Returns
+    -------
+    df (pandas.DataFrame): columns with the index saved in the file
+    '''
+
+    _require()
+
+    # include the index saved by pandas when reading specific columns
+    table = pq.read_table(path, columns=columns, use_pandas_metadata=True)
+
+    return table.to_pandas(types_mapper=_types_mapper)
+
+
+def read_batches(path, columns, batch_size):
+    '''Chunks of columns from a Parquet file using Arrow-backed string columns.'''
+
+    _require()
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+        yield batch.to_pandas(types_mapper=_types_mapper)
+
+
+def write(df, path, partition='network_id'):
+    '''Write a dataframe as a Parquet dataset partitioned by a column, including the index as columns.'''
+
+    _require()
+
+    table = pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+    pq.write_to_dataset(table, path, partition_cols=[partition])
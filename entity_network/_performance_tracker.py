@@ -9,6 +9,7 @@ class operation_tracker():
     def __init__(self):
 
         self.process_time = pd.DataFrame(columns=['caller','file','function','description','duration_seconds'])
+        self.process_measure = pd.DataFrame(columns=['caller','file','function','description','measure','value'])
 
     def reset_time(self):
 
@@ -29,4 +30,14 @@ class operation_tracker():
         self.process_time = self.process_time.sort_values(by='duration_seconds', ascending=False)
 
         # reset timer for next invocation of tracking
-        self.timer_start = time()
\ No newline at end of file
+        self.timer_start = time()
+
+
+    def measure(self, caller, file, function, description, measure, value):
+
+        # print to standard out for users to track processes
+        print(f'caller={caller}, file={file}, function={function}, description={description}, {measure}={value}')
+
+        # record all measurements
+        df = pd.DataFrame([[caller, file, function, description, measure, value]], columns=self.process_measure.columns)
+        self.process_measure = pd.concat([self.process_measure, df], ignore_index=True)
\ No newline at end of file
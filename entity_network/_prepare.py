@@ -1,6 +1,38 @@
 from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from entity_network import _exceptions, _clean_cache
+from entity_network.clean_text import comparison_rules
+
+def source_columns(columns):
+    '''Columns read from a source, including columns combined into a single column.'''
+
+    if isinstance(columns, str):
+        columns = [columns]
+    names = []
+    for col in columns:
+        names += col if isinstance(col, list) else [col]
+
+    return list(dict.fromkeys(names))
+
+
+def frame_columns(*arguments):
+    '''Columns of df and df2 read by columns or block arguments, which are a dict for two dataframes.'''
+
+    names = {'df': [], 'df2': []}
+    for argument in arguments:
+        if argument is None:
+            continue
+        if not isinstance(argument, dict):
+            argument = {'df': argument}
+        for frame, cols in argument.items():
+            if frame in names:
+                names[frame] += source_columns(cols)
+
+    return {frame: list(dict.fromkeys(cols)) for frame, cols in names.items()}
 
-from entity_network import _exceptions
 
 def flatten(df, columns, category):
 
@@ -60,17 +92,133 @@ def flatten(df, columns, category):
     return values, compared
 
 
-def clean(dfs, category, text_cleaner):
+def block(df, block):
+    '''Blocking key of each node from a column in df and df2.
+
+    Parameters
+    ----------
+    df (dict): df and df2 indexed by node
+    block (str|dict): column containing the blocking key, or a dict of columns for df and df2
+
+    Returns
+    -------
+    block_key (dict): blocking key for df and df2 indexed by node
+    '''
+
+    if df['df2'] is None:
+        if not isinstance(block, dict):
+            block = {'df': block}
+    else:
+        if not isinstance(block, dict):
+            raise RuntimeError('Block parameter must be a dict if two dataframes are provided.')
+        if len({'df','df2'}-set(block.keys()))>0:
+            raise RuntimeError('Block parameter must contain keys for df and df2 if two dataframes are provided.')
+
+    block_key = {'df': None, 'df2': None}
+    for frame, col in block.items():
+
+        # skip processing df2 if not provided
+        if df[frame] is None:
+            continue
+
+        if col not in df[frame]:
+            raise _exceptions.MissingColumn(f'Argument block not in DataFrame: {col}')
+
+        block_key[frame] = df[frame][col]
+
+    return block_key
 
+
+def _clean_chunks(values, text_cleaner, chunk_size, workers):
+
+    # clean small values in the current process
+    if workers is None or len(values)<=chunk_size:
+        return text_cleaner(values)
+
+    # clean chunks in seperate processes
+    chunks = [values.iloc[start:start+chunk_size] for start in range(0, len(values), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        cleaned = list(executor.map(text_cleaner, chunks))
+
+    # reassemble in the original order including the (node, column) index
+    return pd.concat(cleaned)
+
+
+def _clean_cached(uniques, text_cleaner, chunk_size, workers, cache, fingerprint):
+
+    # skip cleaning values previously cleaned
+    keys = cache.keys(fingerprint, uniques)
+    cleaned, hit = cache.get(keys)
+
+    # clean and store values not found
+    miss = uniques[~hit.to_numpy()]
+    if len(miss)>0:
+        fresh = _clean_chunks(miss.reset_index(drop=True), text_cleaner, chunk_size, workers)
+        cleaned[~hit] = fresh.to_numpy()
+        cache.put([key for key, found in zip(keys, hit) if not found], fresh)
+
+    return cleaned, int(hit.sum())
+
+
+def _clean_unique(values, text_cleaner, chunk_size, workers, cache=None, fingerprint=None):
+
+    # clean each distinct value once
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques)
+    if cache is None:
+        cleaned, hit = _clean_chunks(uniques, text_cleaner, chunk_size, workers), 0
+    else:
+        cleaned, hit = _clean_cached(uniques, text_cleaner, chunk_size, workers, cache, fingerprint)
+
+    # broadcast cleaned values back to every record, keeping missing values missing
+    cleaned = pd.Series(cleaned.array.take(codes, allow_fill=True), index=values.index)
+
+    return cleaned, len(uniques), hit
+
+
+def clean(dfs, category, text_cleaner, chunk_size=100000, workers=None, cache=None, cache_size=1000000):
+    '''Clean distinct values by category type, optionally splitting values into chunks cleaned using a process pool.
+
+    Parameters
+    ----------
+    dfs (dict): flattened values for df and df2
+    category (str): category name used as the series name
+    text_cleaner (callable): cleaning function from clean_text
+    chunk_size (int, default=100000): number of values cleaned in each process
+    workers (int, default=None): number of processes, cleans in the current process if None
+    cache (str, default=None): SQLite file of values cleaned in previous runs, not cached if None
+    cache_size (int, default=1000000): maximum number of cleaned values kept in the cache
+
+    Returns
+    -------
+    dfs (dict): cleaned values for df and df2
+    measures (dict): unique_ratio of distinct values to values, and cache_hit/cache_miss counts if cache is provided
+    '''
+
+    if cache is not None:
+        cache = _clean_cache.clean_cache(cache, cache_size)
+        fingerprint = cache.fingerprint(category, text_cleaner, comparison_rules.get(category))
+    else:
+        fingerprint = None
+
+    n_values, n_unique, n_hit = 0, 0, 0
     for frame, values in dfs.items():
         if values is not None:
 
             # preprocess values by category type
-            values = text_cleaner(values)
+            n_values += len(values)
+            values, unique, hit = _clean_unique(values, text_cleaner, chunk_size, workers, cache, fingerprint)
+            n_unique += unique
+            n_hit += hit
 
             # for merging dataframes, preserve series name regardless of text_cleaner function
             values.name = category
 
             dfs[frame] = values
 
-    return dfs
+    measures = {'unique_ratio': n_unique/n_values if n_values>0 else 1.0}
+    if cache is not None:
+        measures.update({'cache_hit': n_hit, 'cache_miss': n_unique-n_hit})
+        cache.close()
+
+    return dfs, measures
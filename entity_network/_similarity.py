@@ -0,0 +1,285 @@
+'''Similarity search backends finding the most similar rows of a normalized TF-IDF matrix.'''
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+from sklearn.neighbors import NearestNeighbors
+
+from entity_network import _exceptions
+
+# optional dependency since wheels are only published for some python versions
+try:
+    import nmslib
+except ImportError:
+    nmslib = None
+
+
+def top_product(query, target, kneighbors):
+    '''Largest kneighbors dot products of each query row with target rows.'''
+
+    # score every pair using a sparse dot product of normalized tfidf
+    product = (query @ target.T).tocoo()
+
+    # keep kneighbors largest scores for each query row
+    order = np.lexsort((-product.data, product.row))
+    source, target, score = product.row[order], product.col[order], product.data[order]
+    rank = np.arange(len(source))-np.searchsorted(source, source)
+    keep = rank<kneighbors
+
+    return source[keep], target[keep], score[keep]
+
+
+def threshold_product(query, target, threshold, offset=None):
+    '''Every pair of query and target rows with a dot product of at least threshold.
+
+    If offset is provided, query rows are target rows starting at offset and only pairs with a later target row are kept.
+    '''
+
+    # prune scores below the threshold before combining chunks
+    product = (query @ target.T).tocoo()
+    keep = product.data>=threshold
+
+    # keep only the upper triangle when comparing rows to themselves
+    if offset is not None:
+        keep &= product.col>product.row+offset
+
+    return product.row[keep].astype('int64'), product.col[keep].astype('int64'), product.data[keep]
+
+
+def unique_pairs(source, target):
+    '''Position of the first occurrence of each unordered pair, excluding pairs of a row with itself.'''
+
+    low, high = np.minimum(source, target).astype('int64'), np.maximum(source, target).astype('int64')
+    position = np.flatnonzero(low!=high)
+    _, first = np.unique(low[position]*(high.max(initial=0)+1)+high[position], return_index=True)
+
+    return position[np.sort(first)]
+
+
+def adaptive_query(index, tfidf, kneighbors, kneighbors_max, threshold):
+    '''Query kneighbors then requery rows with every neighbor meeting threshold using double kneighbors up to kneighbors_max.
+
+    Returns
+    -------
+    source, target, score (numpy.ndarray): neighbors of each row from the last query of the row
+    saturated (list): kneighbors and number of rows with every neighbor meeting threshold for each query
+    '''
+
+    rows = np.arange(tfidf.shape[0])
+    found, saturated = [], []
+    while len(rows)>0:
+
+        source, target, score = index.query(tfidf[rows], kneighbors)
+
+        # rows where the furthest neighbor still meets the threshold
+        count = np.bincount(source, minlength=len(rows))
+        lowest = np.full(len(rows), np.inf)
+        np.minimum.at(lowest, source, score)
+        full = (count>=kneighbors) & (lowest>=threshold)
+        saturated.append((kneighbors, int(full.sum())))
+
+        # keep neighbors of rows that are not saturated or can't be requeried
+        done = ~full if kneighbors<kneighbors_max else np.ones(len(rows), dtype='bool')
+        keep = done[source]
+        found.append((rows[source[keep]], target[keep], score[keep]))
+
+        rows = rows[~done]
+        kneighbors = min(kneighbors*2, kneighbors_max)
+
+    if len(found)==0:
+        return np.array([], dtype='int64'), np.array([], dtype='int64'), np.array([], dtype='float64'), saturated
+
+    return np.concatenate([f[0] for f in found]), np.concatenate([f[1] for f in found]), np.concatenate([f[2] for f in found]), saturated
+
+
+def _flatten_neighbors(neighbors):
+
+    # flatten neighbors into arrays of tfidf_index positions
+    size = np.fromiter((len(comparison[0]) for comparison in neighbors), dtype='int64', count=len(neighbors))
+    source = np.repeat(np.arange(len(neighbors)), size)
+    if len(neighbors)>0:
+        target = np.concatenate([comparison[0] for comparison in neighbors])
+        score = np.concatenate([comparison[1] for comparison in neighbors])
+    else:
+        target = np.array([], dtype='int64')
+        score = np.array([], dtype='float32')
+
+    # adjust score for negative dot product
+    return source, target, score*-1
+
+
+class nmslib_search():
+    '''Approximate search using an nmslib sparse inverted index.'''
+
+    name = 'nmslib'
+    extension = '.bin'
+
+    def __init__(self):
+
+        if nmslib is None:
+            raise ImportError("Backend 'nmslib' requires nmslib. Install it using: pip install entity-network[nmslib]")
+
+        # initialize non-metric space libary for sparse matrix searching
+        self.index = nmslib.init(method='simple_invindx', space='negdotprod_sparse_fast', data_type=nmslib.DataType.SPARSE_VECTOR)
+
+    def fit(self, tfidf):
+
+        self.index.addDataPointBatch(tfidf)
+        self.index.createIndex()
+
+        return self
+
+    def query(self, tfidf, kneighbors):
+
+        neighbors = self.index.knnQueryBatch(tfidf, k=kneighbors, num_threads=4)
+
+        return _flatten_neighbors(neighbors)
+
+    def save(self, file):
+
+        # save using the native format including the indexed data
+        self.index.saveIndex(file+self.extension, save_data=True)
+
+    def load(self, file):
+
+        self.index.loadIndex(file+self.extension, load_data=True)
+
+        return self
+
+    def query_radius(self, tfidf, threshold, symmetric=False):
+
+        size = len(self.index)
+        if size==0 or tfidf.shape[0]==0:
+            return np.array([], dtype='int64'), np.array([], dtype='int64'), np.array([], dtype='float64')
+
+        # requery rows with double kneighbors until a neighbor falls below the threshold
+        source, target, score, _ = adaptive_query(self, tfidf, min(10, size), size, threshold)
+        source, target, score = source.astype('int64'), target.astype('int64'), score.astype('float64')
+
+        # keep neighbors within the threshold and a single direction of each pair when querying indexed rows
+        keep = score>=threshold
+        if symmetric:
+            keep &= target>source
+
+        return source[keep], target[keep], score[keep]
+
+
+class sklearn_search():
+    '''Exact search using scikit-learn NearestNeighbors with the cosine metric.'''
+
+    name = 'sklearn'
+    extension = '.npz'
+
+    def __init__(self):
+
+        self.index = NearestNeighbors(metric='cosine', algorithm='brute')
+        self.tfidf = None
+
+    def fit(self, tfidf):
+
+        self.tfidf = sparse.csr_matrix(tfidf)
+        self.index.fit(self.tfidf)
+
+        return self
+
+    def query(self, tfidf, kneighbors):
+
+        # cannot request more neighbors than indexed rows
+        kneighbors = min(kneighbors, self.tfidf.shape[0])
+        if kneighbors==0 or tfidf.shape[0]==0:
+            return np.array([], dtype='int64'), np.array([], dtype='int64'), np.array([], dtype='float64')
+
+        distance, target = self.index.kneighbors(tfidf, n_neighbors=kneighbors)
+        source = np.repeat(np.arange(tfidf.shape[0]), kneighbors)
+
+        # convert cosine distance to similarity
+        return source, target.reshape(-1), 1-distance.reshape(-1)
+
+    def query_radius(self, tfidf, threshold, symmetric=False):
+
+        if tfidf.shape[0]==0:
+            return np.array([], dtype='int64'), np.array([], dtype='int64'), np.array([], dtype='float64')
+
+        # cosine distance within the radius equivalent to the threshold
+        distance, target = self.index.radius_neighbors(tfidf, radius=1-threshold)
+        source = np.repeat(np.arange(tfidf.shape[0]), [len(t) for t in target])
+
+        return source, np.concatenate(target).astype('int64'), 1-np.concatenate(distance)
+
+    def save(self, file):
+
+        sparse.save_npz(file+self.extension, self.tfidf)
+
+    def load(self, file):
+
+        return self.fit(sparse.load_npz(file+self.extension))
+
+
+class brute_force_search(sklearn_search):
+    '''Exact search using a sparse dot product of chunks of query rows with every indexed row.'''
+
+    name = 'brute_force'
+
+    def __init__(self, chunk_size=2000):
+
+        self.chunk_size = chunk_size
+        self.tfidf = None
+
+    def fit(self, tfidf):
+
+        self.tfidf = sparse.csr_matrix(tfidf)
+
+        return self
+
+    def query(self, tfidf, kneighbors):
+
+        # limit memory of the pairwise product by querying chunks of rows
+        tfidf = sparse.csr_matrix(tfidf)
+        source, target, score = [np.array([], dtype='int64')], [np.array([], dtype='int64')], [np.array([], dtype='float64')]
+        for start in range(0, tfidf.shape[0], self.chunk_size):
+            chunk = top_product(tfidf[start:start+self.chunk_size], self.tfidf, kneighbors)
+            source.append(chunk[0]+start)
+            target.append(chunk[1])
+            score.append(chunk[2])
+
+        return np.concatenate(source), np.concatenate(target), np.concatenate(score)
+
+    def query_radius(self, tfidf, threshold, symmetric=False, num_threads=4):
+
+        # score chunks of rows in seperate threads since the sparse product runs outside of python
+        tfidf = sparse.csr_matrix(tfidf)
+        starts = range(0, tfidf.shape[0], self.chunk_size)
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            chunks = list(executor.map(
+                lambda start: threshold_product(tfidf[start:start+self.chunk_size], self.tfidf, threshold, start if symmetric else None), starts
+            ))
+
+        source = [np.array([], dtype='int64')]+[chunk[0]+start for start, chunk in zip(starts, chunks)]
+        target = [np.array([], dtype='int64')]+[chunk[1] for chunk in chunks]
+        score = [np.array([], dtype='float64')]+[chunk[2] for chunk in chunks]
+
+        return np.concatenate(source), np.concatenate(target), np.concatenate(score)
+
+
+backends = {
+    'nmslib': nmslib_search,
+    'sklearn': sklearn_search,
+    'brute_force': brute_force_search
+}
+
+
+def backend_name(backend, radius=False):
+    '''Validate a backend name, defaulting to nmslib if installed or brute_force otherwise or for a radius search.'''
+
+    if backend is None:
+        return 'nmslib' if nmslib is not None and not radius else 'brute_force'
+    if backend not in backends:
+        raise _exceptions.InvalidBackend(f'Argument backend must be one of {list(backends.keys())}')
+
+    return backend
+
+
+def init_index(backend):
+    '''Unfitted similarity search backend.'''
+
+    return backends[backend_name(backend)]()
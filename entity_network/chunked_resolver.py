@@ -0,0 +1,205 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from entity_network import _chunked, _hashing, _index
+from entity_network.clean_text import comparison_rules
+from entity_network.entity_resolver import _check_arguments
+from entity_network._performance_tracker import operation_tracker
+
+class chunked_resolver(operation_tracker):
+
+
+    def __init__(
+        self, source, source2=None, chunk_size:int = 1000000, spill_directory:str = None, clean_workers:int = None,
+        clean_chunksize:int = 100000, clean_cache:str = None, clean_cache_size:int = 1000000
+    ):
+        ''' Find links in inputs larger than memory by reading and comparing chunks of records. Cleaned values and
+        TF-IDF matrices are spilled to disk so only edges and ids of matching records are kept in memory.
+
+        Parameters
+        ----------
+        source (str|list): CSV or Parquet file, or a list of dataframes, containing entity features
+        source2 (str|list, default=None): second CSV or Parquet file, or list of dataframes, containing entity features
+        chunk_size (int, default=1000000): number of records read from a file at once
+        spill_directory (str, default=None): directory for intermediate results, a temporary directory if None
+        clean_workers (int, default=None): number of processes used to clean text, cleans in the current process if None
+        clean_chunksize (int, default=100000): number of values cleaned in each process if clean_workers is provided
+        clean_cache (str, default=None): SQLite file to reuse values cleaned in previous runs, created if it doesn't exist
+        clean_cache_size (int, default=1000000): maximum number of cleaned values kept in clean_cache
+
+        Examples
+        --------
+
+        Find networks in a CSV file that doesn't fit in memory.
+
+        >>> cr = chunked_resolver('records.csv', chunk_size=500000)
+        >>> cr.compare('phone', columns='Phone')
+        >>> cr.compare('address', columns='Address', threshold=0.9)
+        >>> cr.network()
+
+        Find networks between two Parquet files.
+
+        >>> cr = chunked_resolver('records.parquet', 'batch.parquet')
+        >>> cr.compare('email', columns={'df': 'Email', 'df2': 'EmailAddress'}, threshold=0.8)
+        >>> cr.network()
+
+        See Also
+        --------
+        entity_resolver: compare dataframes that fit in memory
+        '''
+
+        # records are read again for each comparison
+        self._source = {'df': source, 'df2': source2}
+        self._chunk_size = chunk_size
+        self._clean_options = {'chunk_size': clean_chunksize, 'workers': clean_workers, 'cache': clean_cache, 'cache_size': clean_cache_size}
+
+        # remove a temporary directory when the resolver is removed
+        self._temporary = spill_directory is None
+        if self._temporary:
+            spill_directory = tempfile.mkdtemp()
+        else:
+            os.makedirs(spill_directory, exist_ok=True)
+        self._spill_directory = spill_directory
+
+        # number of records in each source, known after the first comparison
+        self._size = {'df': None, 'df2': None}
+
+        # compact node ids and similar edges
+        self.network_feature = {}
+        self.similarity_score = {}
+        self.network_id = None
+
+        # initialize performance time tracking and logging
+        operation_tracker.__init__(self)
+
+
+    def __del__(self):
+
+        if getattr(self, '_temporary', False):
+            shutil.rmtree(self._spill_directory, ignore_errors=True)
+
+
+    def compare(self, category, columns, threshold:float=1, kneighbors:int=10, hash_features:int=2**20):
+        ''' Compare columns of every chunk to find relationships used to find networks. Ids are connected components of
+        exact and similar matches, the same as entity_resolver.compare using transitive=True.
+
+        Parameters
+        ----------
+        category (str): generic_id, name, phone, email, email_domain, or address
+        columns (str|list|dict): columns in the first/second source to compare for each category
+        thresold (float, default=1): find values that exactly match (1) or within similar threshold (>0 to <1)
+        kneighbors (int|None, default=10): number of most similar values to find for each value, or every value meeting threshold if None
+        hash_features (int, default=2**20): number of hashed TF-IDF features since a vocabulary cannot be fit in chunks
+
+        Returns
+        -------
+        network_feature (pd.DataFrame): node and {category}_id of records matching another record
+        '''
+
+        # input arguments
+        _check_arguments(category, threshold, kneighbors, hash_features=hash_features)
+        if self._source['df2'] is None:
+            if not isinstance(columns, dict):
+                columns = {'df': columns}
+        elif not isinstance(columns, dict) or len({'df','df2'}-set(columns.keys()))>0:
+            raise RuntimeError('Columns parameter must be a dict containing keys for df and df2 if two sources are provided.')
+
+        # initialize timer for tracking duration
+        self.reset_time()
+
+        # assign nodes, clean values, and spill values of each chunk
+        seed = 0
+        files, hashed, node = {}, {}, {}
+        for frame in ['df','df2']:
+            if self._source[frame] is None:
+                continue
+            self._size[frame], files[frame], hashed[frame], node[frame] = _chunked.prepare_chunks(
+                self._source[frame], frame, seed, columns[frame], category, self._chunk_size, self._clean_options, self._spill_directory
+            )
+            seed += self._size[frame]
+            self.track('compare', '_chunked', 'prepare_chunks', category)
+
+        # find exact matches using a hash of each value, comparing values that share a hash
+        frames = list(hashed.keys())
+        combined = np.concatenate([h for frame in frames for h in hashed[frame]] or [np.array([], dtype='uint64')])
+        # read values sharing a hash once for exact matches and the first occurrence of values
+        shared = _chunked.shared_values(combined, [f for frame in frames for f in files[frame]], [len(h) for frame in frames for h in hashed[frame]])
+        source, target = _chunked.exact_edges(
+            combined, np.concatenate([n for frame in frames for n in node[frame]] or [np.array([], dtype='int64')]), shared
+        )
+        self.track('compare', '_chunked', 'exact_edges', category)
+
+        if threshold!=1:
+
+            # transform the first occurrence of each value in a frame since duplicates are exact matches
+            vectorizer = _hashing.hashing_tfidf(comparison_rules[category]['comparer'], hash_features, self._clean_options['chunk_size'])
+            spilled = {}
+            start = 0
+            for frame in frames:
+                # shared values of other frames are excluded
+                end = start+sum(len(h) for h in hashed[frame])
+                within = (shared[0]>=start) & (shared[0]<end)
+                keep = _chunked.first_value(
+                    np.concatenate(hashed[frame] or [np.array([], dtype='uint64')]), (shared[0][within]-start, shared[1][within])
+                )
+                start = end
+                keep = np.split(keep, np.cumsum([len(h) for h in hashed[frame]])[:-1]) if len(hashed[frame])>0 else []
+                spilled[frame] = _chunked.vectorize_chunks(files[frame], keep, vectorizer, frame=='df', self._spill_directory, category, frame)
+            self.track('compare', '_chunked', 'vectorize_chunks', category)
+
+            # search chunks of the first df for each chunk of the first or second df
+            frame = 'df2' if 'df2' in spilled else 'df'
+            similar = _chunked.search_chunks(spilled[frame], spilled['df'], kneighbors, threshold, symmetric=frame=='df')
+            self.track('compare', '_chunked', 'search_chunks', category)
+            self.similarity_score[category] = pd.DataFrame({'node_source': similar[0], 'node_target': similar[1], 'score': similar[2]})
+
+            source, target = np.concatenate([source, similar[0]]), np.concatenate([target, similar[1]])
+
+        # assign an id to connected nodes, which must link the first df to the second df
+        linked, labels = _chunked.component_id(source, target, self._size['df'] if self._source['df2'] is not None else None)
+        self.network_feature[category] = pd.DataFrame({'node': linked, f'{category}_id': labels})
+        self.track('compare', '_chunked', 'component_id', category)
+
+        return self.network_feature[category]
+
+
+    def network(self):
+        ''' Assign a network id to records connected by any compared category.
+
+        Returns
+        -------
+        network_id (pd.DataFrame): network_id and original index of records in a network, indexed by node
+        '''
+
+        # initialize timer for tracking duration
+        self.reset_time()
+
+        # link each node to the first node with the same id of a category
+        source, target = [], []
+        for category, feature in self.network_feature.items():
+            first, other = _chunked.exact_edges(feature[f'{category}_id'].to_numpy(dtype='uint64'), feature['node'].to_numpy(dtype='int64'))
+            source.append(first)
+            target.append(other)
+        source = np.concatenate(source or [np.array([], dtype='int64')])
+        target = np.concatenate(target or [np.array([], dtype='int64')])
+        linked, labels = _chunked.component_id(source, target)
+        self.track('network', '_chunked', 'component_id', None)
+
+        # read the original index of nodes in a network from spilled chunks
+        index_mask = {'df': None, 'df2': None}
+        for frame, size in self._size.items():
+            if size is None:
+                continue
+            index_mask[frame] = pd.concat([
+                mask[mask.index.isin(linked)] for mask in _chunked.read_index(self._spill_directory, frame)
+            ])
+        network_id = pd.DataFrame({'node': linked, 'network_id': labels})
+        network_id = _index.assign_index(network_id, index_mask)
+        self.network_id = network_id.set_index('node')
+        self.track('network', '_index', 'assign_index', None)
+
+        return self.network_id
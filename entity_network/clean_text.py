@@ -1,54 +1,104 @@
 '''Text cleaning functions for different categories of data.'''
+import re
+from functools import lru_cache
+
 import pandas as pd
 import flashtext
 from sklearn.feature_extraction._stop_words import ENGLISH_STOP_WORDS
 
 from entity_network import parse_components
 
+# optional dependency only needed for Arrow-backed strings
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
 # TODO: investigate cleantext https://pypi.org/project/clean-text/
 
 
-def _alphanumeric_only(prepared):
+# patterns compiled once at import
+_ALPHANUMERIC = re.compile(r'[\W_]+')
+_WHITESPACE = re.compile(r'\s{2,}')
+_EMAIL_DOMAIN = re.compile('@(.*)')
+_ZIP4 = re.compile(r'-\d+$')
+_LETTER_DIGIT = re.compile(r'(?<=\d)(?=[a-z])|(?<=[a-z])(?=\d)')
+_SINGLE_CHARACTER = re.compile(r'(?<=\b[^\W\d_])\s(?=[^\W\d_]\b)')
+_ORDINAL = re.compile(r'(?<=1)\s+(?=st\b)|(?<=2)\s+(?=nd\b)|(?<=3)\s+(?=rd\b)|(?<=\d)\s+(?=th\b)')
+_UNIT = re.compile(r'\b(lot)\b|\bbldg\b|\bapt\b|\bunit\b|\bste\b')
+_LEADING_TEXT = re.compile(r'^\D+')
 
-    return prepared.str.replace(r'[\W_]+', ' ', regex=True)
+# use common address abbreviations instead of full word
+_ADDRESS_ABBREVIATIONS = flashtext.KeywordProcessor()
+for _word, _abbreviation in {
+    'avenue':'ave', 'terrace':'ter', 'terr': 'ter', 'court':'ct', 'street':'st',
+    'place':'pl', 'lane':'ln', 'suite':'ste', 'building':'bldg', 'saint':'st',
+    'apartment':'apt', 'fort':'ft', 'highway':'hwy', 'parkway':'pkwy', 'road':'rd',
+    'drive': 'dr', 'boulevard': 'blvd',
+    'beach': 'bch',
+    'north':'n', 'south':'s', 'east':'e', 'west':'w',
+    'northeast':'ne', 'northwest':'nw', 'southeast':'se', 'southwest':'sw'
+}.items():
+    _ADDRESS_ABBREVIATIONS.add_keyword(_word, _abbreviation)
 
 
-def _common_presteps(prepared):
+_PLAIN_WORD = re.compile(r'[^\W_]+')
 
-    # insure pandas.String is returned
-    prepared = prepared.astype('string')
 
-    # lowercase
-    prepared = prepared.str.lower()
+@lru_cache(maxsize=None)
+def _compile_stopwords(stopwords, tokenized):
 
-    return prepared
+    # filter whitespace seperated tokens against a set if no entry is a regular expression
+    if tokenized and all(_PLAIN_WORD.fullmatch(word) for word in stopwords):
+        stopwords = frozenset(stopwords)
+        return lambda value: ' '.join(token for token in value.split() if token not in stopwords)
 
+    pattern = re.compile(r'\b(?:{})\b'.format('|'.join(stopwords)))
+    return lambda value: pattern.sub('', value)
 
-def _common_poststeps(prepared):
 
-    # remove extra whitespace
-    prepared = prepared.str.replace(r'\s{2,}', ' ', regex=True)
-    prepared = prepared.str.strip()
+def _stopword_remover(stopwords, category, tokenized=False):
 
-    # set values that only contain text as empty
-    prepared[prepared.str.len()==0] = pd.NA
+    if stopwords is None:
+        return None
+    elif stopwords=='default':
+        stopwords = comparison_rules[category]['stopwords']
 
-    return prepared
+    # compiled on first use for each set of stopwords
+    return _compile_stopwords(tuple(stopwords), tokenized)
 
 
-def _remove_stopwords(prepared, stopwords, category): 
+def _single_pass(values, clean_value):
+
+    # insure pandas.String input so non-string values are converted the same way
+    if not isinstance(values.dtype, pd.StringDtype):
+        values = values.astype('string')
+
+    # keep Arrow-backed strings in Arrow memory, only converting a chunk at a time to clean each value
+    if values.dtype.storage!='python':
+        prepared = pa.chunked_array([
+            pa.array([None if value is None else clean_value(value) for value in chunk.to_pylist()], type=pa.string())
+            for chunk in values.array.__arrow_array__().chunks
+        ], type=pa.string())
+        return pd.Series(pd.arrays.ArrowStringArray(prepared), index=values.index)
+
+    # apply every cleaning step to a value before moving to the next value
+    prepared = values.to_numpy(dtype=object, na_value=None)
+    prepared = [None if value is None else clean_value(value) for value in prepared]
+
+    return pd.Series(prepared, dtype='string', index=values.index)
 
-    if stopwords is None:
-        return prepared
-    elif stopwords=='default':
-        stopwords = comparison_rules[category]['stopwords']
-    
-    pattern = r'\b(?:{})\b'.format('|'.join(stopwords))
-    prepared = prepared.str.replace(pattern, '', regex=True)
 
-    # prepared[prepared==''] = pd.NA
+def _poststeps(value):
+
+    # remove extra whitespace
+    value = _WHITESPACE.sub(' ', value).strip()
+
+    # set values that only contain text as empty
+    if len(value)==0:
+        return None
 
-    return prepared
+    return value
 
 
 def possible_stopwords(values) -> pd.Series: 
@@ -80,12 +130,14 @@ def alphanumeric(values: pd.Series) -> pd.Series:
     Returns
     -------
     prepared (pd.Series) : values after processing
-    '''  
+    '''
 
-    prepared = _common_presteps(values)
-    prepared = _alphanumeric_only(prepared)
+    def clean_value(value):
+        value = value.lower()
+        value = _ALPHANUMERIC.sub(' ', value)
+        return _poststeps(value)
 
-    return _common_poststeps(prepared)
+    return _single_pass(values, clean_value)
 
 
 def name(values: pd.Series, stopwords='default') -> pd.Series:
@@ -98,15 +150,19 @@ def name(values: pd.Series, stopwords='default') -> pd.Series:
     Returns
     -------
     prepared (pd.Series) : values after processing
-    '''  
-
-    prepared = _common_presteps(values)
-    prepared = _alphanumeric_only(prepared)
+    '''
 
     # manually remove stopwords, as TfidfVectorizer stopwords only applys if analyzer='word'
-    prepared = _remove_stopwords(prepared, stopwords, 'name')
+    remove_stopwords = _stopword_remover(stopwords, 'name', tokenized=True)
 
-    return _common_poststeps(prepared)
+    def clean_value(value):
+        value = value.lower()
+        value = _ALPHANUMERIC.sub(' ', value)
+        if remove_stopwords is not None:
+            value = remove_stopwords(value)
+        return _poststeps(value)
+
+    return _single_pass(values, clean_value)
 
 
 def phone(values: pd.Series, stopwords='default') -> pd.Series:
@@ -121,16 +177,20 @@ def phone(values: pd.Series, stopwords='default') -> pd.Series:
     prepared (pd.Series) : values after processing
     '''
 
-    prepared = _common_presteps(values)
-
     # manually remove stopwords, as TfidfVectorizer stopwords only applys if analyzer='word'
-    prepared = _remove_stopwords(prepared, stopwords, 'phone')
+    remove_stopwords = _stopword_remover(stopwords, 'phone')
 
-    # parse using external library
-    prepared = parse_components.phone(prepared)
-    prepared = prepared['parsed']
-    
-    return _common_poststeps(prepared)
+    def clean_value(value):
+        value = value.lower()
+        if remove_stopwords is not None:
+            value = remove_stopwords(value)
+        if len(value)==0:
+            return None
+        # parse using external library
+        value = parse_components._parse_phone_text(value)
+        return _poststeps(value)
+
+    return _single_pass(values, clean_value)
 
 
 def email(values: pd.Series, stopwords='default') -> pd.Series:
@@ -147,40 +207,45 @@ def email(values: pd.Series, stopwords='default') -> pd.Series:
     prepared['email_domain'] (pd.Series) : email domain after processing
     '''
 
-    prepared = _common_email(values)
-
     # manually remove stopwords, as TfidfVectorizer stopwords only applys if analyzer='word'
-    prepared = _remove_stopwords(prepared, stopwords, 'email')
+    remove_stopwords = _stopword_remover(stopwords, 'email')
 
-    # keep only letters and numbers
-    prepared = prepared.str.replace(r'[\W_]+','', regex=True)
+    def clean_value(value):
+        value = _common_email(value)
+        if remove_stopwords is not None:
+            value = remove_stopwords(value)
+        # keep only letters and numbers
+        value = _ALPHANUMERIC.sub('', value)
+        return _poststeps(value)
 
-    return _common_poststeps(prepared)
+    return _single_pass(values, clean_value)
 
 
 def email_domain(values: pd.Series, stopwords='default') ->pd.Series:
 
-    prepared = _common_email(values)
-
-    # parse email domain
-    prepared = prepared.str.extract('@(.*)')
-    if prepared.shape[1]>1:
-        raise NotImplementedError('Multiple domains detected.')
-    else:
-        prepared = prepared[0]
-
     # manually remove stopwords, as TfidfVectorizer stopwords only applys if analyzer='word'
-    prepared = _remove_stopwords(prepared, stopwords, 'email_domain')
+    remove_stopwords = _stopword_remover(stopwords, 'email_domain')
+
+    def clean_value(value):
+        value = _common_email(value)
+        # parse email domain
+        value = _EMAIL_DOMAIN.search(value)
+        if value is None:
+            return None
+        value = value.group(1)
+        if remove_stopwords is not None:
+            value = remove_stopwords(value)
+        return _poststeps(value)
 
-    return _common_poststeps(prepared)
+    return _single_pass(values, clean_value)
 
 
-def _common_email(values:pd.Series):
+def _common_email(email:str):
 
-    email = _common_presteps(values)
+    email = email.lower()
 
     # remove all spaces
-    email = email.replace(r'\s+', '', regex=True)
+    email = ''.join(email.split())
 
     return email
 
@@ -197,54 +262,33 @@ def address(values: pd.Series, stopwords='default') -> pd.Series:
     prepared (pd.Series) : values after processing
     '''
 
-    prepared = _common_presteps(values)
-
     # manually remove stopwords, as TfidfVectorizer stopwords only applys if analyzer='word'
-    prepared = _remove_stopwords(prepared, stopwords, 'address')
-
-    # remove ZIP+4 since commonly isn't given
-    # TODO: allow option to include or ignore zip+4
-    prepared = prepared.replace(to_replace=r'-\d+$', value='', regex=True)
-
-    # keep only letters and numbers
-    prepared = _alphanumeric_only(prepared)
-
-    # introduce space between letters and digits
-    prepared = prepared.replace(to_replace=r'(?<=\d)(?=[a-z])|(?<=[a-z])(?=\d)', value=' ', regex=True)
-
-    # use common address abbreviations instead of full word
-    pattern = {
-        'avenue':'ave', 'terrace':'ter', 'terr': 'ter', 'court':'ct', 'street':'st',
-        'place':'pl', 'lane':'ln', 'suite':'ste', 'building':'bldg', 'saint':'st',
-        'apartment':'apt', 'fort':'ft', 'highway':'hwy', 'parkway':'pkwy', 'road':'rd',
-        'drive': 'dr', 'boulevard': 'blvd',
-        'beach': 'bch',
-        'north':'n', 'south':'s', 'east':'e', 'west':'w',
-        'northeast':'ne', 'northwest':'nw', 'southeast':'se', 'southwest':'sw'
-    }
-    replacer = flashtext.KeywordProcessor()
-    for k,v in pattern.items():
-        replacer.add_keyword(k,v)
-    prepared = pd.Series(
-        list(map(replacer.replace_keywords, prepared)),
-        dtype='string', index=prepared.index
-    )
-
-    # remove space between single characters
-    pattern = r'(?<=\b[^\W\d_])\s(?=[^\W\d_]\b)'
-    prepared = prepared.str.replace(pattern, '', regex=True)
-
-    # remove space between numbers and ordinal component
-    pattern = r'(?<=1)\s+(?=st\b)|(?<=2)\s+(?=nd\b)|(?<=3)\s+(?=rd\b)|(?<=\d)\s+(?=th\b)'
-    prepared = prepared.replace(to_replace=pattern, value='', regex=True)
-
-    # remove unit like identifiers
-    prepared = prepared.replace(to_replace=r'\b(lot)\b|\bbldg\b|\bapt\b|\bunit\b|\bste\b', value=' ', regex=True)
-
-    # remove first part of address if starts with a text
-    prepared = prepared.replace(to_replace=r'^\D+', value='', regex=True)
-
-    return _common_poststeps(prepared)
+    remove_stopwords = _stopword_remover(stopwords, 'address', tokenized=True)
+
+    def clean_value(value):
+        value = value.lower()
+        # remove ZIP+4 since commonly isn't given
+        # TODO: allow option to include or ignore zip+4
+        value = _ZIP4.sub('', value)
+        # keep only letters and numbers
+        value = _ALPHANUMERIC.sub(' ', value)
+        if remove_stopwords is not None:
+            value = remove_stopwords(value)
+        # introduce space between letters and digits
+        value = _LETTER_DIGIT.sub(' ', value)
+        # use common address abbreviations instead of full word
+        value = _ADDRESS_ABBREVIATIONS.replace_keywords(value)
+        # remove space between single characters
+        value = _SINGLE_CHARACTER.sub('', value)
+        # remove space between numbers and ordinal component
+        value = _ORDINAL.sub('', value)
+        # remove unit like identifiers
+        value = _UNIT.sub(' ', value)
+        # remove first part of address if starts with a text
+        value = _LEADING_TEXT.sub('', value)
+        return _poststeps(value)
+
+    return _single_pass(values, clean_value)
 
 
 comparison_rules = {
@@ -1,17 +1,197 @@
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import json
+import os
+import shutil
+import tempfile
 
+import numpy as np
 import pandas as pd
+from scipy.sparse import vstack
 
-from entity_network import _index, _prepare, _compare_records, _network_helpers, _exceptions, _debug
+from entity_network import _index, _prepare, _compare_records, _network_helpers, _exceptions, _debug, _similarity, _parquet
 from entity_network.clean_text import comparison_rules
 from entity_network._performance_tracker import operation_tracker
 from entity_network.network_plotter import network_dashboard
 
+def _check_arguments(category, threshold, kneighbors, block=None, index_directory=None, backend=None, kneighbors_max=None, hash_features=None):
+    '''Validate compare arguments.'''
+
+    if not category in comparison_rules.keys():
+        raise _exceptions.InvalidCategory(f'Argument category must be one of {list(comparison_rules.keys())}')
+    if kneighbors is not None and (not isinstance(kneighbors, int) or kneighbors<0):
+        raise _exceptions.KneighborsRange('Argument kneighbors must be a positive integer or None.')
+    if threshold<=0 or threshold>1:
+        raise _exceptions.ThresholdRange('Argument threshold must be >0 and <=1.')
+    if block is not None and index_directory is not None:
+        raise _exceptions.UnsupportedCombination('Argument index_directory cannot be used with block since each block has a seperate index.')
+    _similarity.backend_name(backend, radius=kneighbors is None)
+    if kneighbors_max is not None:
+        if kneighbors is None or not isinstance(kneighbors_max, int) or kneighbors_max<kneighbors:
+            raise _exceptions.KneighborsRange('Argument kneighbors_max must be an integer >= kneighbors.')
+        if block is not None:
+            raise _exceptions.UnsupportedCombination('Argument kneighbors_max cannot be used with block since each block is searched using kneighbors.')
+    if hash_features is not None and (not isinstance(hash_features, int) or hash_features<1):
+        raise _exceptions.HashFeaturesRange('Argument hash_features must be a positive integer or None.')
+
+
+def _compare_values(tracker, index_mask, values, category, columns, threshold, kneighbors, index_directory, clean_options, block_key=None, block_workers=None, backend=None, kneighbors_max=None, hash_features=None, transitive=False):
+    '''Clean, exactly match, and similarly match flattened values of a category, recording durations using tracker.'''
+
+    # clean column text
+    text_cleaner = comparison_rules[category]['cleaner']
+    values, measures = _prepare.clean(values, category, text_cleaner, **clean_options)
+    tracker.track('compare', '_prepare', 'clean', category)
+    for name, value in measures.items():
+        tracker.measure('compare', '_prepare', 'clean', category, name, value)
+
+    # find exact matches
+    related_feature, df_exact = _compare_records.exact_match(values)
+    tracker.track('compare', '_compare_records', 'exact_match', category)
+
+    # find similar matches
+    id_category = f'{category}_id'
+    if threshold==1:
+        # skip finding similar matches due to increased processed requirements and non-exact fuzzy matching
+        related_feature['id_similar'] = pd.NA
+        related_feature[id_category] = related_feature['id_exact']
+        similar_score = None
+        tracker.track('compare', None, None, 'skip similar')
+    else:
+
+        # search every value meeting the threshold if kneighbors isn't provided
+        backend = _similarity.backend_name(backend, radius=kneighbors is None)
+
+        # create term frequency–inverse document frequency matrix to numerically compare text
+        text_comparer = comparison_rules[category]['comparer']
+        saved = None
+        if index_directory is not None:
+            saved = _compare_records.load_index(index_directory, category, backend, hash_features)
+            tracker.track('compare', '_compare_records', 'load_index', category)
+        # index the larger of two dataframes unless the index of the first df is saved
+        indexed = 'df'
+        if values['df2'] is not None and index_directory is None and block_key is None:
+            indexed = _compare_records.index_frame(values)
+            tracker.track('compare', '_compare_records', 'index_frame', category)
+        if saved is None:
+            tfidf, tfidf_index, vectorizer = _compare_records.create_tfidf(values, text_comparer, None, block_key, indexed, hash_features)
+            tracker.track('compare', '_compare_records', 'create_tfidf', category)
+        else:
+            # use the saved tfidf of the first df if created from the same values
+            tfidf, tfidf_index, vectorizer = _compare_records.saved_tfidf(saved, values)
+            tracker.track('compare', '_compare_records', 'saved_tfidf', category)
+
+        if block_key is not None:
+            # index and search values that share a blocking key
+            index = None
+            similar_score, block_size = _compare_records.block_match(tfidf, tfidf_index, block_key, kneighbors, block_workers, backend, threshold)
+            tracker.track('compare', '_compare_records', 'block_match', category)
+            tracker.measure('compare', '_compare_records', 'block_match', category, 'blocks', len(block_size))
+            tracker.measure('compare', '_compare_records', 'block_match', category, 'block_size_max', block_size.max(initial=0))
+            tracker.measure('compare', '_compare_records', 'block_match', category, 'block_size_mean', block_size.mean() if len(block_size)>0 else 0)
+        elif saved is None:
+            # index tfidf for searching
+            index = _compare_records.create_index(tfidf, backend, indexed)
+            tracker.track('compare', '_compare_records', 'create_index', category)
+            if index_directory is not None:
+                _compare_records.save_index(index_directory, category, vectorizer, index, tfidf_index['df'], values['df'], tfidf['df'])
+                tracker.track('compare', '_compare_records', 'save_index', category)
+        else:
+            index = saved['index']
+
+        if block_key is None and kneighbors_max is not None:
+            # find more neighbors only for values where every neighbor meets the threshold
+            similar_score, saturated = _compare_records.adaptive_match(index, tfidf, tfidf_index, kneighbors, kneighbors_max, threshold, indexed)
+            tracker.track('compare', '_compare_records', 'adaptive_match', category)
+            for round_kneighbors, count in saturated:
+                tracker.measure('compare', '_compare_records', 'adaptive_match', category, f'saturated_kneighbors={round_kneighbors}', count)
+        elif block_key is None:
+            # find similar text values using a non-blocking k-nearest neighbor approach
+            similar_score = _compare_records.similar_match(index, tfidf, tfidf_index, kneighbors, threshold, indexed)
+            tracker.track('compare', '_compare_records', 'similar_match', category)
+
+        # assign an overall id to similar records using connected components
+        similar_feature = _compare_records.similar_id(similar_score, tfidf_index, threshold)
+        tracker.track('compare', '_compare_records', 'similar_id', category)
+
+        # expand similarity score after an id was assigned using connected components
+        similar_score = _compare_records.expand_score(similar_score, similar_feature, threshold)
+        tracker.track('compare', '_compare_records', 'expand_score', category)
+
+        # determine an overall id using connected components of similar and exact matches
+        related_feature, similar_feature = _compare_records.combined_id(related_feature, similar_feature, id_category, transitive)
+        tracker.track('compare', '_compare_records', 'combined_id', category)
+
+        # include duplicated values in the first df related to a value in the second
+        related_feature, similar_score = _compare_records.fill_exact(related_feature, similar_score, df_exact, block_key)
+        tracker.track('compare', '_compare_records', 'fill_exact', category)
+
+    # remove matches that do not match another index (columns for a category may contain the same value for a given record)
+    related_feature, similar_score = _compare_records.remove_self(related_feature, similar_score, id_category)
+    tracker.track('compare', '_compare_records', 'remove_self', category)
+
+    # assign the original index
+    related_feature, similar_score = _compare_records.translate_index(related_feature, similar_score, index_mask, id_category)
+    tracker.track('compare', '_compare_records', 'translate_index', category)
+
+    # arguments and fitted state for comparing added records
+    state = {
+        'columns': columns, 'threshold': threshold, 'kneighbors': kneighbors, 'kneighbors_max': kneighbors_max, 'block': block_key,
+        'backend': backend, 'vectorizer': None, 'index': None, 'tfidf': None, 'tfidf_index': None, 'appended': None, 'query': None
+    }
+    if threshold!=1:
+        state.update({'vectorizer': vectorizer, 'index': index, 'tfidf_index': tfidf_index['df']})
+        if values['df2'] is not None:
+            # values of the second df are compared to records added to the first df
+            state['query'] = {'tfidf': tfidf['df2'], 'tfidf_index': tfidf_index['df2']}
+        if indexed=='df2' or block_key is not None:
+            # added records are compared to the first df which is indexed when records are added, or searched by block
+            state.update({'index': None, 'tfidf': tfidf['df']})
+
+    return values, df_exact, related_feature, similar_score, state
+
+
+def _stack_tfidf(stacked, tfidf, tfidf_index):
+    '''Add tfidf and tfidf_index of appended values to previously stacked values.'''
+
+    if stacked is None:
+        return {'tfidf': tfidf, 'tfidf_index': tfidf_index}
+
+    return {
+        'tfidf': vstack([stacked['tfidf'], tfidf], format='csr'),
+        'tfidf_index': pd.concat([stacked['tfidf_index'], tfidf_index], ignore_index=True)
+    }
+
+
+def _compare_process(index_mask, values, category, columns, threshold, kneighbors, index_directory, clean_options, block_key, backend, kneighbors_max, hash_features, transitive):
+    '''Compare values of a category in a worker process, saving the similarity index for the main process to load.'''
+
+    tracker = operation_tracker()
+    tracker.reset_time()
+
+    # clean in the worker process since categories are already compared in parallel
+    values, df_exact, related_feature, similar_score, state = _compare_values(
+        tracker, index_mask, values, category, columns, threshold, kneighbors, index_directory, clean_options, block_key, backend=backend, kneighbors_max=kneighbors_max,
+        hash_features=hash_features, transitive=transitive
+    )
+
+    # return the index location since the index cannot be pickled
+    if state['index'] is not None:
+        if index_directory is None:
+            directory = tempfile.mkdtemp()
+            _compare_records.save_index(directory, category, state['vectorizer'], state['index'], state['tfidf_index'], values['df'])
+            tracker.track('compare', '_compare_records', 'save_index', category)
+        else:
+            directory = index_directory
+        state['index'] = directory
+
+    return values, df_exact, related_feature, similar_score, state, tracker.process_time, tracker.process_measure
+
+
 class entity_resolver(operation_tracker, network_dashboard):
 
 
-    def __init__(self, df:pd.DataFrame, df2:pd.DataFrame = None):
+    def __init__(self, df:pd.DataFrame, df2:pd.DataFrame = None, clean_workers:int = None, clean_chunksize:int = 100000, clean_cache:str = None, clean_cache_size:int = 1000000):
         ''' Find links in a single dataframe or two dataframes for
         entity resolution and/or network link analysis.
 
@@ -21,6 +201,10 @@ class entity_resolver(operation_tracker, network_dashboard):
         ----------
         df (pandas.DataFrame): first dataframe containing entity features
         df2 (pandas.DataFrame, default=None): second dataframe containing entity features
+        clean_workers (int, default=None): number of processes used to clean text, cleans in the current process if None
+        clean_chunksize (int, default=100000): number of values cleaned in each process if clean_workers is provided
+        clean_cache (str, default=None): SQLite file to reuse values cleaned in previous runs, created if it doesn't exist
+        clean_cache_size (int, default=1000000): maximum number of cleaned values kept in clean_cache
 
         Properties TODO: document important class properties
         ----------
@@ -69,28 +253,106 @@ class entity_resolver(operation_tracker, network_dashboard):
 
         '''
 
-        # assign globally unique node value
+        # assign globally unique node value, referencing records without copying
         self._df, self._index_mask = _index.assign_node(df, df2)
 
+        # nodes of records removed using retract
+        self._retracted = pd.Index([], dtype='int64', name='node')
+
         # preprocessed text values
         self._compared_values = {}
+        self._clean_options = {'chunk_size': clean_chunksize, 'workers': clean_workers, 'cache': clean_cache, 'cache_size': clean_cache_size}
 
         # exact matches removed before finding similar matches
         self._df_exact = {}
 
+        # arguments and fitted vectorizer/index for comparing added records
+        self._compare_state = {}
+
         # outputs from compare method
         self.network_feature = {}
+        self._incidence = _network_helpers.feature_incidence()
         self.similarity_score = {}
         self._compared_columns = OrderedDict([('name',None)])
         
         # outputs from network method
         self.network_id, self.network_map, self.entity_map = [None]*3
 
+        # components maintained between incremental network updates
+        self._network_components = None
+
         # initialize performance time tracking and logging
         operation_tracker.__init__(self)
 
 
-    def compare(self, category, columns, threshold:float=1, kneighbors:int=10):
+    @classmethod
+    def from_parquet(cls, path:str, path2:str = None, columns=None, **kwargs):
+        ''' Read Parquet files using Arrow-backed string columns, only reading columns that will be compared.
+
+        Parameters
+        ----------
+        path (str): Parquet file or dataset for the first dataframe
+        path2 (str, default=None): Parquet file or dataset for the second dataframe
+        columns (str|list|dict, default=None): columns to read from the first/second file, including columns that will be combined, reads every column if None
+        kwargs: other arguments of entity_resolver
+
+        Examples
+        --------
+
+        Read only the columns that will be compared.
+
+        >>> er = entity_resolver.from_parquet('records.parquet', columns=['Name','Phone','Address'])
+        >>> er.compare('phone', columns='Phone')
+
+        Read two files.
+
+        >>> er = entity_resolver.from_parquet('records.parquet', 'batch.parquet', columns={'df': ['Email'], 'df2': ['EmailAddress']})
+        >>> er.compare('email', columns={'df': 'Email', 'df2': 'EmailAddress'}, threshold=0.8)
+        '''
+
+        if not isinstance(columns, dict):
+            columns = {'df': columns, 'df2': columns}
+
+        # read columns of each file
+        df = {'df': None, 'df2': None}
+        for frame, file in zip(['df','df2'], [path, path2]):
+            if file is None:
+                continue
+            cols = columns.get(frame)
+            df[frame] = _parquet.read(file, None if cols is None else _prepare.source_columns(cols))
+
+        return cls(df['df'], df['df2'], **kwargs)
+
+
+    def to_parquet(self, directory:str):
+        ''' Write network results as Parquet datasets partitioned by network_id.
+
+        Parameters
+        ----------
+        directory (str): directory containing a network_id, network_map, and network_summary dataset
+
+        Examples
+        --------
+
+        >>> er.network()
+        >>> er.to_parquet('results')
+        '''
+
+        if self.network_id is None:
+            raise RuntimeError('Method network must be called before writing results.')
+
+        # network_summary isn't available for a single dataframe
+        results = {'network_id': self.network_id, 'network_map': self.network_map, 'network_summary': self.network_summary}
+        for name, result in results.items():
+            if result is None:
+                continue
+            _parquet.write(result, os.path.join(directory, name))
+
+
+    def compare(
+        self, category, columns, threshold:float=1, kneighbors:int=10, index_directory:str=None, block=None, block_workers:int=None,
+        backend:str=None, kneighbors_max:int=None, hash_features:int=None, transitive:bool=False
+    ):
         ''' Compare columns in a single dataframe or two dataframes to find relationships
         used to resolve entities and find networks.
 
@@ -99,7 +361,14 @@ class entity_resolver(operation_tracker, network_dashboard):
         category (str): generic_id, name, phone, email, email_domain, or address
         columns (str|list|dict): columns in the first/second dataframe to compare for each category
         thresold (float, default=1): find values that exactly match (1) or within similar threshold (>0 to <1)
-        kneighbors (int): TODO: test and document affect of kneighbors
+        kneighbors (int|None, default=10): number of most similar values to find for each value, or every value meeting threshold if None. With two dataframes, values of the dataframe with fewer unique values are searched for in the other unless index_directory or block is provided
+        index_directory (str, default=None): directory to load the fitted TF-IDF vectorizer and similarity index from, or save them to if not previously saved, cannot be used with block
+        block (str|dict, default=None): column with a blocking key in the first/second dataframe, similar values are only found within the same key
+        block_workers (int, default=None): number of processes used to find similar values in each block, uses the current process if None
+        backend (str, default=None): similarity search using nmslib, sklearn, or brute_force, defaults to nmslib if installed and kneighbors is provided otherwise brute_force
+        kneighbors_max (int, default=None): requery values with every neighbor meeting threshold using double kneighbors up to kneighbors_max, cannot be used with block
+        hash_features (int, default=None): number of hashed TF-IDF features to bound memory instead of storing a vocabulary of every word or character
+        transitive (bool, default=False): assign ids using connected components of exact and similar matches, the same ids as chunked_resolver, instead of assigning similar values the first exact id of the values
 
         Examples
         --------
@@ -124,6 +393,36 @@ class entity_resolver(operation_tracker, network_dashboard):
         >>> er = entity_resolver(df, df2)
         >>> er.compare('address', columns={'df': 'AddressCol1', 'df2': [['Line1','City','State','Zip']]}, threshold=0.9)
 
+        Save the fitted vectorizer and similarity index on the first run and load them on later runs.
+
+        >>> er = entity_resolver(df)
+        >>> er.compare('address', columns='Address', threshold=0.9, index_directory='saved_index')
+
+        Find every similar value meeting the threshold instead of the 10 most similar values.
+
+        >>> er = entity_resolver(df)
+        >>> er.compare('address', columns='Address', threshold=0.9, kneighbors=None)
+
+        Start with 5 neighbors and only find up to 80 neighbors for values with many similar values.
+
+        >>> er = entity_resolver(df)
+        >>> er.compare('address', columns='Address', threshold=0.9, kneighbors=5, kneighbors_max=80)
+
+        Find similar values using scikit-learn instead of nmslib.
+
+        >>> er = entity_resolver(df)
+        >>> er.compare('address', columns='Address', threshold=0.9, backend='sklearn')
+
+        Hash characters of names into a fixed number of features instead of fitting a vocabulary.
+
+        >>> er = entity_resolver(df)
+        >>> er.compare('name', columns='Name', threshold=0.8, hash_features=2**20)
+
+        Only find similar addresses in the same state. Records missing a blocking key are only exactly matched.
+
+        >>> er = entity_resolver(df, df2)
+        >>> er.compare('address', columns={'df': 'Address', 'df2': 'Address'}, threshold=0.8, block={'df': 'State', 'df2': 'State'})
+
         See Also
         --------
         network: resolve entities and form final network relationships
@@ -131,79 +430,135 @@ class entity_resolver(operation_tracker, network_dashboard):
         '''
 
         # input arguments
-        if not category in comparison_rules.keys():
-            raise _exceptions.InvalidCategory(f'Argument category must be one of {list(comparison_rules.keys())}')
-        if not isinstance(kneighbors, int) or kneighbors<0:
-            raise _exceptions.KneighborsRange('Argument kneighbors must be a positive integer.')
-        if threshold<=0 or threshold>1:
-            raise _exceptions.ThresholdRange('Argument threshold must be >0 and <=1.')
+        _check_arguments(category, threshold, kneighbors, block, index_directory, backend, kneighbors_max, hash_features)
 
         # initialize timer for tracking duration
         self.reset_time()
 
+        # select only the columns compared or used for blocking
+        frames = _index.select_columns(self._df, _prepare.frame_columns(columns, block), self._retracted)
+        self.track('compare', '_index', 'select_columns', category)
+
         # create a single column, possibly composed of multiple columns for a category or split columns to be combined
-        self._compared_values[category], self._compared_columns[category] = _prepare.flatten(self._df, columns, category)
+        self._compared_values[category], self._compared_columns[category] = _prepare.flatten(frames, columns, category)
         self.track('compare', '_prepare', 'flatten', category)
 
-        # clean column text
-        text_cleaner = comparison_rules[category]['cleaner']
-        self._compared_values[category] = _prepare.clean(self._compared_values[category], category, text_cleaner)
-        self.track('compare', '_prepare', 'clean', category)
-
-        # find exact matches
-        related_feature, self._df_exact[category] = _compare_records.exact_match(self._compared_values[category])
-        self.track('compare', '_compare_records', 'exact_match', category)
-
-        # find similar matches
-        id_category = f'{category}_id'
-        if threshold==1:
-            # skip finding similar matches due to increased processed requirements and non-exact fuzzy matching
-            related_feature['id_similar'] = pd.NA
-            related_feature[id_category] = related_feature['id_exact']
-            similar_score = None
-            self.track('compare', None, None, 'skip similar')
-        else:
+        # blocking key of each node to partition finding similar values
+        block_key = None
+        if block is not None:
+            block_key = _prepare.block(frames, block)
+            self.track('compare', '_prepare', 'block', category)
 
-            # create term frequency–inverse document frequency matrix to numerically compare text
-            text_comparer = comparison_rules[category]['comparer']
-            tfidf, tfidf_index = _compare_records.create_tfidf(self._compared_values[category], text_comparer)
-            self.track('compare', '_compare_records', 'create_tfidf', category)
+        # clean and compare values
+        self._compared_values[category], self._df_exact[category], related_feature, similar_score, self._compare_state[category] = _compare_values(
+            self, self._index_mask, self._compared_values[category], category, columns, threshold, kneighbors, index_directory, self._clean_options,
+            block_key, block_workers, backend, kneighbors_max, hash_features, transitive
+        )
 
-            # find similar text values using a non-blocking k-nearest neighbor approach
-            similar_score = _compare_records.similar_match(tfidf, tfidf_index, kneighbors)
-            self.track('compare', '_compare_records', 'similar_match', category)
+        # store similarity for debugging
+        self.similarity_score[category] = similar_score
 
-            # assign an overall id to similar records using connected components
-            similar_feature = _compare_records.similar_id(similar_score, tfidf_index, threshold)
-            self.track('compare', '_compare_records', 'similar_id', category)
+        # store features for forming network and entity resolution
+        self.network_feature[category] = related_feature
+        self._incidence.replace(category, related_feature)
+        self.track('compare', '_network_helpers', 'feature_incidence', category)
 
-            # expand similarity score after an id was assigned using connected components
-            similar_score = _compare_records.expand_score(similar_score, similar_feature, threshold)
-            self.track('compare', '_compare_records', 'expand_score', category)
+        return related_feature, similar_score
 
-            # determine an overall id using connected components of similar and exact matches
-            related_feature, similar_feature = _compare_records.combined_id(related_feature, similar_feature, id_category)
-            self.track('compare', '_compare_records', 'combined_id', category)
 
-            # include duplicated values in the first df related to a value in the second
-            related_feature, similar_score = _compare_records.fill_exact(related_feature, similar_score, self._df_exact[category])
-            self.track('compare', '_compare_records', 'fill_exact', category)
+    def compare_many(self, comparisons:dict, max_workers:int=None):
+        ''' Compare several categories in parallel using a process pool. Results are the same as calling compare for
+        each category.
 
-        # remove matches that do not match another index (columns for a category may contain the same value for a given record)
-        related_feature, similar_score = _compare_records.remove_self(related_feature, similar_score, id_category)
-        self.track('compare', '_compare_records', 'remove_self', category)
+        Parameters
+        ----------
+        comparisons (dict): category keys with values of a dict of compare arguments
+        max_workers (int, default=None): number of processes, defaults to the number of processors
 
-        # assign the original index
-        related_feature, similar_score = _compare_records.translate_index(related_feature, similar_score, self._index_mask, id_category)
-        self.track('compare', '_compare_records', 'translate_index', category)
+        Examples
+        --------
 
-        # store similarity for debugging
-        self.similarity_score[category] = similar_score
+        Compare categories in parallel. Call from within an `if __name__=='__main__':` block on platforms that spawn processes.
 
-        # store features for forming network and entity resolution
-        self.network_feature[category] = related_feature
+        >>> er = entity_resolver(df)
+        >>> er.compare_many({
+        ...     'phone': {'columns': ['HomePhone','WorkPhone']},
+        ...     'email': {'columns': 'Email'},
+        ...     'address': {'columns': 'Address', 'threshold': 0.9}
+        ... })
 
-        return related_feature, similar_score
+        See Also
+        --------
+        compare: methods to compare values
+        network: resolve entities and form final network relationships
+
+        '''
+
+        # input arguments using the same defaults as compare
+        comparisons = {
+            category: {'threshold': 1, 'kneighbors': 10, 'index_directory': None, 'block': None, 'backend': None, 'kneighbors_max': None, 'hash_features': None, 'transitive': False, **arguments}
+            for category, arguments in comparisons.items()
+        }
+        for category, arguments in comparisons.items():
+            _check_arguments(
+                category, arguments['threshold'], arguments['kneighbors'], arguments['block'], arguments['index_directory'], arguments['backend'],
+                arguments['kneighbors_max'], arguments['hash_features']
+            )
+
+        # initialize timer for tracking duration
+        self.reset_time()
+
+        # select only the columns compared or used for blocking by any category
+        frames = _index.select_columns(
+            self._df, _prepare.frame_columns(*[argument for arguments in comparisons.values() for argument in (arguments['columns'], arguments['block'])]),
+            self._retracted
+        )
+        self.track('compare', '_index', 'select_columns', None)
+
+        # create a single column for each category in this process since combined columns are added to the dataframe
+        values, block_key = {}, {}
+        for category, arguments in comparisons.items():
+            values[category], self._compared_columns[category] = _prepare.flatten(frames, arguments['columns'], category)
+            self.track('compare', '_prepare', 'flatten', category)
+            block_key[category] = None if arguments['block'] is None else _prepare.block(frames, arguments['block'])
+
+        # clean and compare values of each category in a seperate process
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                category: executor.submit(
+                    _compare_process, self._index_mask, values[category], category,
+                    arguments['columns'], arguments['threshold'], arguments['kneighbors'], arguments['index_directory'],
+                    {'cache': self._clean_options['cache'], 'cache_size': self._clean_options['cache_size']}, block_key[category],
+                    arguments['backend'], arguments['kneighbors_max'], arguments['hash_features'], arguments['transitive']
+                )
+                for category, arguments in comparisons.items()
+            }
+            results = {category: future.result() for category, future in futures.items()}
+        self.track('compare_many', None, None, 'process pool')
+
+        for category, (compared_values, df_exact, related_feature, similar_score, state, process_time, process_measure) in results.items():
+
+            # load the similarity index saved by the worker process
+            if state['index'] is not None:
+                directory = state['index']
+                state['index'] = _compare_records.load_index(directory, category)['index']
+                if comparisons[category]['index_directory'] is None:
+                    shutil.rmtree(directory)
+                self.track('compare_many', '_compare_records', 'load_index', category)
+
+            # store outputs the same as compare
+            self._compared_values[category] = compared_values
+            self._df_exact[category] = df_exact
+            self._compare_state[category] = state
+            self.similarity_score[category] = similar_score
+            self.network_feature[category] = related_feature
+            self._incidence.replace(category, related_feature)
+
+            # include durations and measurements recorded by the worker process
+            self.process_time = pd.concat([self.process_time, process_time], ignore_index=True)
+            self.process_measure = pd.concat([self.process_measure, process_measure], ignore_index=True)
+
+        self.process_time = self.process_time.sort_values(by='duration_seconds', ascending=False)
 
 
     def network(self):
@@ -242,12 +597,12 @@ class entity_resolver(operation_tracker, network_dashboard):
         # initialize timer for tracking duration
         self.reset_time()
 
-        # form matrix of indices connected on any feature
+        # form the output map of feature ids of each node, networks are found using the incidence instead
         self.network_map = _network_helpers.combine_features(self.network_feature)
         self.track('network', '_network_helpers', 'combine_features', None)
 
-        # determine an overall id using indices connected on any feature
-        self.network_id, self.network_map = _network_helpers.assign_id(self.network_map)
+        # determine an overall id using connected components of the node and feature id incidence formed while comparing
+        self.network_id, self.network_map = _network_helpers.assign_id(self.network_map, self._incidence)
         self.track('network', '_network_helpers', 'assign_id', None)
 
         # assign the original index
@@ -267,6 +622,263 @@ class entity_resolver(operation_tracker, network_dashboard):
         #     self.entity_map, self.network_map = _network_helpers.resolve_entity(self.network_map, self.network_feature, self._df['df'])
         #     self.track('network', '_network_helpers', 'resolve_entity', None)
     
+    def add_records(self, df:pd.DataFrame, frame:str='df'):
+        ''' Append records and compare them to existing records for every compared category without refitting
+        TF-IDF or rebuilding the similarity index. Categories compared using block only find similar values of added
+        records within the same blocking key.
+
+        Parameters
+        ----------
+        df (pandas.DataFrame): records containing the columns used in each comparison
+        frame (str, default='df'): dataframe to append records to, either df or df2 if two dataframes were provided
+
+        Examples
+        --------
+        Compare a new batch of records to existing records.
+
+        >>> er = entity_resolver(df)
+        >>> er.compare('phone', columns='Phone')
+        >>> er.compare('address', columns='Address', threshold=0.9)
+        >>> er.add_records(df_batch)
+
+        See Also
+        --------
+        compare: methods to compare values
+        upsert_network: update networks using compared features
+        '''
+
+        # initialize timer for tracking duration
+        self.reset_time()
+
+        # assign nodes after existing nodes
+        segment, self._index_mask = _index.append_node(df, frame, self._index_mask)
+        self.track('add_records', '_index', 'append_node', None)
+        appended = {'df': None, 'df2': None}
+        appended[frame] = [segment]
+
+        for category, state in self._compare_state.items():
+
+            id_category = f'{category}_id'
+
+            # select only the compared columns of appended records
+            block = None if state['block'] is None else {name: key.name for name, key in state['block'].items() if key is not None}
+            frames = _index.select_columns(appended, _prepare.frame_columns(state['columns'], block))
+
+            # create a single column using the same columns as the comparison
+            values, _ = _prepare.flatten(frames, state['columns'], category)
+            self.track('add_records', '_prepare', 'flatten', category)
+
+            # blocking key of appended records
+            if block is not None:
+                state['block'][frame] = pd.concat([state['block'][frame], _prepare.block(frames, block)[frame]])
+                self.track('add_records', '_prepare', 'block', category)
+
+            # clean column text
+            text_cleaner = comparison_rules[category]['cleaner']
+            values, measures = _prepare.clean(values, category, text_cleaner, **self._clean_options)
+            self.track('add_records', '_prepare', 'clean', category)
+            for name, value in measures.items():
+                self.measure('add_records', '_prepare', 'clean', category, name, value)
+
+            # remove original index to compare by node
+            related_feature = self.network_feature[category].drop(columns=[col for col in ['df_index','df2_index'] if col in self.network_feature[category]])
+            related_feature = related_feature.reset_index()
+
+            # find exact matches to existing or appended values
+            related_feature = _compare_records.append_exact(values, self._compared_values[category], self._df_exact[category], related_feature)
+            self.track('add_records', '_compare_records', 'append_exact', category)
+
+            similar_score = None
+            if state['threshold']!=1:
+
+                # transform text to tfidf using the fitted vectorizer
+                tfidf, tfidf_index = _compare_records.append_tfidf(values, state['vectorizer'], state['block'])
+                self.track('add_records', '_compare_records', 'append_tfidf', category)
+
+                # include values appended to the first df as possible matches
+                if self._df['df2'] is None or frame=='df':
+                    state['appended'] = _stack_tfidf(state['appended'], tfidf, tfidf_index)
+
+                if state['block'] is not None:
+                    # find similar values only within the same blocking key of appended values
+                    added = {'tfidf': tfidf, 'tfidf_index': tfidf_index}
+                    if self._df['df2'] is not None and frame=='df':
+                        similar_score = _compare_records.append_block(state['query'], added, state['block'], state['kneighbors'], state['threshold'])
+                    else:
+                        # search the first df including appended values
+                        searched = {'tfidf': state['tfidf'], 'tfidf_index': state['tfidf_index']}
+                        if state['appended'] is not None:
+                            searched = _stack_tfidf(searched, **state['appended'])
+                        similar_score = _compare_records.append_block(added, searched, state['block'], state['kneighbors'], state['threshold'])
+                        if self._df['df2'] is not None:
+                            state['query'] = _stack_tfidf(state['query'], tfidf, tfidf_index)
+                    self.track('add_records', '_compare_records', 'append_block', category)
+                elif self._df['df2'] is not None and frame=='df':
+                    # find similar values for the second df in values appended to the first
+                    similar_score = _compare_records.append_query(state['query'], tfidf, tfidf_index, state['kneighbors'], state['threshold'])
+                    self.track('add_records', '_compare_records', 'append_query', category)
+                else:
+                    # index the first df if the second df was indexed during compare
+                    if state['index'] is None:
+                        state['index'] = _compare_records.create_index({'df': state['tfidf']}, state['backend'])
+                        state['tfidf'] = None
+                        self.track('add_records', '_compare_records', 'create_index', category)
+
+                    # find similar values in the existing index and appended values
+                    similar_score = _compare_records.append_match(
+                        state['index'], state['tfidf_index'], state['appended'], tfidf, tfidf_index, state['kneighbors'], state['threshold'],
+                        state['kneighbors_max']
+                    )
+                    self.track('add_records', '_compare_records', 'append_match', category)
+
+                    # compare values later appended to the first df to values appended to the second
+                    if self._df['df2'] is not None:
+                        state['query'] = _stack_tfidf(state['query'], tfidf, tfidf_index)
+
+                # assign similar ids while preserving existing ids
+                existing = self.similarity_score[category]
+                scored = existing['id_similar'].set_axis(existing.index.get_level_values('node'))
+                scored = scored[~scored.index.duplicated()]
+                related_feature, similar_feature, similar_id = _compare_records.append_similar_id(
+                    related_feature, similar_score, tfidf_index, state['threshold'], scored
+                )
+                self.track('add_records', '_compare_records', 'append_similar_id', category)
+
+                # expand similarity score for appended values
+                similar_score = _compare_records.expand_score(similar_score, similar_feature, state['threshold'])
+                self.track('add_records', '_compare_records', 'expand_score', category)
+
+                # update existing similarity score ids
+                position = similar_id.index.get_indexer(existing.index.get_level_values('node'))
+                remap = position>=0
+                ids = existing['id_similar'].to_numpy(dtype='int64', copy=True)
+                ids[remap] = similar_id.to_numpy()[position[remap]]
+                existing['id_similar'] = ids
+
+            # determine an overall id while preserving existing ids
+            related_feature = _compare_records.append_id(related_feature, id_category)
+            self.track('add_records', '_compare_records', 'append_id', category)
+
+            # assign the original index
+            related_feature, similar_score = _compare_records.translate_index(related_feature, similar_score, self._index_mask, id_category)
+            self.track('add_records', '_compare_records', 'translate_index', category)
+
+            # store appended values, features, and similarity
+            self._compared_values[category][frame] = pd.concat([self._compared_values[category][frame], values[frame]])
+            self.network_feature[category] = related_feature
+            self._incidence.replace(category, related_feature)
+            if similar_score is not None:
+                self.similarity_score[category] = pd.concat([self.similarity_score[category], similar_score])
+
+        # reference appended records
+        self._df[frame] = (self._df[frame] or []) + appended[frame]
+
+        # update networks if previously maintained incrementally
+        if self._network_components is not None:
+            self.upsert_network()
+
+
+    def upsert_network(self, categories=None):
+        ''' Update networks using compared features, only recomputing networks that changed since the last update.
+
+        Parameters
+        ----------
+        categories (str|list, default=None): compared categories to update, defaults to all compared categories
+
+        Examples
+        --------
+        Update networks after comparing an additional category.
+
+        >>> er = entity_resolver(df)
+        >>> er.compare('phone', columns='Phone')
+        >>> er.upsert_network()
+        >>> er.compare('email', columns='Email')
+        >>> er.upsert_network('email')
+
+        See Also
+        --------
+        network: resolve entities and form final network relationships
+        retract: remove records from compared features and networks
+        '''
+
+        # initialize timer for tracking duration
+        self.reset_time()
+
+        if categories is None:
+            categories = list(self.network_feature.keys())
+        elif isinstance(categories, str):
+            categories = [categories]
+
+        # maintain components between updates
+        if self._network_components is None:
+            self._network_components = _network_helpers.network_components(self._incidence)
+
+        # update edges of each category from the incidence while recording nodes in networks that changed
+        touched = [np.array([], dtype='int64')]
+        for category in categories:
+            touched += [self._network_components.upsert(category)]
+            self.track('network', '_network_helpers', 'upsert', category)
+        touched = np.unique(np.concatenate(touched))
+
+        # replace networks that changed
+        self.network_id, self.network_map = _network_helpers.update_id(
+            self.network_id, self.network_map, self.network_feature, self._network_components, touched, self._index_mask
+        )
+        self.track('network', '_network_helpers', 'update_id', None)
+
+        # summerize the network by connections
+        self.network_summary = _network_helpers.summerize_connections(self.network_id, self.network_feature, self._compared_values, self._df_exact)
+        self.track('network', '_network_helpers', 'summerize_connections', None)
+
+
+    def retract(self, index, frame='df'):
+        ''' Remove records from compared features and networks, only recomputing networks the records belonged to.
+
+        Parameters
+        ----------
+        index (list|pandas.Index): index values of records to remove
+        frame (str, default='df'): dataframe the index belongs to, either df or df2
+
+        Examples
+        --------
+        Remove a record for a data-deletion request.
+
+        >>> er = entity_resolver(df)
+        >>> er.compare('phone', columns='Phone')
+        >>> er.upsert_network()
+        >>> er.retract([12])
+
+        See Also
+        --------
+        upsert_network: update networks using compared features
+        '''
+
+        # initialize timer for tracking duration
+        self.reset_time()
+
+        # find nodes of the records
+        nodes = self._index_mask[frame]
+        nodes = nodes.index[nodes.isin(index)]
+
+        # exclude records from later comparisons and remove features no longer shared with another record
+        self._retracted = self._retracted.append(nodes)
+        for category in self.network_feature.keys():
+            self.network_feature[category], self.similarity_score[category] = _compare_records.remove_node(
+                self.network_feature[category], self.similarity_score[category], nodes, f'{category}_id'
+            )
+            self._incidence.replace(category, self.network_feature[category])
+            for name, values in self._compared_values[category].items():
+                if values is not None:
+                    self._compared_values[category][name] = values[~values.index.get_level_values('node').isin(nodes)]
+            if self._df_exact[category] is not None:
+                exact = self._df_exact[category]
+                self._df_exact[category] = exact[~exact.index.isin(nodes) & ~exact['node'].isin(nodes)]
+        self.track('network', '_compare_records', 'remove_node', None)
+
+        # recompute networks that contained the records
+        self.upsert_network()
+
+
     def _join_contents(self, df, column_name_regex, remove_extra_newlines=True):
         # TODO: move method somewhere
 
@@ -291,7 +903,10 @@ class entity_resolver(operation_tracker, network_dashboard):
         combined = combined.explode(f'{df_name}_index')
 
         combined = combined.merge(self._index_mask[df_name].reset_index(), how='left', on=f'{df_name}_index')
-        combined = combined.merge(self._df[df_name], how='left', on='node')
+
+        # read back original columns of records only for reporting
+        records = _index.select_records(self._df, df_name, combined['node'].dropna())
+        combined = combined.merge(records, how='left', on='node')
 
         combined = combined.drop(columns=[f'{df_name}_index','node'])
         columns = combined.columns.drop('network_id')
@@ -5,6 +5,8 @@ import pandas as pd
 import phonenumbers
 import usaddress
 
+_NON_NUMERIC = re.compile(r'[^0-9\s]+')
+
 def _to_frame(values):
 
     values = pd.DataFrame(values.tolist(), columns=['components','parsed'], index=values.index)
@@ -28,32 +30,46 @@ def common(values, delimiter):
 
     return components
 
-def phone(values):
+def _format_phone(number):
+
+    parsed = str(number.country_code)+' '+str(number.national_number)
+    if number.extension is not None:
+        # TODO: remove 'ext' string so phonenumbers is able to reparse
+        # TODO: should these values be reparsed during network summary term difference
+        parsed += ' ext '+str(number.extension)
+
+    return parsed
+
+def _parse_phone(value):
 
     # wrapper to allow for handling errors
-    def parse(value):
-        if len(value)==0:
-            return {None: None}, None
-        try:
-            components = phonenumbers.parse(value, 'US')
-            components = {
-                'Country': components.country_code,
-                'Number': components.national_number,
-                'Extension': components.extension
-            }
-            parsed = str(components['Country'])+' '+str(components['Number'])
-            if components['Extension'] is not None:
-                # TODO: remove 'ext' string so phonenumbers is able to reparse
-                # TODO: should these values be reparsed during network summary term difference
-                parsed += ' ext '+str(components['Extension'])
-            components = set(components.items())
-        except phonenumbers.phonenumberutil.NumberParseException:
-            components = None
-            parsed = re.sub(r'[^0-9\s]+', '', value)
-        return components, parsed
-    
+    if len(value)==0:
+        return {None: None}, None
+    try:
+        number = phonenumbers.parse(value, 'US')
+        parsed = _format_phone(number)
+        components = {
+            ('Country', number.country_code),
+            ('Number', number.national_number),
+            ('Extension', number.extension)
+        }
+    except phonenumbers.phonenumberutil.NumberParseException:
+        components = None
+        parsed = _NON_NUMERIC.sub('', value)
+    return components, parsed
+
+def _parse_phone_text(value):
+
+    # parsed text only, skipping components when cleaning
+    try:
+        return _format_phone(phonenumbers.parse(value, 'US'))
+    except phonenumbers.phonenumberutil.NumberParseException:
+        return _NON_NUMERIC.sub('', value)
+
+def phone(values):
+
     # apply wrapper around open source library
-    values = values.apply(parse)
+    values = values.apply(_parse_phone)
     values = _to_frame(values)
 
     return values
@@ -0,0 +1,55 @@
+'''Throughput of the clean_text cleaners for each category.
+
+Cleaned values are checked against fixed expected outputs in tests/test_clean_text.py.
+
+Run from the repository root:
+
+>>> python -m tests.benchmark_clean_text
+'''
+from time import time
+
+import pandas as pd
+from faker import Faker
+
+from entity_network.clean_text import comparison_rules
+
+
+def sample_values(n_unique, seed=0):
+    '''Fake values for each category including empty and non-string values.'''
+
+    fake = Faker(locale='en_US')
+    fake.seed_instance(seed)
+
+    extra = ['', '   ', 123456789, 'Some Name', '1111111111', 'noreply@noreply.com', '12 North-West Road Apt. 4B']
+    values = {
+        'generic_id': [fake.bothify('??-####-??') for _ in range(n_unique)],
+        'name': [fake.name() if idx%2 else fake.company() for idx in range(n_unique)],
+        'phone': [fake.phone_number() for _ in range(n_unique)],
+        'email': [fake.email() for _ in range(n_unique)],
+        'email_domain': [fake.email() for _ in range(n_unique)],
+        'address': [fake.address() for _ in range(n_unique)]
+    }
+
+    return {category: pd.Series(sample+extra) for category, sample in values.items()}
+
+
+def benchmark(n_unique=10000, repeat=3):
+    '''Values cleaned per second for each category using the fastest of repeat runs.'''
+
+    results = []
+    for category, values in sample_values(n_unique).items():
+
+        duration = []
+        for _ in range(repeat):
+            tstart = time()
+            _ = comparison_rules[category]['cleaner'](values)
+            duration.append(time()-tstart)
+
+        results.append([category, len(values)/min(duration)])
+
+    return pd.DataFrame(results, columns=['category', 'values_per_second'])
+
+
+if __name__ == '__main__':
+
+    print(benchmark().to_string(index=False))
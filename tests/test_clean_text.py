@@ -1,9 +1,13 @@
 from time import time
+from functools import partial
+import inspect
 
 import pandas as pd
 from faker import Faker
 
-from entity_network import clean_text
+from entity_network import clean_text, _prepare, _clean_cache
+
+from . import benchmark_clean_text
 
 fake = Faker(locale='en_US')
 
@@ -43,6 +47,22 @@ def test_name():
     )
 
 
+def test_name_stopwords():
+
+    values = pd.Series([
+        "The Foo and Bar Company",
+        "Bar_Baz of the City",
+    ])
+
+    # plain words are removed as tokens
+    prepared = clean_text.name(values, stopwords=['the', 'and', 'company'])
+    assert prepared.equals(pd.Series(["foo bar", "bar baz of city"], dtype='string'))
+
+    # regular expression entries still apply
+    prepared = clean_text.name(values, stopwords=[r'ba\w', 'the'])
+    assert prepared.equals(pd.Series(["foo and company", "of city"], dtype='string'))
+
+
 def test_phone():
 
     values = pd.Series([
@@ -137,4 +157,135 @@ def test_address_speed():
     _ = clean_text.address(values)
     duration = time()-tstart
 
-    assert duration<10
\ No newline at end of file
+    assert duration<10
+
+
+def test_single_pass_expected():
+
+    # value before and after cleaning, covering each step of every cleaner
+    cases = {
+        'generic_id': [('AB-1234-cd', 'ab 1234 cd'), ('  x_y  z ', 'x y z'), ('', None), (123456789, '123456789')],
+        'name': [
+            ('The Walt Disney Company', 'walt disney company'), ('Smith, John A.', 'smith john'), ('and the of', None),
+            ("Mary-Jane  O'Neil", 'mary jane o neil')
+        ],
+        'phone': [
+            ('(555) 123-4567', '1 5551234567'), ('+1-555-123-4567 x89', '1 5551234567 ext 89'), ('555.123.4567', '1 5551234567'),
+            ('1111111111', None), ('call me', None), ('', None)
+        ],
+        'email': [
+            ('John.Smith@Example.com', 'johnsmithexamplecom'), (' jane_doe @ gmail.com', 'janedoegmailcom'),
+            ('noreply@noreply.com', None), ('NoReply@NoReply.com', None)
+        ],
+        'email_domain': [
+            ('John.Smith@Example.com', 'example'), ('jane@gmail.com', None), ('someone@mail.yahoo.net', 'mail.'), ('no domain', None)
+        ],
+        'address': [
+            ('123 North Main Street Apt. 4B, Springfield, IL 62704-1234', '123 n main st 4 b springfield il 62704'),
+            ('12 North-West Road Apt. 4B', '12 nw rd 4 b'), ('PO Box 12 of the Lane', '12 ln'), ('1 2nd Avenue Suite 300', '1 2nd ave 300'),
+            ('Building 5 at the Beach Drive', '5 bch dr'), ('12 the_main street', '12 main st')
+        ]
+    }
+
+    for category, pairs in cases.items():
+        values = pd.Series([value for value, _ in pairs])
+        expected = pd.Series([cleaned for _, cleaned in pairs], dtype='string')
+        actual = clean_text.comparison_rules[category]['cleaner'](values)
+        assert actual.equals(expected), category
+
+
+def test_single_pass_missing():
+
+    values = pd.Series(['123 North RoadName Road', pd.NA], index=[5, 7])
+
+    for category, rules in clean_text.comparison_rules.items():
+        prepared = rules['cleaner'](values)
+        assert prepared.index.equals(values.index)
+        assert prepared.isna().iloc[1], category
+
+
+def test_single_pass_arrow():
+
+    # Arrow-backed strings are cleaned the same and stay in Arrow memory
+    for category, values in benchmark_clean_text.sample_values(100).items():
+        expected = clean_text.comparison_rules[category]['cleaner'](values)
+        actual = clean_text.comparison_rules[category]['cleaner'](values.astype('string[pyarrow]'))
+        assert actual.dtype==pd.StringDtype('pyarrow'), category
+        assert actual.astype('string').equals(expected), category
+
+
+def test_clean_chunks():
+
+    values = pd.Series(
+        [fake.phone_number() for _ in range(1000)],
+        index=pd.MultiIndex.from_product([range(0, 500), ['HomePhone','WorkPhone']], names=['node','column'])
+    )
+
+    serial, _ = _prepare.clean({'df': values.copy(), 'df2': None}, 'phone', clean_text.phone)
+    parallel, _ = _prepare.clean({'df': values.copy(), 'df2': None}, 'phone', clean_text.phone, chunk_size=300, workers=2)
+
+    assert parallel['df'].equals(serial['df'])
+    assert parallel['df'].index.equals(values.index)
+
+
+
+def test_clean_unique():
+
+    values = pd.Series(
+        ['123 North RoadName Road', '123 N RoadName Rd', pd.NA, '123 North RoadName Road']*250,
+        index=pd.MultiIndex.from_product([range(0, 500), ['HomeAddress','WorkAddress']], names=['node','column'])
+    )
+
+    cleaned, measures = _prepare.clean({'df': values.copy(), 'df2': None}, 'address', clean_text.address)
+
+    expected = clean_text.address(values.fillna(''))
+    expected.name = 'address'
+    assert cleaned['df'].equals(expected)
+    assert measures['unique_ratio']==2/1000
+
+
+
+def test_clean_cache(tmp_path):
+
+    cache = str(tmp_path / 'cleaned.sqlite')
+    values = pd.Series(
+        ['123 North RoadName Road', '123 N RoadName Rd', pd.NA, '456 South RoadName Street'],
+        index=pd.MultiIndex.from_product([range(0, 2), ['HomeAddress','WorkAddress']], names=['node','column'])
+    )
+    expected, _ = _prepare.clean({'df': values.copy(), 'df2': None}, 'address', clean_text.address)
+
+    # first run cleans and stores all distinct values
+    cleaned, measures = _prepare.clean({'df': values.copy(), 'df2': None}, 'address', clean_text.address, cache=cache)
+    assert cleaned['df'].equals(expected['df'])
+    assert measures['cache_hit']==0
+    assert measures['cache_miss']==3
+
+    # next run only cleans new values
+    values.iloc[3] = '789 East RoadName Avenue'
+    expected, _ = _prepare.clean({'df': values.copy(), 'df2': None}, 'address', clean_text.address)
+    cleaned, measures = _prepare.clean({'df': values.copy(), 'df2': None}, 'address', clean_text.address, cache=cache, cache_size=3)
+    assert cleaned['df'].equals(expected['df'])
+    assert measures['cache_hit']==2
+    assert measures['cache_miss']==1
+
+    # least recently used value is evicted
+    cache = _clean_cache.clean_cache(cache)
+    assert cache.connection.execute('SELECT COUNT(*) FROM cleaned').fetchone()[0]==3
+    assert cache.counters()=={'hit': 2, 'miss': 4}
+    cache.close()
+
+
+def test_clean_cache_fingerprint():
+
+    fingerprint = _clean_cache.clean_cache.fingerprint
+    rules = clean_text.comparison_rules['address']
+    original = fingerprint('address', clean_text.address, rules)
+    assert fingerprint('address', clean_text.address, rules)==original
+
+    # cleaning arguments and category rules change the fingerprint
+    assert fingerprint('address', partial(clean_text.address, stopwords=None), rules)!=original
+    assert fingerprint('address', clean_text.address, {**rules, 'stopwords': ['road']})!=original
+
+    # parse_components is used by the address cleaner
+    sources, _ = _clean_cache.clean_cache._sources(inspect.getmodule(clean_text.address))
+    assert 'entity_network.parse_components' in sources
@@ -0,0 +1,280 @@
+import pandas as pd
+import numpy as np
+import pytest
+
+from entity_network import _compare_records, _similarity, _exceptions, _hashing
+
+def test_similar_match_arrays():
+
+    values = {
+        'df': pd.Series(
+            ['123 main st', '123 main street', '456 oak ave'],
+            index=pd.MultiIndex.from_tuples([(0,'Address'),(1,'Address'),(2,'Address')], names=['node','column'])
+        ),
+        'df2': None
+    }
+
+    tfidf, tfidf_index, _ = _compare_records.create_tfidf(values, 'word')
+    index = _compare_records.create_index(tfidf)
+    similar_score = _compare_records.similar_match(index, tfidf, tfidf_index, kneighbors=3)
+
+    assert set(similar_score.keys())=={'node_source','node_target','column','score'}
+    assert all(isinstance(arr, np.ndarray) for arr in similar_score.values())
+    assert len(similar_score['node_source'])==len(similar_score['node_target'])==len(similar_score['score'])
+
+    similar_feature = _compare_records.similar_id(similar_score, tfidf_index, threshold=0.5)
+    assert similar_feature.loc[similar_feature['node']==0, 'id_similar'].iloc[0]==similar_feature.loc[similar_feature['node']==1, 'id_similar'].iloc[0]
+    assert similar_feature.loc[similar_feature['node']==0, 'id_similar'].iloc[0]!=similar_feature.loc[similar_feature['node']==2, 'id_similar'].iloc[0]
+
+    expanded = _compare_records.expand_score(similar_score, similar_feature, threshold=0.5)
+    assert expanded.index.name=='node_similar'
+    assert (expanded.index!=expanded['node']).all()
+    assert expanded['node'].dtype=='int32'
+    assert expanded['score'].dtype=='float32'
+
+
+@pytest.mark.parametrize('backend', ['nmslib', 'sklearn', 'brute_force'])
+def test_backend_query(backend):
+
+    values = {
+        'df': pd.Series(
+            ['123 main st', '123 main street', '456 oak ave', '456 oak avenue', '789 pine rd'],
+            index=pd.MultiIndex.from_tuples([(idx,'Address') for idx in range(5)], names=['node','column'])
+        ),
+        'df2': None
+    }
+    tfidf, tfidf_index, _ = _compare_records.create_tfidf(values, 'word')
+
+    # every backend finds the same pairs above the threshold, keeping each pair once
+    expected = _similarity.top_product(tfidf['df'], tfidf['df'], kneighbors=3)
+    expected = {frozenset((source, target)) for source, target, score in zip(*expected) if score>=0.5 and source!=target}
+
+    index = _compare_records.create_index(tfidf, backend)
+    similar_score = _compare_records.similar_match(index, tfidf, tfidf_index, kneighbors=3)
+    actual = [
+        frozenset((source, target)) for source, target, score in zip(similar_score['node_source'], similar_score['node_target'], similar_score['score'])
+        if score>=0.5
+    ]
+    assert len(actual)==len(set(actual))
+    assert set(actual)==expected
+
+
+def test_backend_default(monkeypatch):
+
+    assert isinstance(_similarity.init_index('brute_force'), _similarity.brute_force_search)
+    with pytest.raises(_exceptions.InvalidBackend):
+        _similarity.init_index('annoy')
+
+    # brute force search is used if nmslib is not installed
+    monkeypatch.setattr(_similarity, 'nmslib', None)
+    assert _similarity.backend_name(None)=='brute_force'
+    with pytest.raises(ImportError):
+        _similarity.init_index('nmslib')
+
+
+@pytest.mark.parametrize('backend', ['nmslib', 'sklearn', 'brute_force'])
+def test_backend_radius(backend):
+
+    # more similar values than kneighbors
+    values = {
+        'df': pd.Series(
+            [f'123 main st apt {idx}' for idx in range(15)]+['456 oak ave'],
+            index=pd.MultiIndex.from_tuples([(idx,'Address') for idx in range(16)], names=['node','column'])
+        ),
+        'df2': None
+    }
+    tfidf, tfidf_index, _ = _compare_records.create_tfidf(values, 'word')
+    index = _compare_records.create_index(tfidf, backend)
+
+    limited = _compare_records.similar_match(index, tfidf, tfidf_index, kneighbors=3)
+    assert (np.bincount(limited['node_source'])<=3).all()
+
+    # every pair meeting the threshold is found
+    similar_score = _compare_records.similar_match(index, tfidf, tfidf_index, kneighbors=None, threshold=0.3)
+    assert (similar_score['score']>=0.3-1e-9).all()
+    actual = [frozenset(pair) for pair in zip(similar_score['node_source'], similar_score['node_target'])]
+    assert len(actual)==len(set(actual))
+    assert set(actual)=={frozenset((source, target)) for source in range(15) for target in range(source+1, 15)}
+
+
+def test_adaptive_match():
+
+    values = {
+        'df': pd.Series(
+            [f'123 main st apt {idx}' for idx in range(15)]+['456 oak ave'],
+            index=pd.MultiIndex.from_tuples([(idx,'Address') for idx in range(16)], names=['node','column'])
+        ),
+        'df2': None
+    }
+    tfidf, tfidf_index, _ = _compare_records.create_tfidf(values, 'word')
+    index = _compare_records.create_index(tfidf, 'brute_force')
+    expected = _compare_records.similar_match(index, tfidf, tfidf_index, kneighbors=None, threshold=0.3)
+    expected = {frozenset(pair) for pair in zip(expected['node_source'], expected['node_target'])}
+
+    # saturated values are requeried until every neighbor meeting the threshold is found
+    similar_score, saturated = _compare_records.adaptive_match(index, tfidf, tfidf_index, kneighbors=2, kneighbors_max=32, threshold=0.3)
+    assert saturated==[(2, 15), (4, 15), (8, 15), (16, 0)]
+    assert {frozenset(pair) for pair in zip(similar_score['node_source'], similar_score['node_target'])}==expected
+
+    # values stop being requeried at kneighbors_max
+    similar_score, saturated = _compare_records.adaptive_match(index, tfidf, tfidf_index, kneighbors=2, kneighbors_max=4, threshold=0.3)
+    assert saturated==[(2, 15), (4, 15)]
+    assert (np.bincount(similar_score['node_source'])<=4).all()
+
+
+@pytest.mark.parametrize('kneighbors', [None, 3])
+def test_index_larger_frame(kneighbors):
+
+    values = {
+        'df': pd.Series(
+            ['123 main st', '456 oak ave'],
+            index=pd.MultiIndex.from_tuples([(0,'Address'),(1,'Address')], names=['node','column'])
+        ),
+        'df2': pd.Series(
+            ['123 main street', '456 oak avenue', '789 pine rd', '321 elm ct', '654 maple dr'],
+            index=pd.MultiIndex.from_tuples([(idx,'StreetAddress') for idx in range(2, 7)], names=['node','column'])
+        )
+    }
+    assert _compare_records.index_frame(values)=='df2'
+
+    # scores keep the orientation of the second df to the first df
+    expected = {}
+    for indexed in ['df', 'df2']:
+        tfidf, tfidf_index, _ = _compare_records.create_tfidf(values.copy(), 'word', fit_frame=indexed)
+        index = _compare_records.create_index(tfidf, 'brute_force', indexed)
+        similar_score = _compare_records.similar_match(index, tfidf, tfidf_index, kneighbors, threshold=0.3, indexed=indexed)
+        assert np.isin(similar_score['node_source'], values['df2'].index.get_level_values('node')).all()
+        assert np.isin(similar_score['node_target'], values['df'].index.get_level_values('node')).all()
+        assert (similar_score['column']=='Address').all()
+        expected[indexed] = {
+            (source, target) for source, target, score in zip(similar_score['node_source'], similar_score['node_target'], similar_score['score'])
+            if score>=0.3
+        }
+    assert expected['df']==expected['df2']=={(2, 0), (3, 1)}
+
+
+def test_hashing_tfidf():
+
+    values = pd.Series(
+        ['123 main st', '123 main street', '456 oak ave', '456 oak avenue', '789 pine rd'],
+        index=pd.MultiIndex.from_tuples([(idx,'Address') for idx in range(5)], names=['node','column'])
+    )
+
+    # hashed features score the same as a vocabulary without collisions
+    tfidf, _, _ = _compare_records.create_tfidf({'df': values, 'df2': None}, 'char')
+    hashed, _, vectorizer = _compare_records.create_tfidf({'df': values, 'df2': None}, 'char', hash_features=2**20)
+    assert isinstance(vectorizer, _hashing.hashing_tfidf)
+    assert hashed['df'].shape==(5, 2**20)
+    assert np.allclose((hashed['df'] @ hashed['df'].T).toarray(), (tfidf['df'] @ tfidf['df'].T).toarray())
+
+    # fitting in chunks is the same as fitting at once
+    chunked = _hashing.hashing_tfidf('char', 2**20, chunk_size=2)
+    assert np.allclose(chunked.fit_transform(values.array).toarray(), hashed['df'].toarray())
+    assert (chunked.document_frequency==vectorizer.document_frequency).all()
+
+    # new values are transformed without refitting
+    assert np.allclose(chunked.transform(values.array[0:2]).toarray(), hashed['df'][0:2].toarray())
+    assert chunked.n_documents==5
+
+
+def test_compact_dtype():
+
+    values = {
+        'df': pd.Series(
+            ['123 main st', '123 main street', '456 oak ave', '456 oak avenue', '789 pine rd'],
+            index=pd.MultiIndex.from_tuples([(idx,'Address') for idx in range(5)], names=['node','column'])
+        ),
+        'df2': None
+    }
+    tfidf, tfidf_index, vectorizer = _compare_records.create_tfidf(values, 'char')
+    assert tfidf['df'].dtype=='float32'
+    assert tfidf['df'].indices.dtype=='int32'
+    assert tfidf['df'].indptr.dtype=='int32'
+
+    # float32 scores match float64 scores within a tolerance
+    index = _compare_records.create_index(tfidf, 'brute_force')
+    similar_score = _compare_records.similar_match(index, tfidf, tfidf_index, kneighbors=None, threshold=0.01)
+    assert similar_score['node_source'].dtype=='int32'
+    assert similar_score['score'].dtype=='float32'
+    expected = vectorizer.transform(values['df'].array).astype('float64')
+    expected = (expected @ expected.T).toarray()[similar_score['node_source'], similar_score['node_target']]
+    assert np.allclose(similar_score['score'], expected, rtol=0, atol=1e-6)
+
+    # larger node values use int64
+    assert _compare_records.node_dtype(np.array([0, 2**31], dtype='int64'))=='int64'
+
+
+def test_translate_index():
+
+    index_mask = {
+        'df': pd.Series(pd.to_datetime(['2020-01-01','2020-01-02']), index=range(0, 2), name='df_index'),
+        'df2': pd.Series([10, 20], index=range(2, 4), name='df2_index')
+    }
+    related_feature = pd.DataFrame({
+        'node': [0, 3], 'column': ['Phone','Phone'], 'id_exact': [0, 0], 'id_similar': [None, None], 'phone_id': [0, 0]
+    })
+    similar_score = pd.DataFrame({
+        'node': [0, 1], 'node_similar': [3, 2], 'score': [0.9, 0.8]
+    }).set_index(['node','node_similar'])
+
+    # original index values of nodes, missing if in the other dataframe, preserving type
+    related_feature, similar_score = _compare_records.translate_index(related_feature, similar_score, index_mask, 'phone_id')
+    assert related_feature['df_index'].dtype=='datetime64[ns]'
+    assert related_feature['df_index'].isna().tolist()==[False, True]
+    assert related_feature['df2_index'].equals(pd.Series([pd.NA, 20], index=related_feature.index, name='df2_index', dtype='Int64'))
+    assert similar_score['df_index'].tolist()==list(index_mask['df'])
+    assert similar_score['df2_index'].tolist()==[20, 10]
+
+
+def test_exact_match():
+
+    values = {
+        'df': pd.Series(
+            ['b', 'a', 'b', pd.NA, 'c', 'b'],
+            index=pd.MultiIndex.from_tuples([(0,'Phone'),(1,'Phone'),(2,'Phone'),(3,'Phone'),(4,'Phone'),(4,'Phone2')], names=['node','column']),
+            dtype='string'
+        ),
+        'df2': pd.Series(
+            ['c', 'b', pd.NA],
+            index=pd.MultiIndex.from_tuples([(5,'Phone'),(6,'Phone'),(7,'Phone')], names=['node','column']),
+            dtype='string'
+        )
+    }
+
+    # values in both df and df2 numbered in the order of values
+    related_feature, df_exact = _compare_records.exact_match(values)
+    assert related_feature['node'].tolist()==[0, 2, 4, 4, 5, 6]
+    assert related_feature['column'].tolist()==['Phone','Phone','Phone','Phone2','Phone','Phone']
+    assert related_feature['id_exact'].tolist()==[0, 0, 1, 0, 1, 0]
+
+    # duplicates in df relate to the first node with the same value
+    assert df_exact.index.tolist()==[0, 0]
+    assert df_exact['node'].tolist()==[2, 4]
+    assert df_exact['column'].tolist()==['Phone','Phone2']
+
+    # values in a single df
+    related_feature, df_exact = _compare_records.exact_match({'df': values['df'], 'df2': None})
+    assert related_feature['node'].tolist()==[0, 2, 4]
+    assert related_feature['id_exact'].tolist()==[0, 0, 0]
+    assert df_exact is None
+
+
+def test_combined_id():
+
+    related_feature = pd.DataFrame({
+        'node': [0, 1, 2, 3], 'column': ['Email']*4, 'id_exact': [3, 3, 1, 1]
+    })
+    similar_feature = pd.DataFrame({
+        'node': [1, 2, 4, 5, 6], 'column': ['Email']*5, 'id_similar': [0, 0, 0, 7, 7]
+    })
+
+    # a similar id takes the first exact id of its values, exact ids are not combined transitively
+    transitive, _ = _compare_records.combined_id(related_feature.copy(), similar_feature, 'email_id', transitive=True)
+    related_feature, _ = _compare_records.combined_id(related_feature, similar_feature, 'email_id')
+    assert related_feature['node'].tolist()==[0, 1, 2, 3, 4, 5, 6]
+    assert related_feature['email_id'].tolist()==[3, 3, 3, 1, 3, 4, 4]
+    assert related_feature['email_id'].dtype=='Int64'
+
+    # connected components of exact and similar ids
+    assert transitive['node'].tolist()==[0, 1, 2, 3, 4, 5, 6]
+    assert transitive['email_id'].tolist()==[0, 0, 0, 0, 0, 1, 1]
@@ -38,15 +38,16 @@ def test_address_one_df(df_samples):
         'df_index', 'df_index_similar',
         'address_df_value', 'address_df_similar_value'
     ]))
-    assert (similar['score']>threshold).equals(pd.Series([True, True, False, False, False, False], dtype='boolean'))
-    assert similar['threshold'].equals(pd.Series([True, True, False, False, False, False], dtype='boolean'))
-    assert similar['column'].equals(pd.Series(['Address0']*6))
-    assert similar['df_index'].equals(pd.Series([2,0,0,2,1,1], dtype='Int64'))
-    assert similar['df_index_similar'].equals(pd.Series([0,2,1,1,0,2], dtype='int64'))
-
-    assert len(in_cluster)==2
+    # each pair of values is scored once
+    assert (similar['score']>threshold).equals(pd.Series([True, False, False], dtype='bool'))
+    assert similar['threshold'].equals(pd.Series([True, False, False], dtype='bool'))
+    assert similar['column'].equals(pd.Series(['Address0']*3))
+    assert similar['df_index'].equals(pd.Series([2,2,1], dtype='int64'))
+    assert similar['df_index_similar'].equals(pd.Series([0,1,0], dtype='int64'))
+
+    assert len(in_cluster)==1
     assert 'address_difference' in in_cluster.columns
-    assert len(out_cluster)==4
+    assert len(out_cluster)==2
     assert 'address_difference' in out_cluster.columns
 
 
@@ -62,12 +63,12 @@ def test_address_two_df(df_samples):
         'score', 'threshold', 'column', 'id_similar', 'df_index', 'df2_index',
         'address_df_value', 'column_df2', 'address_df2_similar_value',
     ]))
-    assert (similar['score']>threshold).equals(pd.Series([True, True, False, True, True], dtype='boolean'))
-    assert similar['threshold'].equals(pd.Series([True, True, False, True, True], dtype='boolean'))
+    assert (similar['score']>threshold).equals(pd.Series([True, True, False, True, True], dtype='bool'))
+    assert similar['threshold'].equals(pd.Series([True, True, False, True, True], dtype='bool'))
     assert similar['column'].equals(pd.Series(['Address0']*5))
     assert similar['column_df2'].equals(pd.Series(['Address1']*5))
-    assert similar['df_index'].equals(pd.Series([2,0,1,3,4], dtype='Int64'))
-    assert similar['df2_index'].equals(pd.Series([0,0,0,1,1], dtype='Int64'))
+    assert similar['df_index'].equals(pd.Series([2,0,1,3,4], dtype='int64'))
+    assert similar['df2_index'].equals(pd.Series([0,0,0,1,1], dtype='int64'))
 
     assert len(in_cluster)==4
     assert 'address_difference' in in_cluster.columns
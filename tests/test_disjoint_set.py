@@ -0,0 +1,29 @@
+import numpy as np
+
+from entity_network import _disjoint_set
+
+def test_sparse_elements():
+
+    components = _disjoint_set.disjoint_set([5, 1000000, 42, 7, 7])
+    components.union([5, 42], [42, 1000000])
+
+    assert len(components.parent)==4
+    labels = components.labels([5, 7, 42, 1000000])
+    assert (labels==[0, 1, 0, 0]).all()
+
+
+def test_chain():
+
+    elements = np.arange(0, 10000)
+    components = _disjoint_set.disjoint_set(elements)
+    components.union(elements[1:], elements[:-1])
+
+    assert (components.labels(elements)==0).all()
+
+
+def test_label_order():
+
+    components = _disjoint_set.disjoint_set(range(0, 6))
+    components.union([5, 4], [3, 1])
+
+    assert (components.labels(range(0, 6))==[0, 1, 2, 3, 1, 3]).all()
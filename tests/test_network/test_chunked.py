@@ -0,0 +1,154 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from entity_network.entity_resolver import entity_resolver
+from entity_network.chunked_resolver import chunked_resolver
+from entity_network import _chunked
+
+from .. import sample
+
+def components(feature, category):
+
+    # sets of nodes with the same id
+    return set(feature.reset_index().groupby(f'{category}_id')['node'].apply(frozenset))
+
+
+@pytest.mark.parametrize('kneighbors', [10, None])
+def test_one_file(tmp_path, kneighbors):
+
+    n_unique = 300
+    n_duplicates = 30
+
+    # generate sample data saved to a file
+    df1 = sample.unique_records(n_unique)
+    columns = {'phone': ['HomePhone','WorkPhone','CellPhone'], 'email': ['Email'], 'address': ['Address']}
+    df, _, _ = sample.duplicate_records(df1, n_duplicates, columns)
+    file_path = str(tmp_path / 'records.csv')
+    df.to_csv(file_path, index=False)
+    spill = str(tmp_path / 'spill')
+
+    # compare chunks smaller than the file to comparing in memory
+    chunked = chunked_resolver(file_path, chunk_size=70, spill_directory=spill)
+    er = entity_resolver(pd.read_csv(file_path, dtype=str))
+    thresholds = {'phone': 1, 'email': 0.8, 'address': 0.8}
+    for category, cols in columns.items():
+        chunked.compare(category, cols, threshold=thresholds[category], kneighbors=kneighbors)
+        er.compare(category, cols, threshold=thresholds[category], kneighbors=kneighbors, backend='brute_force', transitive=True)
+        assert components(chunked.network_feature[category], category)==components(er.network_feature[category], category)
+    assert os.path.exists(os.path.join(spill, 'address_tfidf_df_0.npz'))
+
+    # every duplicated record is in a network with the original record
+    network_id = chunked.network()
+    assert network_id.groupby('network_id')['df_index'].apply(frozenset).map(len).min()>=2
+    duplicated = network_id[network_id['df_index']>=n_unique]
+    assert len(duplicated)==n_duplicates
+
+
+def test_two_sources(tmp_path):
+
+    n_unique = 300
+    n_duplicates = 30
+
+    # generate sample data with the first df in a file and the second df in dataframe chunks
+    df1 = sample.unique_records(n_unique)
+    columns = {
+        'phone': {'df': ['HomePhone','WorkPhone','CellPhone'], 'df2':['Phone']},
+        'email': {'df': 'Email', 'df2': 'EmailAddress'},
+        'address': {'df': 'Address', 'df2':'StreetAddress'}
+    }
+    df2, _, _ = sample.duplicate_df(df1, n_duplicates, columns)
+    file_path = str(tmp_path / 'records.csv')
+    df1.to_csv(file_path, index=False)
+    df2 = df2.astype(str).reset_index(drop=True)
+
+    chunked = chunked_resolver(file_path, [df2.iloc[start:start+7] for start in range(0, len(df2), 7)], chunk_size=70)
+    er = entity_resolver(pd.read_csv(file_path, dtype=str), df2)
+    for category, cols in columns.items():
+        threshold = 1 if category=='phone' else 0.8
+        chunked.compare(category, cols, threshold=threshold)
+        er.compare(category, cols, threshold=threshold, backend='brute_force', transitive=True)
+        assert components(chunked.network_feature[category], category)==components(er.network_feature[category], category)
+
+    # networks link records in the first source to records in the second
+    network_id = chunked.network()
+    assert set(network_id.columns)=={'network_id','df_index','df2_index'}
+    assert (network_id.groupby('network_id')['df2_index'].count()>0).all()
+
+
+def test_transitive():
+
+    # exact duplicates of two similar values
+    df = pd.DataFrame({'Email': ['cameronhill@hotmail.com', 'cameronhil@hotmail.com', 'ndavis@gmail.com', 'cameronhill@hotmail.com', 'cameronhil@hotmail.com']})
+
+    # chunks connect exact and similar matches transitively
+    chunked = chunked_resolver([df.iloc[0:2], df.iloc[2:]])
+    chunked.compare('email', 'Email', threshold=0.8)
+    assert components(chunked.network_feature['email'], 'email')=={frozenset({0, 1, 3, 4})}
+
+    # the same ids are found in memory if transitive
+    er = entity_resolver(df)
+    er.compare('email', 'Email', threshold=0.8, transitive=True)
+    assert components(er.network_feature['email'], 'email')=={frozenset({0, 1, 3, 4})}
+
+    # otherwise a duplicate of a value that did not provide the exact id of the similar values is not matched
+    er = entity_resolver(df)
+    er.compare('email', 'Email', threshold=0.8)
+    assert components(er.network_feature['email'], 'email')=={frozenset({0, 1, 3})}
+
+
+def test_reused_spill_directory(tmp_path):
+
+    spill = str(tmp_path / 'spill')
+    first = pd.DataFrame({'Email': ['a@example.com', 'b@example.com', 'a@example.com']}, index=[10, 11, 12])
+    second = pd.DataFrame({'Email': ['c@example.com', 'c@example.com']}, index=[20, 21])
+
+    # the original index of a previous source is replaced
+    chunked = chunked_resolver([first.iloc[0:2], first.iloc[2:]], spill_directory=spill)
+    chunked.compare('email', 'Email')
+    del chunked
+    chunked = chunked_resolver([second], spill_directory=spill)
+    chunked.compare('email', 'Email')
+    network_id = chunked.network()
+    assert sorted(network_id['df_index'])==[20, 21]
+    assert not os.path.exists(_chunked.spill_file(spill, 'index', 'df', 1, '.pkl'))
+
+
+def test_exact_edges_collision(tmp_path):
+
+    # values with the same hash are only matched if the values are equal
+    files = [str(tmp_path / 'values_0.pkl'), str(tmp_path / 'values_1.pkl')]
+    pd.Series(['a', 'b']).to_pickle(files[0])
+    pd.Series(['a', 'c', 'b']).to_pickle(files[1])
+    hashed = np.array([1, 1, 1, 2, 1], dtype='uint64')
+    node = np.array([0, 1, 2, 3, 4], dtype='int64')
+
+    shared = _chunked.shared_values(hashed, files, [2, 3])
+    source, target = _chunked.exact_edges(hashed, node, shared)
+    assert sorted(zip(source, target))==[(0, 2), (1, 4)]
+    assert _chunked.first_value(hashed, shared).tolist()==[True, True, False, True, False]
+
+
+def test_shared_values_read_once(tmp_path, monkeypatch):
+
+    # a collision spanning every chunk along with a second colliding hash
+    values = [['a', 'x'], ['b', 'y'], ['a', 'z'], ['c', 'x']]
+    files = []
+    for number, chunk in enumerate(values):
+        files.append(str(tmp_path / f'values_{number}.pkl'))
+        pd.Series(chunk).to_pickle(files[-1])
+    hashed = np.array([1, 2, 1, 2, 1, 3, 1, 2], dtype='uint64')
+    node = np.arange(8, dtype='int64')
+
+    # each chunk is read at most once for every colliding hash
+    read = []
+    read_pickle = pd.read_pickle
+    monkeypatch.setattr(pd, 'read_pickle', lambda file: read.append(file) or read_pickle(file))
+    shared = _chunked.shared_values(hashed, files, [2, 2, 2, 2])
+    assert sorted(read)==sorted(files)
+
+    source, target = _chunked.exact_edges(hashed, node, shared)
+    assert sorted(zip(source, target))==[(0, 4), (1, 7)]
+    assert _chunked.first_value(hashed, shared).tolist()==[True, True, True, True, False, True, True, False]
@@ -112,3 +112,154 @@ def test_record_ignore_self():
     assert 2 not in er.network_id['df_index']
     assert 2 not in er.network_map['df_index']
     assert 2 not in er.network_feature['phone']['df_index']
+
+
+def test_upsert_retract():
+
+    n_unique = 1000
+    n_duplicates = 30
+
+    # generate sample data
+    sample_df = sample.unique_records(n_unique)
+    columns = {
+        'phone': ['HomePhone','WorkPhone','CellPhone'],
+        'email': ['Email']
+    }
+    sample_df, sample_id, sample_map = sample.duplicate_records(sample_df, n_duplicates, columns)
+
+    # update networks incrementally after each comparison
+    er = entity_resolver(sample_df)
+    er.compare('phone', columns=columns['phone'])
+    er.upsert_network()
+    er.compare('email', columns=columns['email'])
+    er.upsert_network('email')
+    unchanged = er.network_id['network_id'].copy()
+
+    # assert results
+    check_network(er.network_id, er.network_map, columns, sample_id, sample_map, n_duplicates)
+
+    # remove a record of the first sample and its matching record
+    retract = sample_id.loc[sample_id['sample_id']==0, 'df_index'].iloc[0]
+    er.retract([retract])
+    assert retract not in er.network_id['df_index'].values
+    assert len(er.network_id)==2*(n_duplicates-1)
+    assert len(er.network_feature['phone'])==3*2*(n_duplicates-1)
+
+    # networks without the record are unchanged
+    remaining = er.network_id['network_id']
+    assert remaining.equals(unchanged[remaining.index])
+
+
+def test_add_records():
+
+    n_unique = 1000
+    n_duplicates = 30
+
+    # generate sample data
+    sample_df = sample.unique_records(n_unique)
+    columns = {
+        'phone': ['HomePhone','WorkPhone','CellPhone'],
+        'email': ['Email']
+    }
+    sample_df, sample_id, sample_map = sample.duplicate_records(sample_df, n_duplicates, columns)
+
+    # compare the original records then add duplicated records
+    er = entity_resolver(sample_df.iloc[0:n_unique])
+    for category, cols in columns.items():
+        er.compare(category, columns=cols)
+    er.add_records(sample_df.iloc[n_unique:])
+    er.network()
+
+    # assert results
+    check_network(er.network_id, er.network_map, columns, sample_id, sample_map, n_duplicates)
+
+
+def test_add_records_similar():
+
+    sample_df = pd.DataFrame({
+        'Address': [
+            '3148 amy falls mission reedmouth nv 56583',
+            '4611 59th way lauderhill al 23790',
+            '1111 e amy falls mission reedmouth nv 56583',
+            '3148 w amy falls mission reedmouth nv 56583',
+            '4611 59th way lauderhill al 23790',
+            '4611 59th way lauderhill al 23790',
+        ]
+    })
+
+    # compare all records at once
+    expected = entity_resolver(sample_df)
+    expected.compare('address', columns='Address', threshold=0.8)
+    expected = expected.network_feature['address'].groupby('address_id')['df_index'].apply(frozenset)
+
+    # compare records then add remaining records in two batches
+    er = entity_resolver(sample_df.iloc[[0,1,2,4]])
+    er.compare('address', columns='Address', threshold=0.8)
+    er.add_records(sample_df.iloc[[3]])
+    er.add_records(sample_df.iloc[[5]])
+    actual = er.network_feature['address'].groupby('address_id')['df_index'].apply(frozenset)
+
+    assert set(actual)==set(expected)
+
+    # similarity scores of added records use numpy dtypes since every value has an id
+    score = er.similarity_score['address']
+    assert score['id_similar'].dtype=='int64'
+    assert score['df_index'].dtype=='int64'
+    assert score['df_index_similar'].dtype=='int64'
+    assert (er.similarity_score['address']['score']>=0.8).any()
+
+
+def test_saved_index(tmp_path):
+
+    file_path = os.path.join('tests','similar_address.csv')
+    df = pd.read_csv(file_path)
+    df = pd.DataFrame({'Address': pd.concat([df['Address0'], df['Address1']], ignore_index=True)})
+
+    # save the fitted vectorizer, index and tfidf during the first comparison
+    er = entity_resolver(df)
+    er.compare('address', columns='Address', threshold=0.7, index_directory=str(tmp_path), backend='brute_force')
+
+    # query the saved tfidf without transforming values again
+    loaded = entity_resolver(df)
+    loaded.compare('address', columns='Address', threshold=0.7, index_directory=str(tmp_path), backend='brute_force')
+    assert 'create_tfidf' not in loaded.process_time['function'].values
+    assert 'create_index' not in loaded.process_time['function'].values
+    assert loaded.network_feature['address'].equals(er.network_feature['address'])
+    assert loaded.similarity_score['address'].equals(er.similarity_score['address'])
+
+
+def test_retract_bridge():
+
+    sample_df = pd.DataFrame({
+        'Id': [
+            'k1 k2 k3 k4 k5 k6',
+            'k1 k2 k3 k4 k5 k6 k7 k8',
+            'k3 k4 k5 k6 k7 k8',
+            'k1 k2 k3 k4 k5 k6',
+            'k3 k4 k5 k6 k7 k8'
+        ]
+    })
+
+    # the second record is the only similar match between the others, keeping exact duplicates of both using transitive ids
+    er = entity_resolver(sample_df)
+    er.compare('generic_id', columns='Id', threshold=0.7, backend='brute_force', transitive=True)
+    er.upsert_network()
+    assert er.network_id['network_id'].nunique()==1
+
+    # ids and networks are split the same as comparing without the record
+    er.retract([1])
+    expected = entity_resolver(sample_df.drop(index=1))
+    expected.compare('generic_id', columns='Id', threshold=0.7, backend='brute_force', transitive=True)
+    actual = set(er.network_feature['generic_id'].groupby('generic_id_id')['df_index'].apply(frozenset))
+    assert actual==set(expected.network_feature['generic_id'].groupby('generic_id_id')['df_index'].apply(frozenset))
+    assert actual=={frozenset({0, 3}), frozenset({2, 4})}
+    assert set(er.network_id.groupby('network_id')['df_index'].apply(frozenset))==actual
+    assert er.network_feature['generic_id']['generic_id_id'].dtype=='int64'
+
+    # a record connected only through the removed record is no longer matched
+    er = entity_resolver(sample_df.iloc[0:3])
+    er.compare('generic_id', columns='Id', threshold=0.7, backend='brute_force')
+    er.upsert_network()
+    er.retract([1])
+    assert len(er.network_feature['generic_id'])==0
+    assert len(er.network_id)==0
@@ -0,0 +1,42 @@
+import os
+
+import pandas as pd
+
+from entity_network.entity_resolver import entity_resolver
+
+from .. import sample
+
+
+def test_parquet(tmp_path):
+
+    n_unique = 1000
+    n_duplicates = 30
+
+    # generate sample data saved to Parquet files
+    df1 = sample.unique_records(n_unique)
+    columns = {
+        'phone': {'df': ['HomePhone','WorkPhone','CellPhone'], 'df2':['Phone']},
+        'address': {'df': 'Address', 'df2':'StreetAddress'}
+    }
+    df2, _, _ = sample.duplicate_df(df1, n_duplicates, columns)
+    df1.astype(str).to_parquet(tmp_path / 'df.parquet')
+    df2.astype(str).to_parquet(tmp_path / 'df2.parquet')
+
+    # only compared columns are read as Arrow-backed strings
+    er = entity_resolver.from_parquet(
+        str(tmp_path / 'df.parquet'), str(tmp_path / 'df2.parquet'),
+        columns={'df': ['HomePhone','WorkPhone','CellPhone','Address'], 'df2': ['Phone','StreetAddress']}
+    )
+    _, records = er._df['df'][0]
+    assert list(records.columns)==['HomePhone','WorkPhone','CellPhone','Address']
+    assert (records.dtypes==pd.StringDtype('pyarrow')).all()
+    for category, cols in columns.items():
+        er.compare(category, columns=cols, threshold=1 if category=='phone' else 0.7)
+    er.network()
+
+    # results are partitioned by network_id
+    er.to_parquet(str(tmp_path / 'results'))
+    network_id = pd.read_parquet(tmp_path / 'results' / 'network_id')
+    assert len(network_id)==len(er.network_id)
+    assert set(network_id['network_id'].astype(int))==set(er.network_id['network_id'])
+    assert any(name.startswith('network_id=') for name in os.listdir(tmp_path / 'results' / 'network_map'))
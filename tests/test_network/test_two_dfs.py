@@ -1,8 +1,10 @@
 import os
 
 import pandas as pd
+import pytest
 
 from entity_network.entity_resolver import entity_resolver
+from entity_network import _exceptions
 
 from .. import sample
 
@@ -52,6 +54,20 @@ def check_network(network_id, network_map, columns, sample_id, sample_map, n_dup
             assert (check==records).all()
 
 
+def check_score(actual, expected):
+
+    # every row matches, ignoring order
+    actual, expected = actual.reset_index(), expected.reset_index()
+    assert len(actual)==len(expected)
+    assert actual.dtypes.equals(expected.dtypes)
+    merged = actual.merge(expected, how='outer', indicator=True)
+
+    # except nmslib may keep a different neighbor with an equal score at the kneighbors boundary
+    tied = merged[merged['_merge']!='both'].groupby(['score','_merge']).size().unstack(fill_value=0)
+    if len(tied)>0:
+        assert tied['left_only'].equals(tied['right_only'])
+
+
 def test_split_column():
 
     n_unique = 10
@@ -72,8 +88,13 @@ def test_split_column():
     assert all(er.network_feature['address']['id_similar'].isna())
     assert all(er.network_feature['address']['address_id'] == [0,0])
 
+    # records are referenced without copying or adding combined columns
+    assert er._df['df'][0][1] is df1
+    assert 'Street,City,State,Zip' not in df1.columns
 
-def test_similar_address():
+
+@pytest.mark.parametrize('backend', ['nmslib', 'sklearn', 'brute_force'])
+def test_similar_address(backend):
 
     file_path = os.path.join('tests','similar_address.csv')
 
@@ -83,7 +104,7 @@ def test_similar_address():
     df2 = df[['Address1']]
 
     er = entity_resolver(df1, df2)
-    er.compare('address', columns={'df': 'Address0', 'df2': 'Address1'}, threshold=0.7)
+    er.compare('address', columns={'df': 'Address0', 'df2': 'Address1'}, threshold=0.7, backend=backend)
     er.network()
 
     assert len(er.network_summary)==len(df)
@@ -194,3 +215,240 @@ def test_two_dfs_exact():
     # assert results
     check_network(er.network_id, er.network_map, columns, sample_id, sample_map, n_duplicates)    
 
+
+
+def test_add_records_df2():
+
+    n_unique = 1000
+    n_duplicates = 30
+
+    # generate sample data
+    df1 = sample.unique_records(n_unique)
+    columns = {
+        'phone': {'df': ['HomePhone','WorkPhone','CellPhone'], 'df2':['Phone']},
+        'email': {'df': 'Email', 'df2': 'EmailAddress'},
+        'address': {'df': 'Address', 'df2':'StreetAddress'}
+    }
+    df2, sample_id, sample_map = sample.duplicate_df(df1, n_duplicates, columns)
+
+    # compare with part of df2 then add the remaining records
+    er = entity_resolver(df1, df2.iloc[0:n_duplicates])
+    for category, cols in columns.items():
+        er.compare(category, columns=cols)
+    er.add_records(df2.iloc[n_duplicates:], frame='df2')
+    er.network()
+
+    # assert results
+    check_network(er.network_id, er.network_map, columns, sample_id, sample_map, n_duplicates)
+
+
+def test_add_records_df():
+
+    n_unique = 1000
+    n_duplicates = 30
+
+    # generate sample data
+    df1 = sample.unique_records(n_unique)
+    columns = {
+        'phone': {'df': ['HomePhone','WorkPhone','CellPhone'], 'df2':['Phone']},
+        'email': {'df': 'Email', 'df2': 'EmailAddress'},
+        'address': {'df': 'Address', 'df2':'StreetAddress'}
+    }
+    df2, sample_id, sample_map = sample.duplicate_df(df1, n_duplicates, columns)
+
+    # compare without the records duplicated in df2 then add them to the indexed df
+    original = sample_id['df_index'].dropna().unique()
+    er = entity_resolver(df1.drop(index=original), df2)
+    for category, cols in columns.items():
+        er.compare(category, columns=cols)
+    er.add_records(df1.loc[original], frame='df')
+    er.network()
+
+    # assert results
+    check_network(er.network_id, er.network_map, columns, sample_id, sample_map, n_duplicates)
+
+    # values of df2 are compared to similar values added to df
+    er = entity_resolver(df1.drop(index=original), df2)
+    er.compare('address', columns=columns['address'], threshold=0.7)
+    er.add_records(df1.loc[original], frame='df')
+    similar = er.similarity_score['address']
+    added = similar[similar['df_index'].isin(original)]
+    assert added['threshold'].any()
+    assert added['df2_index'].notna().all()
+
+
+def test_saved_index(tmp_path):
+
+    file_path = os.path.join('tests','similar_address.csv')
+
+    df = pd.read_csv(file_path)
+    df1 = df[['Address0']]
+    df2 = df[['Address1']]
+
+    # save the fitted vectorizer and index during the first comparison
+    er = entity_resolver(df1, df2)
+    er.compare('address', columns={'df': 'Address0', 'df2': 'Address1'}, threshold=0.7, index_directory=str(tmp_path))
+    assert os.path.exists(os.path.join(str(tmp_path), 'address_state.npz'))
+    assert os.path.exists(os.path.join(str(tmp_path), 'address_index.bin'))
+
+    # load the saved vectorizer and index
+    loaded = entity_resolver(df1, df2)
+    loaded.compare('address', columns={'df': 'Address0', 'df2': 'Address1'}, threshold=0.7, index_directory=str(tmp_path))
+    assert 'create_index' not in loaded.process_time['function'].values
+    assert 'create_tfidf' not in loaded.process_time['function'].values
+    assert loaded.network_feature['address'].equals(er.network_feature['address'])
+    check_score(loaded.similarity_score['address'], er.similarity_score['address'])
+
+    # values changed since the index was saved
+    with pytest.raises(_exceptions.StaleIndex):
+        stale = entity_resolver(df1.iloc[1:], df2)
+        stale.compare('address', columns={'df': 'Address0', 'df2': 'Address1'}, threshold=0.7, index_directory=str(tmp_path))
+
+    # index saved using a different backend
+    with pytest.raises(_exceptions.StaleIndex):
+        stale = entity_resolver(df1, df2)
+        stale.compare('address', columns={'df': 'Address0', 'df2': 'Address1'}, threshold=0.7, index_directory=str(tmp_path), backend='sklearn')
+
+    # save and load a backend without a native index format
+    directory = str(tmp_path / 'brute_force')
+    er = entity_resolver(df1, df2)
+    er.compare('address', columns={'df': 'Address0', 'df2': 'Address1'}, threshold=0.7, index_directory=directory, backend='brute_force')
+    loaded = entity_resolver(df1, df2)
+    loaded.compare('address', columns={'df': 'Address0', 'df2': 'Address1'}, threshold=0.7, index_directory=directory, backend='brute_force')
+    assert 'create_index' not in loaded.process_time['function'].values
+    assert loaded.network_feature['address'].equals(er.network_feature['address'])
+    assert loaded.similarity_score['address'].equals(er.similarity_score['address'])
+
+    # save and load hashed features instead of a vocabulary
+    directory = str(tmp_path / 'hashing')
+    er = entity_resolver(df1, df2)
+    er.compare('address', columns={'df': 'Address0', 'df2': 'Address1'}, threshold=0.7, index_directory=directory, backend='brute_force', hash_features=2**18)
+    loaded = entity_resolver(df1, df2)
+    loaded.compare('address', columns={'df': 'Address0', 'df2': 'Address1'}, threshold=0.7, index_directory=directory, backend='brute_force')
+    assert 'create_index' not in loaded.process_time['function'].values
+    assert loaded.similarity_score['address'].equals(er.similarity_score['address'])
+    with pytest.raises(_exceptions.StaleIndex):
+        stale = entity_resolver(df1, df2)
+        stale.compare('address', columns={'df': 'Address0', 'df2': 'Address1'}, threshold=0.7, index_directory=directory, hash_features=2**20)
+
+
+def test_index_larger_df2():
+
+    file_path = os.path.join('tests','similar_address.csv')
+
+    df = pd.read_csv(file_path)
+    df1 = df[['Address0']].iloc[0:5]
+    df2 = df[['Address1']]
+
+    # the larger second df is indexed and queried with the first df
+    er = entity_resolver(df1, df2)
+    er.compare('address', columns={'df': 'Address0', 'df2': 'Address1'}, threshold=0.7)
+    assert 'index_frame' in er.process_time['function'].values
+    similar = er.similarity_score['address']
+    similar = similar[similar['threshold']]
+    assert set(zip(similar['df_index'], similar['df2_index']))=={(idx, idx) for idx in range(5)}
+
+    # the first df is indexed to compare added records
+    er.add_records(df2.iloc[0:2].set_index(pd.Index([-1,-2])), frame='df2')
+    similar = er.similarity_score['address']
+    similar = similar[similar['threshold'] & (similar['df2_index']<0)]
+    assert set(zip(similar['df_index'], similar['df2_index']))=={(0, -1), (1, -2)}
+
+
+def test_compare_many():
+
+    n_unique = 1000
+    n_duplicates = 30
+
+    # generate sample data
+    df1 = sample.unique_records(n_unique)
+    columns = {
+        'phone': {'df': ['HomePhone','WorkPhone','CellPhone'], 'df2':['Phone']},
+        'email': {'df': 'Email', 'df2': 'EmailAddress'},
+        'address': {'df': 'Address', 'df2':'StreetAddress'}
+    }
+    df2, _, _ = sample.duplicate_df(df1, n_duplicates, columns)
+    thresholds = {'phone': 1, 'email': 0.8, 'address': 0.7}
+
+    # compare one category at a time
+    serial = entity_resolver(df1, df2)
+    for category, cols in columns.items():
+        serial.compare(category, columns=cols, threshold=thresholds[category])
+
+    # compare categories in parallel
+    parallel = entity_resolver(df1, df2)
+    parallel.compare_many({
+        category: {'columns': cols, 'threshold': thresholds[category]} for category, cols in columns.items()
+    }, max_workers=2)
+
+    for category in columns.keys():
+        assert parallel.network_feature[category].equals(serial.network_feature[category])
+        if serial.similarity_score[category] is None:
+            assert parallel.similarity_score[category] is None
+        else:
+            check_score(parallel.similarity_score[category], serial.similarity_score[category])
+    assert set(parallel.process_time['description'].dropna())>=set(columns.keys())
+
+    # index loaded from the worker process can be queried
+    parallel.add_records(df2.iloc[0:2].set_index(pd.Index([-1,-2])), frame='df2')
+
+
+def test_block():
+
+    df1 = pd.DataFrame({
+        'Address': ['1234 South NameA Street Town', '1234 South NameA Street Town, TX', '5678 North NameB Road Place'],
+        'State': ['FL', 'TX', None]
+    })
+    df2 = pd.DataFrame({
+        'Address': ['1234 S NameA St Town', '5678 N NameC Rd Place'],
+        'State': ['FL', 'FL']
+    })
+
+    # similar addresses are found in any state without a blocking key
+    er = entity_resolver(df1, df2)
+    er.compare('address', columns={'df': 'Address', 'df2': 'Address'}, threshold=0.5)
+    assert er.network_feature['address']['df_index'].dropna().sort_values().tolist()==[0, 1, 2]
+
+    # similar addresses are only found in the same state
+    er = entity_resolver(df1, df2)
+    er.compare('address', columns={'df': 'Address', 'df2': 'Address'}, threshold=0.5, block={'df': 'State', 'df2': 'State'})
+    feature = er.network_feature['address']
+    assert feature['df_index'].dropna().tolist()==[0]
+    assert feature['df2_index'].dropna().tolist()==[0]
+    assert feature['address_id'].nunique()==1
+
+    measure = er.process_measure.set_index('measure')['value']
+    assert measure['blocks']==1
+    assert measure['block_size_max']==3
+
+    # added records are only compared within the same state
+    er.add_records(pd.DataFrame({'Address': ['1234 S NameA St Town', '5678 N NameB Rd Place'], 'State': ['TX', 'FL']}, index=[-1, -2]), frame='df2')
+    score = er.similarity_score['address']
+    added = score[score['df2_index']==-1]
+    assert added['df_index'].tolist()==[1]
+    assert added['threshold'].all()
+    assert not score.loc[score['df2_index']==-2, 'threshold'].any()
+    er.add_records(pd.DataFrame({'Address': ['5678 North NameB Road Place'], 'State': ['FL']}, index=[3]), frame='df')
+    score = er.similarity_score['address']
+    added = score.loc[(score['df_index']==3) & score['threshold'], 'df2_index']
+    assert -2 in added.tolist()
+    assert added.isin([0, 1, -2]).all()
+
+
+def test_block_duplicated():
+
+    df1 = pd.DataFrame({
+        'Address': ['1234 South NameA Street Town', '1234 South NameA Street Town'],
+        'State': ['IL', 'MO']
+    })
+    df2 = pd.DataFrame({
+        'Address': ['1234 S NameA St Town'],
+        'State': ['IL']
+    })
+
+    # a value duplicated in another block is only similar to values in its own block
+    er = entity_resolver(df1, df2)
+    er.compare('address', columns={'df': 'Address', 'df2': 'Address'}, threshold=0.5, block={'df': 'State', 'df2': 'State'})
+    score = er.similarity_score['address']
+    assert score['df_index'].tolist()==[0]
+    assert score['df2_index'].tolist()==[0]
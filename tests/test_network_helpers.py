@@ -73,4 +73,51 @@ def test_large_matrix():
 
     network_id, network_map = _network_helpers.assign_id(df.drop(columns='network_id').copy())
     assert network_id.equals(df[['node','network_id']])
-    assert network_map.equals(df[network_map.columns])
\ No newline at end of file
+    assert network_map.equals(df[network_map.columns])
+
+def test_components_upsert():
+
+    incidence = _network_helpers.feature_incidence()
+    components = _network_helpers.network_components(incidence)
+
+    # nodes 0-1-2 connected through two categories, 3-4 connected on their own
+    incidence.replace('0', pd.DataFrame({'0_id': [0, 0, 1, 1]}, index=pd.Index([0, 1, 3, 4], name='node')))
+    incidence.replace('1', pd.DataFrame({'1_id': [5, 5]}, index=pd.Index([1, 2], name='node')))
+    components.upsert('0')
+    touched = components.upsert('1')
+    assert set(touched)=={0, 1, 2}
+    network_id = components.network_id.sort_index()
+    assert network_id[0]==network_id[1]==network_id[2]
+    assert network_id[3]==network_id[4]!=network_id[0]
+
+    # edges are read from the incidence without a copy
+    assert components.upserted['1'] is incidence.blocks['1']
+
+    # removing an edge splits only the affected network
+    unchanged = network_id[3]
+    incidence.replace('1', pd.DataFrame({'1_id': []}, index=pd.Index([], name='node'), dtype='Int64'))
+    touched = components.upsert('1')
+    assert set(touched)=={0, 1, 2}
+    network_id = components.network_id.sort_index()
+    assert list(network_id.index)==[0, 1, 3, 4]
+    assert network_id[0]==network_id[1]
+    assert network_id[3]==network_id[4]==unchanged
+
+
+def test_feature_incidence():
+
+    incidence = _network_helpers.feature_incidence()
+    incidence.replace('phone', pd.DataFrame({'phone_id': [0, 0, 1]}, index=pd.Index([0, 2, 3], name='node')))
+    incidence.replace('email', pd.DataFrame({'email_id': [5, 5, pd.NA]}, index=pd.Index([2, 3, 4], name='node'), dtype='Int64'))
+
+    # nodes connected through any feature id
+    labels = incidence.labels()
+    assert len(labels)==4 and labels[1]==-1
+    assert labels[0]==labels[2]==labels[3]
+
+    # replacing a category only changes its block
+    incidence.replace('email', pd.DataFrame({'email_id': [6]}, index=pd.Index([4], name='node')))
+    assert incidence.blocks['phone'].shape==(4, 2)
+    labels = incidence.labels()
+    assert labels[0]==labels[2]
+    assert len({labels[0], labels[3], labels[4]})==3